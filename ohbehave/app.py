@@ -13,75 +13,349 @@ TODO's
   4. Add new cols to tracking: whatev useful me. Cravings. Emotions. Trigger
   5. combine graphs into one: 'data': [go.Line() for i in [...data for each graph...]]
 """
+from typing import Dict, List, Optional, Tuple
+
 import flask
 import pandas as pd
-from dash import dash, dash_table, html, dcc
-from dash.dependencies import Input, Output
+from dash import callback_context, dash, dash_table, html, dcc, no_update
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
 from plotly import graph_objs as go
 
-from ohbehave.data.transforms.data_by_date import data_by_date
+from ohbehave.data.callback_cache import CallbackCache
+from ohbehave.data.event_store import EventStore
+from ohbehave.data.provider import DataProvider, Snapshot
+from ohbehave.data.shared_dataset import SharedDataset
+from ohbehave.data.table_view import table_view, to_records
+from ohbehave.data.transforms.data_by_date import data_by_date_range
+from ohbehave.data.transforms.rolling import ROLLING_METRICS, ROLLING_WINDOWS, rolling_column, rolling_means, \
+    rolling_series, streaks_cached
+from ohbehave.data.transforms.rollups import GRANULARITIES, ROLLUP_AGGS, numeric_metrics, rolled_series, rollup, \
+    rollup_series
+from ohbehave.data.transforms.streaming_stats import STREAMING_STATS_AGGS, StreamingStats
+from ohbehave.data.transforms.summary_stats import DIMENSIONS, summary_stats_cached
 
 
 external_stylesheets = ['https://codepen.io/chriddyp/pen/bWLwgP.css']
 SERVER = flask.Flask(__name__)
-APP = dash.Dash(__name__, external_stylesheets=external_stylesheets, server=SERVER)
-
-
-# Real data
-data_by_date: pd.DataFrame = data_by_date(use_cache=True)  # todo: use_cache: change to False for prod
-
-# Boilerplate example
-APP.layout = html.Div([
-    # TODO: line graph: alcohol first. then can repurpose to gaming
-    #  - Do it by date first. then add `week #` (and other cols in al report) to data_by_date()
-    # https://dash.plotly.com/dash-core-components/graph
-    # TODO: Aggregate by week/month (later chosen by user input)
-    #  https://community.plotly.com/t/aggregating-time-series-data/15466
-    #  https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.DataFrame.resample.html
-    dcc.Graph(
-        id='data-graph',
-        figure={
-            'data': [
-                {
-                    'x': data_by_date['Date'],
-                    'y': data_by_date['Drinks.tot'],
-                    'name': 'alcohol',
-                    'connectgaps': True,
-                    'opacity': 0.7,
-                },
-            ],
-            # todo:
-            'layout': go.Layout(
-                # xaxis={'type': 'log', 'title': 'Date'},
-                xaxis={'title': 'Date'},
-                yaxis={'title': 'Drinks'},
-                # margin={'l': 40, 'b': 40, 't': 10, 'r': 10},
-                # legend={'x': 0, 'y': 1},
-                hovermode='closest'
-            )
+# Responses are compressed w/ gzip. See: Flask-Compress. A str, as the pinned version doesn't take a list of them.
+SERVER.config['COMPRESS_ALGORITHM'] = 'gzip'
+APP = dash.Dash(__name__, external_stylesheets=external_stylesheets, server=SERVER, compress=True)
+TABLE_PAGE_SIZE = 25
+DEFAULT_GRAPH_METRIC = 'Drinks.tot'
+LIVE_UPDATE_INTERVAL_MS = 30 * 1000  # How often open pages check for new data
+
+# Real data: served from last good snapshot, & refreshed in the background, w/ summary stats updated as it changes
+DATA_PROVIDER = DataProvider(stats=StreamingStats(), shared=SharedDataset())
+DATA_PROVIDER.init_app(SERVER)
+# Layout & callback outputs, by inputs & data version
+CALLBACK_CACHE = CallbackCache(DATA_PROVIDER)
+
+
+@SERVER.after_request
+def conditional_response(response: flask.Response) -> flask.Response:
+    """Add an ETag to GET responses, e.g. the layout, & if the browser already has that version, send a 304 instead
+
+    Runs before compression, so the ETag is of the uncompressed body, & is weak. Callbacks are POSTs, which browsers
+    don't make conditional, so those are cached server side instead. See: `CALLBACK_CACHE`"""
+    if flask.request.method == 'GET' and response.status_code == 200 and not response.direct_passthrough:
+        response.add_etag(weak=True)
+        response.make_conditional(flask.request)
+    return response
+
+
+def _figure(series: pd.Series, name: str, yaxis_title: str, overlays: Optional[Dict[str, pd.Series]] = None) -> Dict:
+    """Line graph figure of a series indexed by date
+
+    :param overlays: More series to draw over it, e.g. rolling means, by name"""
+    return {
+        'data': [
+            {
+                'x': series.index,
+                'y': series.values,
+                'name': name,
+                'connectgaps': True,
+                'opacity': 0.7,
+            },
+        ] + [{'x': x.index, 'y': x.values, 'name': overlay_name} for overlay_name, x in (overlays or {}).items()],
+        # todo:
+        'layout': go.Layout(
+            # xaxis={'type': 'log', 'title': 'Date'},
+            xaxis={'title': 'Date'},
+            yaxis={'title': yaxis_title},
+            # margin={'l': 40, 'b': 40, 't': 10, 'r': 10},
+            # legend={'x': 0, 'y': 1},
+            hovermode='closest'
+        )
+    }
+
+
+@CALLBACK_CACHE.memoize
+def serve_layout(snapshot: Snapshot) -> html.Div:
+    """Layout, built once per data version, so that page loads show the current data"""
+    data_by_date: pd.DataFrame = snapshot.df
+    loading_msg = [] if len(data_by_date) else [html.H6('Loading data... Refresh the page in a moment.')]
+    metrics: List[str] = numeric_metrics(data_by_date)
+
+    return html.Div(loading_msg + [
+        # https://dash.plotly.com/dash-core-components/graph
+        # Figure is set by update_graph(), via a clientside callback
+        dcc.Graph(id='data-graph'),
+        # Live updates: polls for new data. See: update_graph()
+        dcc.Interval(id='live-interval', interval=LIVE_UPDATE_INTERVAL_MS),
+        dcc.Store(id='graph-update'),  # Whole figure, or patch to it
+        dcc.Store(id='graph-shown'),  # What the graph shows: data version, & inputs
+        dcc.Store(id='data-version'),  # Data version shown. Tables update when it changes.
+        html.Div([
+            "Metric: ",
+            dcc.Dropdown(
+                id='graph-metric', options=[{'label': x, 'value': x} for x in metrics],
+                value=DEFAULT_GRAPH_METRIC if DEFAULT_GRAPH_METRIC in metrics else None, clearable=False),
+            "Summarize by: ",
+            dcc.RadioItems(
+                id='graph-granularity', options=[{'label': x, 'value': x} for x in GRANULARITIES], value='day',
+                labelStyle={'display': 'inline-block'}),
+            "Aggregation: ",
+            dcc.RadioItems(
+                id='graph-agg', options=[{'label': x, 'value': x} for x in ROLLUP_AGGS], value='sum',
+                labelStyle={'display': 'inline-block'}),
+            "Dates: ",
+            dcc.DatePickerRange(id='graph-range', clearable=True),
+            f"Rolling mean (daily; {', '.join(ROLLING_METRICS)}): ",
+            dcc.Checklist(
+                id='graph-rolling', options=[{'label': f'{x} days', 'value': x} for x in ROLLING_WINDOWS],
+                value=ROLLING_WINDOWS, labelStyle={'display': 'inline-block'}),
+        ]),
+        html.Br(),
+
+        # Current & longest streaks, e.g. days w/o drinking. See: update_streaks_table()
+        dash_table.DataTable(id='streaks-table'),
+        html.Br(),
+
+        # Summary stats of the graphed metric. See: update_stats_table()
+        html.Div([
+            "Summary stats by: ",
+            dcc.RadioItems(
+                id='stats-dimension', options=[{'label': x, 'value': x} for x in DIMENSIONS], value='Weekday',
+                labelStyle={'display': 'inline-block'}),
+        ]),
+        dash_table.DataTable(id='stats-table'),
+        html.Br(),
+
+        # todo: repurpose/remove whenever
+        # Paged, sorted, & filtered server side. See: update_table()
+        dash_table.DataTable(
+            id='table',
+            columns=[{"name": i, "id": i} for i in data_by_date.columns],
+            page_current=0,
+            page_size=TABLE_PAGE_SIZE,
+            page_action='custom',
+            sort_action='custom',
+            sort_mode='single',
+            sort_by=[],
+            filter_action='custom',
+            filter_query='')
+    ])
+
+
+APP.layout = serve_layout
+
+
+@APP.callback(
+    Output('table', 'data'),
+    Output('table', 'page_count'),
+    Input('table', 'page_current'),
+    Input('table', 'page_size'),
+    Input('table', 'sort_by'),
+    Input('table', 'filter_query'),
+    Input('data-version', 'data'))
+@CALLBACK_CACHE.memoize
+def update_table(snapshot: Snapshot, page_current, page_size, sort_by, filter_query, _version):
+    """Get only the visible page of the table. Updates when the data does, so a live update is only of 1 page."""
+    return table_view(snapshot.version, snapshot.df).page(page_current, page_size, sort_by, filter_query)
+
+
+def _graph_range_df(
+    snapshot: Snapshot, start_date: Optional[str], end_date: Optional[str], granularity: str, max_window: int
+) -> Optional[pd.DataFrame]:
+    """Get the rows of a snapshot's data that a graph between dates needs, from the event store, w/o computing other
+    dates. See: `data_by_date_range()`
+
+    Those are the dates picked, & the rest of the period of the last date (e.g. its week), & the `max_window` - 1 days
+    before the 1st date, for rolling means. So series of them, between the dates picked, are those of all dates.
+
+    :returns None if the store's form responses aren't those the snapshot was made from, e.g. it was synced since"""
+    store = EventStore()
+    n_rows: Optional[int] = snapshot.df.attrs.get('n_form_rows')
+    checksum: Optional[str] = snapshot.df.attrs.get('form_rows_hash')
+    if not n_rows or store.prefix_checksum(n_rows) != checksum:
+        return None
+    start: pd.Timestamp = pd.Timestamp(start_date or snapshot.df.index.min()) - pd.Timedelta(days=max_window - 1)
+    end = pd.Timestamp(end_date or snapshot.df.index.max())
+    if granularity != 'day':
+        end = end.to_period('W' if granularity == 'week' else 'M').end_time.normalize()
+    df: pd.DataFrame = data_by_date_range(start, end, store=store, n_rows=n_rows)
+    return df if store.prefix_checksum(n_rows) == checksum else None
+
+
+def _graph_series(
+    snapshot: Snapshot, metric, granularity, agg, windows, start_date, end_date
+) -> Tuple[pd.Series, Dict[str, pd.Series]]:
+    """Get the series that a graph draws: the metric, & overlays by name, between dates
+
+    W/o dates picked, they're of all dates, & cached per data version. W/ dates, they're of only the rows those dates
+    need (see: `_graph_range_df()`), or if the event store doesn't have the snapshot's data anymore, slices of those
+    of all dates."""
+    rolling_windows: List[int] = [
+        x for x in (windows or []) if granularity == 'day' and metric in ROLLING_METRICS]
+    range_df: Optional[pd.DataFrame] = None
+    if start_date or end_date:
+        max_window: int = max(rolling_windows, default=1)
+        range_df = CALLBACK_CACHE.get(
+            snapshot, '_graph_range_df', [start_date, end_date, granularity, max_window],
+            lambda: _graph_range_df(snapshot, start_date, end_date, granularity, max_window))
+    if range_df is None:
+        series: pd.Series = rollup_series(snapshot.version, snapshot.df, granularity, metric, agg)
+        overlays: Dict[str, pd.Series] = {
+            f'{x}-day mean': rolling_series(snapshot.version, snapshot.df, metric, x) for x in rolling_windows}
+    else:
+        series = rolled_series(rollup(range_df), granularity, metric, agg)
+        means: pd.DataFrame = rolling_means(range_df, [metric], rolling_windows)
+        overlays = {
+            f'{x}-day mean': means.get(rolling_column(metric, x), pd.Series(dtype=float)) for x in rolling_windows}
+    # Slices of the series, which are sorted by date
+    series = series[start_date:end_date]
+    overlays = {k: v[start_date:end_date] for k, v in overlays.items()}
+    return series, overlays
+
+
+def _graph(snapshot: Snapshot, metric, granularity, agg, windows, start_date, end_date) -> Dict:
+    """Get a graph's figure"""
+    series, overlays = _graph_series(snapshot, metric, granularity, agg, windows, start_date, end_date)
+    return _figure(series, metric or '', f'{metric} ({agg} by {granularity})' if metric else '', overlays)
+
+
+def _graph_patch(snapshot: Snapshot, shown: Dict) -> Optional[List[Dict]]:
+    """Get a patch that updates a graph from the version of the data it shows to the snapshot's
+
+    For each trace, it's the points from the 1st date that changed onward (for weeks & months, from the period that
+    has it), which replace the trace's points from then on. So rolling means after a changed date are updated too.
+
+    :param shown: See: `update_graph()`
+    :returns None if what changed since the graph's version isn't known"""
+    changed: Optional[List[str]] = DATA_PROVIDER.changed_dates(shown['version'])
+    if changed is None:
+        return None
+    args: List = shown['args']
+    series, overlays = _graph_series(snapshot, *args)
+    patch: List[Dict] = []
+    for trace in [series] + list(overlays.values()):
+        start: int = max(trace.index.searchsorted(pd.Timestamp(changed[0]), side='right') - 1, 0) if changed \
+            else len(trace)
+        patch.append({'x': trace.index[start:], 'y': trace.values[start:]})
+    return patch
+
+
+@APP.callback(
+    Output('graph-update', 'data'),
+    Output('graph-shown', 'data'),
+    Output('data-version', 'data'),
+    Input('graph-metric', 'value'),
+    Input('graph-granularity', 'value'),
+    Input('graph-agg', 'value'),
+    Input('graph-rolling', 'value'),
+    Input('graph-range', 'start_date'),
+    Input('graph-range', 'end_date'),
+    Input('live-interval', 'n_intervals'),
+    State('graph-shown', 'data'),
+    State('data-version', 'data'))
+def update_graph(metric, granularity, agg, windows, start_date, end_date, _n_intervals, shown, shown_version):
+    """Graph a metric, summarized by day/week/month, w/ its rolling means if by day, between dates if picked
+
+    Sends either a whole figure, or on a live update, a patch of only the points that changed (see: `_graph_patch()`),
+    which is applied to the figure in the browser. So a live update costs about the same however long the history.
+    On each poll, nothing is sent unless there's a new version of the data.
+
+    `graph-shown` is what the graph shows: the version of the data, & the inputs."""
+    snapshot: Snapshot = DATA_PROVIDER.snapshot()
+    version = snapshot.version if snapshot.version != shown_version else no_update
+    args: List = [metric, granularity, agg, windows, start_date, end_date]
+    is_poll: bool = [x['prop_id'] for x in callback_context.triggered] == ['live-interval.n_intervals']
+    if is_poll and shown and shown['args'] == args:
+        if shown['version'] == snapshot.version:
+            raise PreventUpdate
+        patch: Optional[List[Dict]] = CALLBACK_CACHE.get(
+            snapshot, '_graph_patch', args + [shown['version']], lambda: _graph_patch(snapshot, shown))
+        if patch is not None:
+            return {'patch': patch}, {**shown, 'version': snapshot.version}, version
+    figure: Dict = CALLBACK_CACHE.get(snapshot, 'update_graph', args, lambda: _graph(snapshot, *args))
+    return {'figure': figure}, {'version': snapshot.version, 'args': args}, version
+
+
+# Set the graph's figure to a whole 1, or apply a patch to it. See: update_graph()
+APP.clientside_callback(
+    """
+    function(update, figure) {
+        if (!update) {
+            return window.dash_clientside.no_update;
         }
-    ),
+        if (update.figure) {
+            return update.figure;
+        }
+        const data = figure.data.map(function(trace, i) {
+            const patch = update.patch[i];
+            if (!patch || !patch.x.length) {
+                return trace;
+            }
+            let keep = trace.x.findIndex(function(x) { return x >= patch.x[0]; });
+            keep = keep === -1 ? trace.x.length : keep;
+            return Object.assign({}, trace, {
+                x: trace.x.slice(0, keep).concat(patch.x), y: trace.y.slice(0, keep).concat(patch.y)});
+        });
+        return Object.assign({}, figure, {data: data});
+    }
+    """,
+    Output('data-graph', 'figure'),
+    Input('graph-update', 'data'),
+    State('data-graph', 'figure'))
 
-    # todo: repurpose: allow to summarize by day/week/month
-    html.H6("Change the value in the text box to see callbacks in action!"),
-    html.Div(["Input: ", dcc.Input(id='my-input', value='initial value', type='text')]),
-    html.Br(),
-    html.Div(id='my-output'),
 
-    # todo: repurpose/remove whenever
-    dash_table.DataTable(
-        id='table',
-        columns=[{"name": i, "id": i} for i in data_by_date.columns],
-        data=data_by_date.to_dict('records'))
-])
+@APP.callback(
+    Output('streaks-table', 'data'),
+    Output('streaks-table', 'columns'),
+    Input('graph-metric', 'value'),
+    Input('data-version', 'data'))
+@CALLBACK_CACHE.memoize
+def update_streaks_table(snapshot: Snapshot, _metric, _version):
+    """Current & longest streaks. Updates on page load, as the metric dropdown is then set, & when the data does."""
+    if not snapshot.version:
+        return [], []
+    table: pd.DataFrame = streaks_cached(snapshot.version, snapshot.df).copy()
+    for col in ['Longest.start', 'Longest.end']:
+        table[col] = table[col].dt.strftime('%Y-%m-%d')
+    return to_records(table), [{'name': x, 'id': x} for x in table.columns]
 
 
 @APP.callback(
-    Output(component_id='my-output', component_property='children'),
-    Input(component_id='my-input', component_property='value'))
-def update_output_div(input_value):
-    """Returning user input"""
-    return '{}'.format(input_value)
+    Output('stats-table', 'data'),
+    Output('stats-table', 'columns'),
+    Input('graph-metric', 'value'),
+    Input('stats-dimension', 'value'),
+    Input('data-version', 'data'))
+@CALLBACK_CACHE.memoize
+def update_stats_table(snapshot: Snapshot, metric, dimension, _version):
+    """Summary stats of a metric, 1 row per group of the dimension, & 1 column per agg. From the streaming stats, or
+    computed from all rows if there are none of this version yet."""
+    if not snapshot.version or not metric:
+        return [], []
+    stats: Optional[pd.DataFrame] = DATA_PROVIDER.stats_frame(snapshot)
+    if stats is None:
+        stats = summary_stats_cached(snapshot.version, snapshot.df, dimension)
+        stats = stats[stats['Agg.'].isin(STREAMING_STATS_AGGS)]
+    stats = stats[(stats['Dimension'] == dimension) & (stats['Metric'] == metric)]
+    table: pd.DataFrame = stats.pivot(index='Group', columns='Agg.', values='Value') \
+        .reindex(index=stats['Group'].unique(), columns=stats['Agg.'].unique()).round(2).reset_index()
+    return to_records(table), [{'name': x, 'id': x} for x in table.columns]
 
 
 if __name__ == "__main__":
@@ -12,6 +12,8 @@ ASSUMPTIONS = {
     'maxHoursRetroWasUsedToActuallyReportFutureEvent': 2,  # dk if i'm using this
     # Gaming
     'gamingEarliestDailyStart': '9:30:00',  # hh:MM:SS
+    'gamingAvgSessionDuration': timedelta(hours=2.5),  # used to infer a missing start/stop
+    'gamingMaxSessionDuration': timedelta(hours=8),  # a start & stop further apart than this aren't the same session
     # Sleep
     'avgTimeAfterLoggingToFirstSleepIfLogged1x': timedelta(hours=1.25),
     'avgTimeAfterLoggingToFirstSleepIfLogged2+': timedelta(minutes=20),
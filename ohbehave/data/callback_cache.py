@@ -0,0 +1,62 @@
+"""Cache of Dash callback outputs, e.g. figures, keyed by the callback's inputs & the data version
+
+A cached callback is passed the snapshot to use, so an output is always cached under the version it was made from.
+Repeat views, & users viewing the same chart, are then a lookup. Entries of other versions are dropped when the
+provider swaps in a new snapshot, rather than waiting to be evicted. Least recently used entries are evicted once there
+are more than `max_entries`.
+"""
+import functools
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Sequence, Tuple
+
+from ohbehave.data.provider import DataProvider, Snapshot
+
+CALLBACK_CACHE_MAX_ENTRIES = 256
+CacheKey = Tuple[str, str, str]  # callback, data version, args (JSON)
+
+
+class CallbackCache:
+    """Outputs of callbacks, by callback, data version, & args"""
+
+    def __init__(self, provider: DataProvider, max_entries: int = CALLBACK_CACHE_MAX_ENTRIES):
+        self.provider = provider
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[CacheKey, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+        provider.add_listener(self.invalidate)
+
+    def invalidate(self, snapshot: Snapshot = None):
+        """Drop entries of versions other than a snapshot's, or all entries if not passed"""
+        with self._lock:
+            for key in [x for x in self._entries if snapshot is None or x[1] != snapshot.version]:
+                del self._entries[key]
+
+    def get(self, snapshot: Snapshot, name: str, args: Sequence, make: Callable[[], Any]) -> Any:
+        """Get the output of a callback for a snapshot & args, calling `make()` to make it if not cached. Not cached
+        while there's no data yet.
+
+        :param args: Must be JSON serializable, as those of Dash callbacks are"""
+        if not snapshot.version:
+            return make()
+        key: CacheKey = (name, snapshot.version, json.dumps(list(args), sort_keys=True, default=str))
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        value = make()
+        with self._lock:
+            self._entries[key] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def memoize(self, func: Callable[..., Any]) -> Callable[..., Any]:
+        """Decorate a callback. `func(snapshot, *args)` is then called as `func(*args)`, w/ the provider's snapshot.
+        Outputs are shared, so must not be mutated. See: `get()`"""
+        @functools.wraps(func)
+        def wrapper(*args):
+            snapshot: Snapshot = self.provider.snapshot()
+            return self.get(snapshot, func.__qualname__, args, lambda: func(snapshot, *args))
+        return wrapper
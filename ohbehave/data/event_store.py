@@ -0,0 +1,285 @@
+"""Local SQLite store of form responses & the events extracted from them
+
+Tables
+  responses: Raw sheet rows (JSON), 1 per form response, w/ the parsed form timestamp, & a checksum of the row & all
+   rows before it (see: `prefix_checksums()`). Indexed on timestamp.
+  events: See: `extract_events()`. Indexed on timestamp, activity, & date (e.g. waking day for sleep).
+  meta: Key -> JSON value, e.g. the header row, the state of the last sync, & the version of the extracted events.
+
+Writes are transactions, so readers, incl. other processes, see either all of a sync or none of it. Reads can be of a
+timestamp / date range, which only reads rows in the range, via the indexes.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+from pandas import DataFrame
+
+from ohbehave.config import CACHE_DIR
+
+EVENT_STORE_PATH = os.path.join(CACHE_DIR, 'data.sqlite3')
+EVENT_STORE_COLUMNS = ['row', 'domain', 'activity', 'start_stop', 'timestamp', 'reported', 'is_retro', 'date']
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS responses (
+    row INTEGER PRIMARY KEY, timestamp TEXT, "values" TEXT NOT NULL, prefix_checksum TEXT);
+CREATE INDEX IF NOT EXISTS responses_timestamp ON responses (timestamp);
+CREATE TABLE IF NOT EXISTS events (
+    row INTEGER NOT NULL, domain TEXT NOT NULL, activity TEXT NOT NULL, start_stop TEXT, timestamp TEXT,
+    reported TEXT, is_retro INTEGER, date TEXT);
+CREATE INDEX IF NOT EXISTS events_row ON events (row);
+CREATE INDEX IF NOT EXISTS events_timestamp ON events (timestamp);
+CREATE INDEX IF NOT EXISTS events_activity ON events (activity, timestamp);
+CREATE INDEX IF NOT EXISTS events_date ON events (date);
+CREATE INDEX IF NOT EXISTS events_reported ON events (reported);
+"""
+DateLike = Union[date, datetime, str]
+# Date range & reported range of events: start, end, reported_start, reported_end. See: `EventStore.events()`
+EventRanges = Tuple[Optional[DateLike], Optional[DateLike], Optional[DateLike], Optional[DateLike]]
+
+
+def _iso(x: Optional[DateLike]) -> Optional[str]:
+    """ISO string of a timestamp, as stored: YYYY-MM-DDTHH:MM:SS, so that they compare as strings. A date is its
+    start."""
+    return x if x is None or isinstance(x, str) else pd.Timestamp(x).isoformat()
+
+
+class ResponsesState(NamedTuple):
+    """What form responses a store has, as of 1 transaction"""
+    header: List[str]
+    n_rows: int
+    checksum: str  # Of all rows. See: `prefix_checksums()`
+    version: int  # Meta responses_version, which changes whenever responses are written
+
+
+def _row_json(row: List[str]) -> str:
+    """A sheet row, as stored"""
+    return json.dumps(row, ensure_ascii=False)
+
+
+def prefix_checksums(rows: List[List[str]], prev_checksum='') -> List[str]:
+    """Checksum of each row & all rows before it, i.e. a hash chain. So 2 sheets' rows are the same up to the 1st row
+    whose checksums differ, & the checksum of the last row is 1 of all rows.
+
+    :param prev_checksum: That of the row before the 1st, if any"""
+    checksums: List[str] = []
+    for row in rows:
+        prev_checksum = hashlib.sha1((prev_checksum + _row_json(row)).encode('utf-8')).hexdigest()
+        checksums.append(prev_checksum)
+    return checksums
+
+
+def _iso_date(x: Optional[DateLike]) -> Optional[str]:
+    """ISO string of a date, as stored: YYYY-MM-DD. A timestamp is its date."""
+    return x if x is None or isinstance(x, str) else pd.Timestamp(x).date().isoformat()
+
+
+class EventStore:
+    """Form responses & events, in a local SQLite database. Safe to use from multiple threads & processes."""
+
+    def __init__(self, path: str = EVENT_STORE_PATH):
+        self.path = path
+        self._local = threading.local()  # Connection per thread
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Connection of this thread. Used as a context, it's a transaction: committed, or on error, rolled back."""
+        conn: Optional[sqlite3.Connection] = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')  # Readers aren't blocked by a writer
+            conn.executescript(_SCHEMA)
+            with conn:
+                self._migrate(conn)
+            self._local.conn = conn
+        with conn:
+            yield conn
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection):
+        """Add columns that stores made by older versions don't have"""
+        columns: List[str] = [x[1] for x in conn.execute('PRAGMA table_info(responses)')]
+        if 'prefix_checksum' not in columns:
+            conn.execute('ALTER TABLE responses ADD COLUMN prefix_checksum TEXT')
+            rows = conn.execute('SELECT row, "values" FROM responses ORDER BY row').fetchall()
+            checksums: List[str] = prefix_checksums([json.loads(x[1]) for x in rows])
+            conn.executemany(
+                'UPDATE responses SET prefix_checksum = ? WHERE row = ?', zip(checksums, [x[0] for x in rows]))
+
+    def get_meta(self, key: str, default: Any = None) -> Any:
+        """Get a meta value"""
+        with self._connect() as conn:
+            return self._get_meta(conn, key, default)
+
+    @staticmethod
+    def _get_meta(conn: sqlite3.Connection, key: str, default: Any = None) -> Any:
+        """Get a meta value, in a transaction"""
+        row: Optional[Tuple] = conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    @staticmethod
+    def _set_meta(conn: sqlite3.Connection, values: Dict[str, Any]):
+        """Set meta values, in a transaction"""
+        conn.executemany(
+            'INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+            [(k, json.dumps(v, default=str)) for k, v in values.items()])
+
+    def n_responses(self) -> int:
+        """Num of form responses"""
+        with self._connect() as conn:
+            return conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+    def write_responses(
+        self, header: List[str], rows: List[List[str]], timestamps: Sequence[Optional[datetime]], start_row=0,
+        meta: Dict[str, Any] = None
+    ):
+        """Write form responses, replacing those from `start_row` onward, in 1 transaction. Events of replaced rows are
+        deleted, & need extracting again.
+
+        :param rows: Sheet rows, w/o the header. The 1st is row `start_row`.
+        :param timestamps: Parsed form timestamp of each row. None if it couldn't be parsed.
+        :param meta: Meta values to set in the same transaction, e.g. sync state."""
+        with self._connect() as conn:
+            conn.execute('DELETE FROM responses WHERE row >= ?', (start_row,))
+            conn.execute('DELETE FROM events WHERE row >= ?', (start_row,))
+            checksums: List[str] = prefix_checksums(rows, self._prefix_checksum(conn, start_row))
+            conn.executemany(
+                'INSERT INTO responses (row, timestamp, "values", prefix_checksum) VALUES (?, ?, ?, ?)',
+                [(start_row + i, _iso(None if pd.isnull(t) else t), _row_json(row), checksum)
+                 for i, (row, t, checksum) in enumerate(zip(rows, timestamps, checksums))])
+            self._set_meta(conn, {
+                'header': header,
+                'events_n_rows': min(self._get_meta(conn, 'events_n_rows', 0), start_row),
+                'responses_version': self._get_meta(conn, 'responses_version', 0) + 1,
+                **(meta or {})})
+
+    def values(self) -> List[List[str]]:
+        """All sheet rows, header row 1st, as in a Sheets API `values().get` response. Empty if nothing stored."""
+        with self._connect() as conn:
+            header: Optional[List[str]] = self._get_meta(conn, 'header')
+            if not header:
+                return []
+            rows = conn.execute('SELECT "values" FROM responses ORDER BY row').fetchall()
+        return [header] + [json.loads(x[0]) for x in rows]
+
+    def responses_state(self) -> ResponsesState:
+        """Get the header, num, checksum, & version of the form responses, w/o reading them"""
+        with self._connect() as conn:
+            n_rows: int = conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+            return ResponsesState(
+                self._get_meta(conn, 'header', []), n_rows, self._prefix_checksum(conn, n_rows),
+                self._get_meta(conn, 'responses_version', 0))
+
+    def prefix_checksums(self) -> List[str]:
+        """Checksum of each form response & all before it, in row order. See: `prefix_checksums()`"""
+        with self._connect() as conn:
+            return [x[0] for x in conn.execute('SELECT prefix_checksum FROM responses ORDER BY row')]
+
+    def prefix_checksum(self, n_rows: int) -> str:
+        """Checksum of the 1st `n_rows` form responses. Empty if none, or if there are fewer rows."""
+        with self._connect() as conn:
+            return self._prefix_checksum(conn, n_rows)
+
+    @staticmethod
+    def _prefix_checksum(conn: sqlite3.Connection, n_rows: int) -> str:
+        """Checksum of the 1st `n_rows` form responses, in a transaction"""
+        row: Optional[Tuple] = conn.execute(
+            'SELECT prefix_checksum FROM responses WHERE row = ?', (n_rows - 1,)).fetchone()
+        return row[0] if row else ''
+
+    def responses(
+        self, start: DateLike = None, end: DateLike = None, start_row=0
+    ) -> Tuple[List[int], List[List[str]]]:
+        """Get form responses reported in [start, end), & / or from `start_row` onward. Rows w/ an unparseable
+        timestamp are only in unbounded ranges.
+
+        :returns Row nums, & sheet rows, header row 1st"""
+        where, params = ['row >= ?'], [start_row]
+        if start is not None:
+            where.append('timestamp >= ?')
+            params.append(_iso(start))
+        if end is not None:
+            where.append('timestamp < ?')
+            params.append(_iso(end))
+        with self._connect() as conn:
+            header: List[str] = self._get_meta(conn, 'header', [])
+            rows = conn.execute(
+                f'SELECT row, "values" FROM responses WHERE {" AND ".join(where)} ORDER BY row', params).fetchall()
+        return [x[0] for x in rows], [header] + [json.loads(x[1]) for x in rows]
+
+    def reported_range(self, end_row: int = None) -> Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]:
+        """Earliest & latest form timestamps, of form responses before row `end_row`, if passed"""
+        where, params = ('WHERE row < ?', [end_row]) if end_row is not None else ('', [])
+        with self._connect() as conn:
+            first, last = conn.execute(
+                f'SELECT MIN(timestamp), MAX(timestamp) FROM responses {where}', params).fetchone()
+        return (pd.Timestamp(first) if first else None), (pd.Timestamp(last) if last else None)
+
+    def write_events(
+        self, events: DataFrame, start_row: int, n_rows: int, version: str, responses_version: int
+    ) -> bool:
+        """Write events extracted from rows `start_row` to `n_rows` - 1, replacing any from `start_row` onward, in 1
+        transaction
+
+        :param version: Version of the code & assumptions they were extracted w/. See: `events_version()`
+        :param responses_version: Meta `responses_version` when the rows were read. If responses have been written
+         since, events aren't written, as they may be of replaced rows.
+        :returns True if written"""
+        def col(name: str, fmt=lambda x: x) -> List:
+            return [None if pd.isnull(x) else fmt(x) for x in events[name]]
+        records = zip(
+            col('row', int), col('domain'), col('activity'), col('start_stop'), col('timestamp', _iso),
+            col('reported', _iso), col('is_retro', int), col('date', _iso_date))
+        with self._connect() as conn:
+            if self._get_meta(conn, 'responses_version', 0) != responses_version:
+                return False
+            conn.execute('DELETE FROM events WHERE row >= ?', (start_row,))
+            conn.executemany(f'INSERT INTO events VALUES ({", ".join(["?"] * len(EVENT_STORE_COLUMNS))})', records)
+            self._set_meta(conn, {'events_n_rows': n_rows, 'events_version': version})
+        return True
+
+    def events(
+        self, start: DateLike = None, end: DateLike = None, reported_start: DateLike = None,
+        reported_end: DateLike = None, activities: Sequence[str] = None, start_row: int = None, end_row: int = None,
+        ranges: Sequence[EventRanges] = ()
+    ) -> DataFrame:
+        """Get events w/ a date in [start, end], or that were reported in [reported_start, reported_end), of any of
+        `activities`, of form responses from `start_row` to `end_row` - 1
+
+        :param ranges: More ranges, each like `start`, `end`, `reported_start`, & `reported_end`. Events in any of
+         them are got, once each.
+        :returns DataFrame w/ columns: `EVENT_STORE_COLUMNS`, w/ the dtypes of `extract_events()`, except that domain,
+         activity, & start_stop are strings, sorted by row"""
+        conditions, params = [], []
+        for range_start, range_end, range_reported_start, range_reported_end in \
+                [(start, end, reported_start, reported_end)] + list(ranges):
+            if range_start is not None or range_end is not None:
+                conditions.append('date BETWEEN ? AND ?')
+                params += [_iso_date(range_start) or '', _iso_date(range_end) or '9999']
+            if range_reported_start is not None or range_reported_end is not None:
+                conditions.append('(reported >= ? AND reported < ?)')
+                params += [_iso(range_reported_start) or '', _iso(range_reported_end) or '9999']
+        where: List[str] = ['(' + ' OR '.join(conditions) + ')'] if conditions else []
+        if activities is not None:
+            where.append(f'activity IN ({", ".join(["?"] * len(activities))})')
+            params += list(activities)
+        if start_row is not None:
+            where.append('row >= ?')
+            params.append(start_row)
+        if end_row is not None:
+            where.append('row < ?')
+            params.append(end_row)
+        sql = f'SELECT * FROM events {"WHERE " + " AND ".join(where) if where else ""} ORDER BY row, rowid'
+        with self._connect() as conn:
+            events = DataFrame(conn.execute(sql, params).fetchall(), columns=EVENT_STORE_COLUMNS)
+        for x in ['timestamp', 'reported', 'date']:
+            events[x] = pd.to_datetime(events[x])
+        events['is_retro'] = events['is_retro'].astype(bool)
+        return events
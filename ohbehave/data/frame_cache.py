@@ -0,0 +1,174 @@
+"""Content-addressed cache of DataFrames, stored as columnar (Arrow IPC / Feather v2) files
+
+Each entry is keyed by a hash of everything the DataFrame was made from, e.g. the raw sheet data, params,
+`ASSUMPTIONS`, & the code that made it. So an entry made w/ different inputs is never served; there is just no entry
+for the new key until it is made. Files are uncompressed so that they can be read via memory mapping. Least recently
+used entries are evicted once there are more than `max_entries`.
+
+Columns are stored so that Arrow can hand them to pandas w/o copying: w/o nulls, which pandas would fill in a copy.
+Datetimes are stored as int64 (NaT is its own int), float NaNs as NaN rather than null, & nullable ints (e.g. `Int8`)
+as their values & a mask column. Each column's pandas dtype is in the schema metadata, to restore it on read.
+"""
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from pandas import DataFrame
+from pandas.api.types import is_extension_array_dtype, pandas_dtype
+
+from ohbehave.config import CACHE_DIR
+
+FRAME_CACHE_DIR = os.path.join(CACHE_DIR, 'frames')
+FRAME_CACHE_MAX_ENTRIES = 8
+FRAME_CACHE_EXT = '.feather'
+ATTRS_METADATA_KEY = b'ohbehave.attrs'
+DTYPES_METADATA_KEY = b'ohbehave.dtypes'
+MASK_COLUMN_PREFIX = '__mask__.'
+INDEX_COLUMN = '__index__'
+
+
+def frame_cache_key(*parts) -> str:
+    """Hash of all of the parts a DataFrame was made from. Parts must be JSON serializable, or have a stable str()."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def source_version(module_paths: List[str]) -> str:
+    """Hash of source code files, so that entries made by a different version of the code aren't served"""
+    sha = hashlib.sha256()
+    for path in module_paths:
+        with open(path, 'rb') as f:
+            sha.update(f.read())
+    return sha.hexdigest()
+
+
+def _entry_path(key: str, cache_dir: str = FRAME_CACHE_DIR) -> str:
+    """Path of a cache entry"""
+    return os.path.join(cache_dir, key + FRAME_CACHE_EXT)
+
+
+def _evict(cache_dir: str = FRAME_CACHE_DIR, max_entries: int = FRAME_CACHE_MAX_ENTRIES):
+    """Remove least recently used entries, leaving `max_entries`"""
+    paths = [os.path.join(cache_dir, x) for x in os.listdir(cache_dir) if x.endswith(FRAME_CACHE_EXT)]
+    paths = sorted(paths, key=os.path.getmtime, reverse=True)
+    for path in paths[max_entries:]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:  # Evicted by another process
+            pass
+
+
+def to_storable(df: DataFrame) -> DataFrame:
+    """Make object columns typeable by Arrow: empty strings become nulls, & then column types are inferred"""
+    df = df.copy()
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].where(df[col] != '', None)
+    return df.infer_objects()
+
+
+def _is_masked(dtype) -> bool:
+    """Whether a dtype is a nullable numeric 1, w/ its values & a mask, e.g. `Int8`"""
+    return is_extension_array_dtype(dtype) and dtype.kind in 'iufb'
+
+
+def _to_arrow(values: pd.Series) -> Tuple[pa.Array, Optional[pa.Array]]:
+    """Get a column as stored, & its mask, if any. Numeric columns are stored w/o nulls."""
+    dtype = values.dtype
+    if dtype.kind in 'mM' and not is_extension_array_dtype(dtype):  # NaT is the min int64
+        return pa.array(values.to_numpy().view('int64')), None
+    if _is_masked(dtype):
+        return pa.array(values.to_numpy(dtype.numpy_dtype, na_value=0)), pa.array(values.isna().to_numpy(np.uint8))
+    if dtype.kind in 'iufb':
+        return pa.array(values.to_numpy(), from_pandas=False), None  # NaN isn't null
+    return pa.Array.from_pandas(values), None
+
+
+def _to_table(df: DataFrame) -> pa.Table:
+    """Get a DataFrame as stored. Its index is the 1st column. See: `_to_arrow()`"""
+    df = to_storable(df)
+    arrays: Dict[str, pa.Array] = {INDEX_COLUMN: pa.Array.from_pandas(df.index.to_series())}
+    for name, values in df.items():
+        arrays[name], mask = _to_arrow(values)
+        if mask is not None:
+            arrays[MASK_COLUMN_PREFIX + name] = mask
+    dtypes = {
+        'index': [df.index.name, str(df.index.dtype)],
+        'columns': [[name, str(x)] for name, x in df.dtypes.items()]}
+    return pa.table(arrays, metadata={DTYPES_METADATA_KEY: json.dumps(dtypes).encode('utf-8')})
+
+
+def _from_arrow(table: pa.Table, name: str, dtype_name: str):
+    """Get a column as it was before it was stored. Numeric columns are views of the table's memory, if they're in 1
+    chunk, as they are in a cache entry. Others are copies."""
+    values: pa.ChunkedArray = table.column(name)
+    if pa.types.is_dictionary(values.type):  # Categorical, w/ its categories & order
+        return values.to_pandas().array
+    dtype = pandas_dtype(dtype_name)
+    if dtype.kind in 'mM' and not is_extension_array_dtype(dtype):
+        return values.to_numpy().view(dtype)
+    if _is_masked(dtype):
+        mask: np.ndarray = table.column(MASK_COLUMN_PREFIX + name).to_numpy().view(bool)
+        return dtype.construct_array_type()(values.to_numpy(), mask, copy=False)
+    if dtype.kind in 'iufb':
+        return values.to_numpy()
+    return values.to_pandas().astype(dtype).array
+
+
+def _from_table(table: pa.Table, dtypes: Dict) -> DataFrame:
+    """Get a stored DataFrame. See: `_to_table()`
+
+    W/ `copy=False`, pandas makes it w/o copying the columns into 2D blocks, so they stay views of the table. Only
+    public pandas API is used, so on a version that copies them anyway, the result is the same, but isn't backed by
+    the table."""
+    index_name, index_dtype = dtypes['index']
+    index = pd.Index(_from_arrow(table, INDEX_COLUMN, index_dtype), name=index_name)
+    arrays = {i: _from_arrow(table, name, dtype_name) for i, (name, dtype_name) in enumerate(dtypes['columns'])}
+    df = DataFrame(arrays, index=index, copy=False)
+    df.columns = pd.Index([name for name, _ in dtypes['columns']])  # Keyed by position, in case names repeat
+    return df
+
+
+def read_frame(key: str, cache_dir: str = FRAME_CACHE_DIR, zero_copy=False) -> Optional[DataFrame]:
+    """Read cache entry via memory mapping. Returns None if there is no entry for key.
+
+    :param zero_copy: Numeric, datetime, & nullable int columns stay backed by the mapped file, rather than being
+     copied, so processes that map the same entry share their memory. They're read-only. Strings, categories' labels,
+     & the index are still copied, as they're Python objects in pandas. If false, all columns are copies."""
+    path = _entry_path(key, cache_dir)
+    try:
+        table: pa.Table = feather.read_table(path, memory_map=True)
+        os.utime(path)  # Mark as recently used
+    except FileNotFoundError:
+        return None
+    metadata: Dict[bytes, bytes] = table.schema.metadata or {}
+    if DTYPES_METADATA_KEY in metadata:
+        df: DataFrame = _from_table(table, json.loads(metadata[DTYPES_METADATA_KEY]))
+        df = df if zero_copy else df.copy()
+    else:  # Written before columns were stored w/o nulls
+        df = table.to_pandas(split_blocks=True) if zero_copy else table.to_pandas()
+    if ATTRS_METADATA_KEY in metadata:
+        df.attrs = json.loads(metadata[ATTRS_METADATA_KEY])
+    return df
+
+
+def write_frame(
+    df: DataFrame, key: str, cache_dir: str = FRAME_CACHE_DIR, max_entries: int = FRAME_CACHE_MAX_ENTRIES
+) -> str:
+    """Write cache entry, & evict least recently used entries. `df.attrs` must be JSON serializable.
+
+    :returns Path of the entry"""
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _entry_path(key, cache_dir)
+    table: pa.Table = _to_table(df)
+    metadata: Dict[bytes, bytes] = table.schema.metadata or {}
+    table = table.replace_schema_metadata({**metadata, ATTRS_METADATA_KEY: json.dumps(df.attrs).encode('utf-8')})
+    # Write to temp file & then rename, so a partially written entry is never read
+    tmp_path = path + f'.{os.getpid()}.tmp'
+    feather.write_feather(table, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, path)
+    _evict(cache_dir, max_entries)
+    return path
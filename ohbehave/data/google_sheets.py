@@ -17,22 +17,30 @@ Sheet of interest:
 https://docs.google.com/spreadsheets/d/1dOFbfTFReRhJUxjj8TdLvsyOnBJ_WlPvpqXwj48WgVU/edit#gid=1971461617
 """
 
+import hashlib
 import json
 import os
+import re
 import sys
-from typing import List, Dict
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, List, Dict, NamedTuple, Optional, Sequence, Tuple
 from datetime import datetime, timedelta
 from dateutil.parser import parse as parse_datetime_str
 
+import httplib2
 from google.auth.exceptions import RefreshError
 from googleapiclient.discovery import build
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
+import numpy as np
 import pandas as pd
 from pandas import DataFrame
 
 from ohbehave.config import ENV_DIR, CACHE_DIR, ASSUMPTIONS
+from ohbehave.data.event_store import EventStore, prefix_checksums
 
 # If modifying these scopes, delete the file token.json.
 SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly']
@@ -41,6 +49,9 @@ SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly']
 # SAMPLE_SPREADSHEET_ID = '1BxiMVs0XRA5nFMdKvBdBZjgmUUqptlbs74OgvE2upms'
 SAMPLE_SPREADSHEET_ID = '1dOFbfTFReRhJUxjj8TdLvsyOnBJ_WlPvpqXwj48WgVU'
 SAMPLE_RANGE_NAME = 'Form Responses 1!A1:L'
+# Base URL of a Sheets API to use instead of Google's, w/o auth, e.g. a local stand-in: http://localhost:8080/
+SHEETS_API_ENDPOINT = os.getenv('SHEETS_API_ENDPOINT')
+SHEETS_API_NUM_RETRIES = 5  # Retries of a request on rate limit & server errors, w/ exponential backoff
 TOKEN_PATH = os.path.join(ENV_DIR, 'token.json')
 CREDS_PATH = os.path.join(ENV_DIR, 'credentials.json')
 SRC_SHEET_FIELDS = {
@@ -57,9 +68,34 @@ SRC_SHEET_FIELDS = {
     'timestamp_past': 'Retro.Timestamp'
 }
 FLD = SRC_SHEET_FIELDS
+# Legacy local copy of the sheet, which is imported into the event store if it has no data yet
 GSHEET_JSON_CACHE_PATH = os.path.join(CACHE_DIR, 'data.json')
+SYNC_STATE_PATH = os.path.join(CACHE_DIR, 'data.sync.json')
+SYNC_TAIL_ROWS = 20  # Num of last synced rows re-fetched on sync, to detect changes above new rows
+SYNC_FULL_INTERVAL = timedelta(days=1)  # Max time between full pulls, which also catch edits above the synced tail
 FUTURE_RETRO_THRESH_HRS = ASSUMPTIONS['maxHoursRetroWasUsedToActuallyReportFutureEvent']  # dk if im using
 LATEST_SLEEP_HR = ASSUMPTIONS['latestExpectedSleepHour']
+# Formats that GoogleForms/Sheets emits, tried in order before falling back to (slower) dateutil parsing
+DATETIME_FORMATS = {
+    'Timestamp': ['%m/%d/%Y %H:%M:%S'],
+    'Retro: Date': ['%m/%d/%Y', '%Y-%m-%d'],
+    'Retro: Time': ['%I:%M:%S %p', '%H:%M:%S', '%I:%M %p', '%H:%M'],
+}
+DATETIME_FALLBACK_CACHE_SIZE = 4096
+_credentials: Optional[Credentials] = None
+_CREDENTIALS_LOCK = threading.Lock()
+_SERVICES = threading.local()  # Sheets API service per thread
+
+
+class SheetSource(NamedTuple):
+    """A range of a spreadsheet, e.g. the responses to 1 person's form. Each has its own local cache. See:
+    `source_store()`"""
+    name: str
+    spreadsheet_id: str = SAMPLE_SPREADSHEET_ID
+    range_name: str = SAMPLE_RANGE_NAME
+
+
+DEFAULT_SOURCE = SheetSource('default')
 
 
 def _get_and_use_new_token():
@@ -73,37 +109,88 @@ def _get_and_use_new_token():
         token.write(creds.to_json())
 
 
-def _get_sheets_live() -> Dict:
-    """Get sheets from online source"""
-    creds = None
-    # The file token.json stores the user's access and refresh tokens, and is
-    # created automatically when the authorization flow completes for the first
-    # time.
-    if os.path.exists(TOKEN_PATH):
-        creds = Credentials.from_authorized_user_file(TOKEN_PATH, SCOPES)
-    # If there are no (valid) credentials available, let the user log in.
-    if not creds or not creds.valid:
-        try:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-            else:
+def _get_credentials() -> Credentials:
+    """Get API credentials, refreshing or renewing them only if no longer valid. Shared by all threads."""
+    global _credentials
+    with _CREDENTIALS_LOCK:
+        creds: Optional[Credentials] = _credentials
+        # The file token.json stores the user's access and refresh tokens, and is
+        # created automatically when the authorization flow completes for the first
+        # time.
+        if not creds and os.path.exists(TOKEN_PATH):
+            creds = Credentials.from_authorized_user_file(TOKEN_PATH, SCOPES)
+        # If there are no (valid) credentials available, let the user log in.
+        if not creds or not creds.valid:
+            try:
+                if creds and creds.expired and creds.refresh_token:
+                    creds.refresh(Request())
+                else:
+                    _get_and_use_new_token()
+                    creds = Credentials.from_authorized_user_file(TOKEN_PATH, SCOPES)
+            except RefreshError:
                 _get_and_use_new_token()
-        except RefreshError:
-            _get_and_use_new_token()
-
-    service = build('sheets', 'v4', credentials=creds)
-
-    # Call the Sheets API
-    sheet = service.spreadsheets()
-    result: Dict = sheet.values().get(
-        spreadsheetId=SAMPLE_SPREADSHEET_ID,
-        range=SAMPLE_RANGE_NAME).execute()
-
-    return result
-
-
-def _get_sheets_cache(path=GSHEET_JSON_CACHE_PATH) -> Dict:
-    """Get sheets from local cache"""
+                creds = Credentials.from_authorized_user_file(TOKEN_PATH, SCOPES)
+        _credentials = creds
+        return creds
+
+
+def _get_sheets_service():
+    """Get Sheets API service of this thread
+
+    Built once per thread, as services aren't thread-safe, from the discovery document that comes w/ the client
+    library, so it isn't fetched. If `SHEETS_API_ENDPOINT` is set, the service is of that, w/o auth."""
+    service = getattr(_SERVICES, 'service', None)
+    if service is None:
+        if SHEETS_API_ENDPOINT:
+            service = build(
+                'sheets', 'v4', http=httplib2.Http(), static_discovery=True,
+                client_options={'api_endpoint': SHEETS_API_ENDPOINT})
+        else:
+            service = build('sheets', 'v4', credentials=_get_credentials(), static_discovery=True)
+        _SERVICES.service = service
+    return service
+
+
+def source_store(source: SheetSource = DEFAULT_SOURCE) -> EventStore:
+    """Get the event store that is the local cache of a source"""
+    if source == DEFAULT_SOURCE:
+        return EventStore()
+    return EventStore(os.path.join(CACHE_DIR, f'data.{source.name}.sqlite3'))
+
+
+def _batch_get(sources: Sequence[SheetSource], service_factory: Callable[[], Any] = None) -> Dict[str, Dict]:
+    """Get ranges of 1 spreadsheet from online source, in 1 request. Retried w/ exponential backoff on rate limit
+    & server errors.
+
+    :returns Source name -> its range, in the same form as the Sheets API `values().get` response"""
+    service = (service_factory or _get_sheets_service)()
+    result: Dict = service.spreadsheets().values().batchGet(
+        spreadsheetId=sources[0].spreadsheet_id,
+        ranges=[x.range_name for x in sources]).execute(num_retries=SHEETS_API_NUM_RETRIES)
+    return dict(zip([x.name for x in sources], result.get('valueRanges', [])))
+
+
+def get_sheets_live_many(
+    sources: Sequence[SheetSource], service_factory: Callable[[], Any] = None, max_workers: int = None
+) -> Dict[str, Dict]:
+    """Get sheet sources from online source, concurrently, w/ 1 `batchGet` request per spreadsheet
+
+    :param service_factory: Gets the Sheets API service to use, called in each thread that makes a request, as services
+     aren't thread-safe. Default: `_get_sheets_service()`. Anything w/ the same
+     `spreadsheets().values().batchGet(...).execute(num_retries=...)` interface works, e.g. a local stand-in.
+    :returns Source name -> its range, in the same form as the Sheets API `values().get` response"""
+    by_spreadsheet: Dict[str, List[SheetSource]] = {}
+    for source in sources:
+        by_spreadsheet.setdefault(source.spreadsheet_id, []).append(source)
+    if len(by_spreadsheet) <= 1:
+        return _batch_get(sources, service_factory) if sources else {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        batches = executor.map(lambda x: _batch_get(x, service_factory), by_spreadsheet.values())
+        return {name: result for batch in batches for name, result in batch.items()}
+
+
+def _read_json(path: str) -> Dict:
+    """Read a JSON file. Empty if it doesn't exist."""
     try:
         with open(path) as f:
             result: Dict = json.load(f)
@@ -112,70 +199,356 @@ def _get_sheets_cache(path=GSHEET_JSON_CACHE_PATH) -> Dict:
         return {}
 
 
-def retro_date_fillna(row):
-    """Make retro timestmap
+def _write_sheets_cache(result: Dict, sync_state: Dict, store: EventStore, start_row=0):
+    """Write sheet rows from `start_row` (0 is the 1st row after the header) onward & sync state to the event store, in
+    1 transaction"""
+    values: List[List[str]] = result.get('values', [])
+    rows: List[List[str]] = values[1 + start_row:]
+    timestamps, _n_failures = parse_datetime_col(
+        pd.Series([row[0] if row else '' for row in rows], dtype=object), DATETIME_FORMATS['Timestamp'])
+    store.write_responses(
+        values[0] if values else [], rows, list(timestamps), start_row,
+        meta={'sync_state': sync_state, 'response': {k: v for k, v in result.items() if k != 'values'}})
+
+
+def _get_sheets_cache(store: EventStore = None, import_legacy=True) -> Dict:
+    """Get sheets from local cache, i.e. the event store. If empty, imports the legacy JSON cache, if any.
+
+    :param import_legacy: False for stores of sources other than `DEFAULT_SOURCE`, which the legacy cache isn't of.
+    :returns The sheet, in the same form as the Sheets API `values().get` response. Empty if no cache."""
+    store = store or EventStore()
+    values: List[List[str]] = store.values()
+    if not values and import_legacy:
+        legacy: Dict = _read_json(GSHEET_JSON_CACHE_PATH)
+        if not legacy.get('values'):
+            return {}
+        _write_sheets_cache(legacy, _read_json(SYNC_STATE_PATH), store)
+        values = store.values()
+    return {**store.get_meta('response', {}), 'values': values}
+
+
+def _get_sync_state(store: EventStore = None) -> Dict:
+    """Get state of the last sync of the local cache w/ the sheet"""
+    return (store or EventStore()).get_meta('sync_state', {})
+
+
+def _rows_checksum(rows: List[List[str]]) -> str:
+    """Checksum of sheet rows"""
+    return hashlib.sha1(json.dumps(rows, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def _range_from_row(row_num: int, range_name: str = SAMPLE_RANGE_NAME) -> str:
+    """From a range, e.g. 'Sheet!A1:L', get the same range but starting at another row, e.g. 'Sheet!A20:L'"""
+    sheet_name, cell_range = range_name.rsplit('!', 1)
+    return sheet_name + '!' + re.sub(r'^([A-Za-z]+)\d*', r'\g<1>' + str(row_num), cell_range)
+
+
+def _get_cache_last_updated(store: EventStore = None) -> Optional[datetime]:
+    """Get latest of: (a) latest timestamp reported in cache, (b) time of last sync
+
+    Uses the max timestamp rather than the last row's, as rows aren't always sorted."""
+    store = store or EventStore()
+    candidates: List[datetime] = [store.reported_range()[1]]
+    synced_at: Optional[str] = _get_sync_state(store).get('synced_at')
+    if synced_at:
+        candidates.append(pd.Timestamp(synced_at))
+    candidates = [x for x in candidates if not pd.isnull(x)]
+    return max(candidates) if candidates else None
+
+
+def _first_changed_row(values: List[List[str]], store: EventStore) -> int:
+    """Get the 1st row (0 is the 1st row after the header) of a pulled sheet that differs from its local cache, by
+    comparing per row checksums. The number of rows if none do, & rows were only appended."""
+    if not values or values[0] != store.get_meta('header'):
+        return 0
+    rows: List[List[str]] = values[1:]
+    cached: List[str] = store.prefix_checksums()
+    pulled: List[str] = prefix_checksums(rows)
+    for i, (x, y) in enumerate(zip(cached, pulled)):
+        if x != y:
+            return i
+    return min(len(cached), len(pulled))
+
+
+def _save_sync(result: Dict, store: EventStore, start_row: Optional[int] = 0, tail_rows=SYNC_TAIL_ROWS, state=None):
+    """Write a synced sheet & the new sync state to its local cache. See: `sync_sources()`
+
+    :param start_row: 1st row that changed. If None, it was a full pull, & it's found by comparing w/ the cache.
+    :param state: Sync state before the sync"""
+    values: List[List[str]] = result.get('values', [])
+    tail_rows = min(tail_rows, len(values) - 1)  # header not part of tail
+    full_synced_at: Optional[str] = (state or {}).get('full_synced_at')
+    if start_row is None:
+        start_row = _first_changed_row(values, store)
+        full_synced_at = datetime.now().isoformat()
+    new_state = {
+        'n_rows': len(values),
+        'tail_rows': tail_rows,
+        'tail_checksum': _rows_checksum(values[len(values) - tail_rows:]) if tail_rows > 0 else None,
+        'synced_at': datetime.now().isoformat(),
+        'full_synced_at': full_synced_at,
+    }
+    _write_sheets_cache(result, new_state, store, start_row)
+
+
+def sync_sources(
+    sources: Sequence[SheetSource], full=False, service_factory: Callable[[], Any] = None, tail_rows=SYNC_TAIL_ROWS,
+    stores: Dict[str, EventStore] = None, max_workers: int = None, full_interval: timedelta = SYNC_FULL_INTERVAL
+) -> Dict[str, Dict]:
+    """Sync local caches w/ sheet sources, fetching only the rows appended since the last sync when possible
+
+    Requests each sheet from the 1st row of the previously synced tail (the last `tail_rows` rows) onward. If the rows
+    that come back where the tail was don't match its checksum, rows were edited within the tail, or inserted or
+    deleted above or within it, which shifts it (e.g. a manual sheet row), and it falls back to a full pull. An edit to
+    a row above the tail doesn't change the tail, so isn't caught that way. Instead, a full pull is done if the last
+    was more than `full_interval` ago, so such edits are picked up within that long. It also does a full pull if
+    `full`, or if there is no usable local cache / sync state.
+
+    Requests are batched: 1 per spreadsheet for all the tails, then 1 per spreadsheet for all the full pulls, sent
+    concurrently. See: `get_sheets_live_many()`
+
+    The local cache of a source is its event store. Only new rows are written to it. For a full pull, those are the
+    rows from the 1st that differs from the cache, found by comparing per row checksums, so the events of unchanged
+    rows aren't extracted again. Either way, rows & sync state are written in 1 transaction. Sources are written in
+    parallel.
+
+    :param service_factory: Gets the Sheets API service of a thread. See: `get_sheets_live_many()`
+    :param stores: Source name -> its local cache. Default: `source_store()`
+    :returns Source name -> its sheet, in the same form as the Sheets API `values().get` response."""
+    names: List[str] = [x.name for x in sources]
+    if len(set(names)) < len(names):
+        raise ValueError(f'Sheet source names must be unique: {names}')
+    stores = {x.name: (stores or {}).get(x.name) or source_store(x) for x in sources}
+    cached: Dict[str, Dict] = {
+        x.name: {} if full else _get_sheets_cache(stores[x.name], x == DEFAULT_SOURCE) for x in sources}
+    states: Dict[str, Dict] = {x.name: {} if full else _get_sync_state(stores[x.name]) for x in sources}
+    results: Dict[str, Dict] = {}
+    start_rows: Dict[str, Optional[int]] = {x.name: None for x in sources}  # 1st changed row, after the header
+
+    # Incremental: fetch tails & any new rows
+    tails: List[SheetSource] = []
+    for source in sources:
+        values, state = cached[source.name].get('values', []), states[source.name]
+        full_synced_at: Optional[str] = state.get('full_synced_at')
+        if values and state.get('n_rows') == len(values) and state.get('tail_checksum') and full_synced_at \
+                and datetime.now() - pd.Timestamp(full_synced_at) < full_interval:
+            tail_start_i: int = len(values) - state['tail_rows']
+            tails.append(source._replace(range_name=_range_from_row(tail_start_i + 1, source.range_name)))
+    for name, fetched in get_sheets_live_many(tails, service_factory, max_workers).items():
+        values, state = cached[name]['values'], states[name]
+        fetched_rows: List[List[str]] = fetched.get('values', [])
+        tail, new_rows = fetched_rows[:state['tail_rows']], fetched_rows[state['tail_rows']:]
+        if len(tail) == state['tail_rows'] and _rows_checksum(tail) == state['tail_checksum']:
+            results[name] = {**cached[name], 'values': values + new_rows}
+            start_rows[name] = len(values) - 1
+
+    # Full
+    results.update(
+        get_sheets_live_many([x for x in sources if x.name not in results], service_factory, max_workers))
+
+    # Save
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(_save_sync, results[x], stores[x], start_rows[x], tail_rows, states[x]) for x in names]
+        for future in futures:
+            future.result()
+    return results
+
+
+def sync_sheets(
+    full=False, service_factory: Callable[[], Any] = None, tail_rows=SYNC_TAIL_ROWS, store: EventStore = None,
+    source=DEFAULT_SOURCE,
+    full_interval: timedelta = SYNC_FULL_INTERVAL
+) -> Dict:
+    """Sync local cache w/ 1 sheet source. See: `sync_sources()`
+
+    :returns The sheet, in the same form as the Sheets API `values().get` response."""
+    stores: Optional[Dict[str, EventStore]] = {source.name: store} if store else None
+    return sync_sources([source], full, service_factory, tail_rows, stores, full_interval=full_interval)[source.name]
+
+
+@lru_cache(maxsize=DATETIME_FALLBACK_CACHE_SIZE)
+def _parse_datetime_str_cached(val: str) -> pd.Timestamp:
+    """Parse datetime string w/ dateutil. Memoized, as many values (e.g. retro times) repeat."""
+    try:
+        return pd.Timestamp(parse_datetime_str(val))
+    except (ValueError, OverflowError):
+        return pd.NaT
+
+
+def parse_datetime_col(col: pd.Series, formats: Sequence[str] = ()) -> Tuple[pd.Series, int]:
+    """Parse a column of datetime strings, trying explicit formats first, vectorized
+
+    Only values that don't match any of the formats fall back to dateutil, 1 unique value at a time.
+
+    :returns datetime64 Series (NaT where empty or failed to parse), and the number of non-empty values that failed to
+     parse."""
+    raw: pd.Series = col.fillna('').astype(str).str.strip()
+    parsed = pd.Series(pd.NaT, index=col.index, dtype='datetime64[ns]')
+    unparsed: pd.Series = raw != ''
+    for fmt in formats:
+        if not unparsed.any():
+            break
+        parsed = parsed.fillna(pd.to_datetime(raw[unparsed], format=fmt, errors='coerce'))
+        unparsed &= parsed.isna()
+    if unparsed.any():
+        parsed = parsed.fillna(pd.to_datetime(raw[unparsed].map(_parse_datetime_str_cached)))
+        unparsed &= parsed.isna()
+    return parsed, int(unparsed.sum())
+
+
+def _time_of_day(col: pd.Series) -> pd.Series:
+    """Get time since midnight (timedelta64) from a column of datetime.time objects, or '' if missing"""
+    if pd.api.types.is_timedelta64_dtype(col):
+        return col
+    return pd.to_timedelta(col.astype(str), errors='coerce')
+
+
+def retro_date_fillna(df: pd.DataFrame) -> pd.Series:
+    """Make retro dates, imputing any missing ones from the retro time & the time it was reported
+
+    Each case is a rule over hours (ints) of the reported timestamp and the retro time, and each rule decides how many
+    days to offset the date reported by. All rows are decided at once.
+
+    :returns datetime64 Series of dates (time 00:00). NaT if there was neither a retro date nor a retro time, or if the
+     case could not be anticipated.
     todo: for future dates/etc, would be better if I could use minutes too and not just hour calcs"""
-    retro_date = row['Retro: Date']
-    retro_time = row['Retro: Time']
-    reported_hr: int = row['Timestamp'].hour
-    if retro_date:
-        return retro_date
-    elif not retro_time:
-        return ''  # handles edge case where neither was filled out
-
-    retro_minus_reported_hrs: int = retro_time.hour - reported_hr
-    reported_betw_12am_and_latest_sleep: bool = reported_hr < LATEST_SLEEP_HR.hour
-    retro_betw_12am_and_latest_sleep: bool = retro_time.hour < LATEST_SLEEP_HR.hour
+    retro_date: pd.Series = pd.to_datetime(df['Retro: Date'], errors='coerce')
+    retro_time: pd.Series = _time_of_day(df['Retro: Time'])
+    reported: pd.Series = df['Timestamp']
+    # Handles edge case where neither was filled out: left as NaT
+    to_impute: np.ndarray = (retro_date.isna() & retro_time.notna()).to_numpy()
+
+    reported_hr: np.ndarray = reported.dt.hour.to_numpy()
+    retro_hr: np.ndarray = retro_time.dt.components['hours'].fillna(0).astype(int).to_numpy()
+    retro_minus_reported_hrs: np.ndarray = retro_hr - reported_hr
+    reported_betw_12am_and_latest_sleep: np.ndarray = reported_hr < LATEST_SLEEP_HR.hour
+    retro_betw_12am_and_latest_sleep: np.ndarray = retro_hr < LATEST_SLEEP_HR.hour
+    rep_early, retro_early = reported_betw_12am_and_latest_sleep, retro_betw_12am_and_latest_sleep
 
     # Cases: Reporting 'retro' time in the future
     # reported_in_future: 2nd 'or' clause: handles retro_time.hour >12am and reported_hr <12am,
     # ...e.g. if FUTURE_RETRO_THRESH_HRS is 2, -22 hours would be considered a future event.
-    reported_in_future: bool = \
-        retro_minus_reported_hrs <= FUTURE_RETRO_THRESH_HRS or \
-        retro_minus_reported_hrs <= FUTURE_RETRO_THRESH_HRS - 24
-    if reported_in_future:
+    reported_in_future: np.ndarray = \
+        (retro_minus_reported_hrs <= FUTURE_RETRO_THRESH_HRS) | \
+        (retro_minus_reported_hrs <= FUTURE_RETRO_THRESH_HRS - 24)
+    in_past = ~reported_in_future
+    rules: List[Tuple[np.ndarray, int]] = [
         # Example case: Current time 11am, retro time 1am
         # - not considered future event because not within `FUTURE_RETRO_THRESH_HRS`
         # Example case: Current time 11pm, retro time 2am
         # - not considered future event because not within `FUTURE_RETRO_THRESH_HRS`
         # Example case: Current time 1am, retro time 1:30am
-        if reported_betw_12am_and_latest_sleep and retro_betw_12am_and_latest_sleep:
-            return row['Timestamp'].date()
+        (reported_in_future & rep_early & retro_early, 0),
         # Example case: Current time 11pm, retro time 11:30pm
-        elif not reported_betw_12am_and_latest_sleep and not retro_betw_12am_and_latest_sleep:
-            return row['Timestamp'].date()
+        (reported_in_future & ~rep_early & ~retro_early, 0),
         # Example case: Current time 11pm, retro time 1am
-        elif not reported_betw_12am_and_latest_sleep and retro_betw_12am_and_latest_sleep:
-            return row['Timestamp'].date() + timedelta(days=1)
-        else:
-            print("Failed to anticipate case for imputing retro date. Row: ", dict(row), file=sys.stderr)
-            return ''
-
-    # Cases: Retro time in past as expected
-    # Example case: Current time 11pm, retro time 10:30pm
-    if not reported_betw_12am_and_latest_sleep and not retro_betw_12am_and_latest_sleep:
-        return row['Timestamp'].date()
-    # Example case: Current time 3am, retro time 2am
-    # Example case: Current time 1am, retro time 5am
-    # todo: 2nd case: fuzzy as to whether or not I would have reported thisa future or past, even though it doesn't
-    #  meet FUTURE_RETRO_THRESH_HRS. If I want to inteperet this as past, I would need more logic to catch the case
-    #  and chagne return to: return row['Timestamp'].date() - timedelta(days=1)
-    #  For now, this case will be handled as in the above clause; considered the same day; a future event.
-    elif reported_betw_12am_and_latest_sleep and retro_betw_12am_and_latest_sleep:
-        return row['Timestamp'].date()
-    # Example case: Current time 3am, retro time 10:30pm
-    # Example case: Current time 3am, retro time 11am
-    elif reported_betw_12am_and_latest_sleep and not retro_betw_12am_and_latest_sleep:
-        return row['Timestamp'].date() - timedelta(days=1)
-    # Example case: Current time 11pm, retro time 5am
-    # todo: fuzzy as to whether or not I would have reported this as a future event or past, even though it doesn't
-    #  meet FUTURE_RETRO_THRESH_HRS. If I want to inteperet this as future, I would change to:
-    #  return row['Timestamp'].date() + timedelta(days=1)
-    elif not reported_betw_12am_and_latest_sleep and retro_betw_12am_and_latest_sleep:
-        return row['Timestamp'].date()
-    else:
-        print("Failed to anticipate case for imputing retro date. Row: ", dict(row), file=sys.stderr)
-        return ''
+        (reported_in_future & ~rep_early & retro_early, 1),
+        # Cases: Retro time in past as expected
+        # Example case: Current time 11pm, retro time 10:30pm
+        (in_past & ~rep_early & ~retro_early, 0),
+        # Example case: Current time 3am, retro time 2am
+        # Example case: Current time 1am, retro time 5am
+        # todo: 2nd case: fuzzy as to whether or not I would have reported thisa future or past, even though it
+        #  doesn't meet FUTURE_RETRO_THRESH_HRS. If I want to inteperet this as past, I would need more logic to catch
+        #  the case and chagne offset to: -1
+        #  For now, this case will be handled as in the above clause; considered the same day; a future event.
+        (in_past & rep_early & retro_early, 0),
+        # Example case: Current time 3am, retro time 10:30pm
+        # Example case: Current time 3am, retro time 11am
+        (in_past & rep_early & ~retro_early, -1),
+        # Example case: Current time 11pm, retro time 5am
+        # todo: fuzzy as to whether or not I would have reported this as a future event or past, even though it doesn't
+        #  meet FUTURE_RETRO_THRESH_HRS. If I want to inteperet this as future, I would change offset to: 1
+        (in_past & ~rep_early & retro_early, 0),
+    ]
+    offset_days: np.ndarray = np.select([x[0] for x in rules], [x[1] for x in rules], default=np.nan)
+
+    # Report unanticipated cases
+    failed: np.ndarray = to_impute & np.isnan(offset_days)
+    for row in df[failed].to_dict(orient='records'):
+        print("Failed to anticipate case for imputing retro date. Row: ", row, file=sys.stderr)
+
+    imputed: pd.Series = reported.dt.normalize() + pd.to_timedelta(np.nan_to_num(offset_days), unit='D')
+    return retro_date.where(~to_impute, imputed.where(~failed))
+
+
+def get_sources_values(
+    sources: Sequence[SheetSource], cache_threshold_datetime: datetime = datetime.now() - timedelta(days=7),
+    ignore_gsheets_cache=False, stores: Dict[str, EventStore] = None, max_workers: int = None
+) -> Dict[str, List[List[str]]]:
+    """Get sheet rows of each source, header row 1st. Caching is as in `get_sheets_values()`, & sources whose cache
+    is too old are synced together. See: `sync_sources()`
+
+    :param stores: Source name -> its local cache. Default: `source_store()`
+    :returns Source name -> its sheet rows"""
+    stores = {x.name: (stores or {}).get(x.name) or source_store(x) for x in sources}
+    results: Dict[str, Dict] = sync_stale_sources(
+        sources, cache_threshold_datetime, ignore_gsheets_cache, stores, max_workers)
+    return {
+        x.name: (results[x.name] if x.name in results else _get_sheets_cache(stores[x.name], x == DEFAULT_SOURCE))
+        .get('values', []) for x in sources}
+
+
+def sync_stale_sources(
+    sources: Sequence[SheetSource], cache_threshold_datetime: datetime = datetime.now() - timedelta(days=7),
+    ignore_gsheets_cache=False, stores: Dict[str, EventStore] = None, max_workers: int = None
+) -> Dict[str, Dict]:
+    """Sync the local caches of sheet sources that are too old (see: `get_sheets_values()`), together. Caches that
+    aren't too old aren't read.
+
+    :param stores: Source name -> its local cache. Default: `source_store()`
+    :returns Source name -> its sheet, of each source synced. See: `sync_sources()`"""
+    stores = {x.name: (stores or {}).get(x.name) or source_store(x) for x in sources}
+    fresh: List[str] = []
+    if cache_threshold_datetime and not ignore_gsheets_cache:
+        for source in sources:
+            store: EventStore = stores[source.name]
+            if source == DEFAULT_SOURCE and not store.n_responses():
+                _get_sheets_cache(store)  # Imports the legacy cache, if any
+            last_updated: Optional[datetime] = _get_cache_last_updated(store)
+            if last_updated and last_updated > cache_threshold_datetime:
+                fresh.append(source.name)
+    to_sync: List[SheetSource] = [x for x in sources if x.name not in fresh]
+    if not to_sync:
+        return {}
+    return sync_sources(to_sync, full=ignore_gsheets_cache, stores=stores, max_workers=max_workers)
+
+
+def get_sheets_values(
+    cache_threshold_datetime: datetime = datetime.now() - timedelta(days=7), ignore_gsheets_cache=False,
+    store: EventStore = None, source=DEFAULT_SOURCE
+) -> List[List[str]]:
+    """Get sheet rows, header row 1st.
+    The default cache date is a week ago. So if the latest reported data in the
+    cached file, or the last sync, is less than 7 days ago, cache is used. Else,
+    it syncs the cache w/ live data, fetching only new rows when possible. If
+    `ignore_gsheets_cache`, it does a full download and overwrites cache.
+    The cache is the event store (see: event_store.py).
+    """
+    stores: Optional[Dict[str, EventStore]] = {source.name: store} if store else None
+    return get_sources_values([source], cache_threshold_datetime, ignore_gsheets_cache, stores)[source.name]
+
+
+def sheets_values_to_df(values: List[List[str]]) -> pd.DataFrame:
+    """From sheet rows (header row 1st), get DataFrame w/ datetime columns parsed"""
+    header = values[0]
+    # The API drops trailing empty cells, so a batch of rows may all be narrower than the header
+    values = [x + [''] * (len(header) - len(x)) if len(x) < len(header) else x for x in values[1:]]
+    df: DataFrame = pd.DataFrame(values, columns=header).fillna('')
+
+    # Convert strings to datetime64 (Timestamp), dates (datetime64, time 00:00) & times of day (timedelta64)
+    for col, formats in DATETIME_FORMATS.items():
+        parsed, n_failures = parse_datetime_col(df[col], formats)
+        if n_failures:
+            print(f'Failed to parse {n_failures} value(s) in column: {col}', file=sys.stderr)
+        if col == 'Retro: Date':
+            parsed = parsed.dt.normalize()
+        elif col == 'Retro: Time':
+            parsed = parsed - parsed.dt.normalize()
+        df[col] = parsed
+
+    return df
 
 
 def get_sheets_data_raw(
@@ -183,43 +556,17 @@ def get_sheets_data_raw(
 ) -> pd.DataFrame:
     """Shows basic usage of the Sheets API.
     Prints values from a sample spreadsheet.
-    The default cache date is a week ago. So if the last reported data in the
-    cached file is less than 7 days ago, cache is used. Else, it loads live data
-    and overwrites cache.
+    See `get_sheets_values()` for caching behavior.
     """
-    # Get data
-    result: Dict = {}
-    if cache_threshold_datetime and not ignore_gsheets_cache:
-        cached: Dict = _get_sheets_cache()
-        last_timestamp = parse_datetime_str(cached['values'][-1][0]) if cached else None
-        if last_timestamp and last_timestamp > cache_threshold_datetime:
-            result = cached
-    if not result:
-        result = _get_sheets_live()
-        with open(GSHEET_JSON_CACHE_PATH, 'w') as fp:
-            json.dump(result, fp)
-
-    # Vars
-    values: List[List[str]] = result.get('values', [])
-    header = values[0]
-    values = values[1:]
-    df: DataFrame = pd.DataFrame(values, columns=header).fillna('')
-
-    # Convert strings to datetime/date/time objects
-    df['Timestamp'] = pd.to_datetime(df['Timestamp'], infer_datetime_format=True)
-    df['Retro: Date'] = df['Retro: Date'].apply(lambda x: parse_datetime_str(x).date() if x else '')
-    df['Retro: Time'] = df['Retro: Time'].apply(lambda x: parse_datetime_str(x).time() if x else '')
-
-    return df
+    values: List[List[str]] = get_sheets_values(cache_threshold_datetime, ignore_gsheets_cache)
+    return sheets_values_to_df(values)
 
 
 def gsheets_datetime_imputations(df: pd.DataFrame) -> pd.DataFrame:
     """Imputes a lot of datetime data"""
     # Retro.Timestamp
-    df['Retro: Date'] = df.apply(retro_date_fillna, axis=1)
-    df['Retro.Timestamp'] = df.apply(
-        lambda x: parse_datetime_str(str(x['Retro: Date']) + ' ' + str(x['Retro: Time']))
-        if x['Retro: Date'] and x['Retro: Time'] else '', axis=1)
+    df['Retro: Date'] = retro_date_fillna(df)
+    df['Retro.Timestamp'] = df['Retro: Date'] + _time_of_day(df['Retro: Time'])
     return df
 
 
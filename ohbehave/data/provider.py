@@ -0,0 +1,203 @@
+"""Provide data_by_date() snapshots to the app, refreshing them in the background
+
+Stale-while-revalidate: Requests are always served the last good snapshot right away. If it is older than the TTL,
+a refresh is started in a background thread, and requests after it finishes get the new snapshot. Snapshots are
+immutable, so a callback that gets 1 snapshot and uses only it sees consistent data, even if a refresh finishes midway.
+
+W/ multiple worker processes, a shared dataset (see: shared_dataset.py) lets only 1 of them load data. The others'
+refreshes just map the latest version it published.
+"""
+import sys
+import threading
+import traceback
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+import flask
+from pandas import DataFrame
+
+from ohbehave.data.shared_dataset import SharedDataset
+from ohbehave.data.transforms.data_by_date import data_by_date
+from ohbehave.data.transforms.streaming_stats import STREAMING_STATS_VERIFY, StreamingStats
+
+DATA_REFRESH_TTL = timedelta(minutes=15)
+CHANGES_MAX_VERSIONS = 16  # Num of versions whose changed dates are kept. See: `DataProvider.changed_dates()`
+
+
+class Snapshot(NamedTuple):
+    """A version of the data. Don't mutate `df`; it is shared by all requests."""
+    version: str  # Empty if no data has loaded yet
+    df: DataFrame
+    updated_at: Optional[datetime]
+
+
+class DataProvider:
+    """Serves the last good data_by_date() snapshot, refreshing it in a background thread on a TTL
+
+    :param loader: Function that gets the data. Passed `use_cache`, `prev_df`, & `gsheets_cache_max_age`, and any
+     `loader_kwargs`. Its output's `attrs['cache_key']` is used as the snapshot version.
+    :param stats: Summary stats to update w/ each new snapshot, e.g. `StreamingStats()`. Persisted state is loaded.
+     Only updated by the process that loads data. Others load the state it saves. See: `stats_frame()`
+    :param verify_stats: Check each update of `stats` against exact stats. See: `StreamingStats.update()`
+    :param shared: Dataset shared w/ other processes. If this process is its refresher, each new snapshot is published
+     to it. Else, refreshing maps its latest version, every `shared.poll_interval`, rather than calling the loader.
+    """
+
+    def __init__(
+        self, loader: Callable[..., DataFrame] = data_by_date, ttl: timedelta = DATA_REFRESH_TTL,
+        stats: Optional[StreamingStats] = None, shared: Optional[SharedDataset] = None,
+        verify_stats=STREAMING_STATS_VERIFY, **loader_kwargs
+    ):
+        self.loader = loader
+        self.ttl = ttl
+        self.loader_kwargs = loader_kwargs
+        self.stats = stats
+        self.verify_stats = verify_stats
+        self.shared = shared
+        if stats:
+            stats.load()
+        self._stats_lock = threading.Lock()
+        self._stats_frame: Tuple[str, Optional[DataFrame]] = ('', None)  # Version, & `stats.to_frame()` of it
+        self.last_error: Optional[BaseException] = None
+        self._snapshot = Snapshot('', DataFrame(), None)
+        self._checked_at: Optional[datetime] = None
+        self._lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._listeners: List[Callable[[Snapshot], None]] = []
+        # Version -> previous version, & ISO dates whose rows differ from it
+        self._changes: 'OrderedDict[str, Tuple[str, List[str]]]' = OrderedDict()
+
+    def init_app(self, server: flask.Flask):
+        """Register w/ a Flask server, which then owns this provider"""
+        server.extensions['data_provider'] = self
+
+    def add_listener(self, listener: Callable[[Snapshot], None]):
+        """Call `listener(snapshot)` whenever a new snapshot is swapped in, e.g. to drop caches of old versions"""
+        self._listeners.append(listener)
+
+    def snapshot(self) -> Snapshot:
+        """Get last good snapshot. Starts a background refresh if none yet, or it's older than the TTL.
+
+        Nothing is loaded until this is 1st called, so no thread is started before a server forks its workers."""
+        ttl: timedelta = self.ttl if not self.shared or self.shared.is_refresher() else self.shared.poll_interval
+        if self._checked_at is None or datetime.now() - self._checked_at > ttl:
+            self.refresh_in_background()
+        return self._snapshot
+
+    def refresh_in_background(self) -> bool:
+        """Start a refresh in a background thread, unless 1 is already running
+
+        :returns True if a refresh was started"""
+        with self._lock:
+            if self._refresh_thread and self._refresh_thread.is_alive():
+                return False
+            self._refresh_thread = threading.Thread(target=self.refresh, name='DataProvider.refresh', daemon=True)
+            self._refresh_thread.start()
+        return True
+
+    def wait(self, timeout: float = None) -> Snapshot:
+        """Wait for any running refresh to finish, & get the snapshot"""
+        thread = self._refresh_thread
+        if thread:
+            thread.join(timeout)
+        return self._snapshot
+
+    def refresh(self) -> Snapshot:
+        """Load data & swap in a new snapshot. On failure, the last good snapshot is kept."""
+        prev: Snapshot = self._snapshot
+        # noinspection PyBroadException
+        try:
+            if self.shared and not self.shared.is_refresher():
+                return self._follow(prev)
+            df: DataFrame = self.loader(
+                use_cache=True, prev_df=prev.df if prev.version else None, gsheets_cache_max_age=self.ttl,
+                **self.loader_kwargs)
+            if df.attrs.get('cache_key', '') != prev.version:
+                self._update_stats(prev, df)  # Saved before publishing, so other processes find them w/ the data
+            if self.shared and df.attrs.get('cache_key') != self.shared.version():
+                self.shared.publish(df)
+        except Exception as err:  # Keep serving last good snapshot no matter what went wrong
+            self.last_error = err
+            print('Failed to refresh data. Serving last good snapshot. Error:', file=sys.stderr)
+            traceback.print_exc()
+            return prev
+        finally:
+            self._checked_at = datetime.now()
+        version: str = df.attrs.get('cache_key', '')
+        if version and version == prev.version:
+            return prev
+        self._swap(Snapshot(version, df, datetime.now()))
+        return self._snapshot
+
+    def _follow(self, prev: Snapshot) -> Snapshot:
+        """Swap in the latest version of the shared dataset, if it's new"""
+        version: str = self.shared.version()
+        if not version or version == prev.version:
+            return prev
+        df: Optional[DataFrame] = self.shared.read()
+        if df is None:  # Evicted since; a newer version has been published
+            return prev
+        self._swap(Snapshot(df.attrs.get('cache_key', version), df, datetime.now()))
+        return self._snapshot
+
+    def changed_dates(self, since_version: str) -> Optional[List[str]]:
+        """Get dates (ISO) whose rows differ between a version & the current snapshot, e.g. to update a client that has
+        the former w/ only those rows
+
+        :returns None if not known, e.g. the version is older than the last `CHANGES_MAX_VERSIONS`, or a version since
+         was a full recompute, rather than an update of the 1 before. See: `data_by_date()` `prev_df`"""
+        version: str = self._snapshot.version
+        dates = set()
+        for _ in range(len(self._changes) + 1):  # Bounded, in case data went back to an earlier version
+            if version == since_version:
+                return sorted(dates)
+            if version not in self._changes:
+                return None
+            version, changed = self._changes[version]
+            dates.update(changed)
+        return None
+
+    def _swap(self, snapshot: Snapshot):
+        """Swap in a new snapshot, & tell listeners"""
+        prev_version: Optional[str] = snapshot.df.attrs.get('prev_cache_key')
+        recomputed_dates: Optional[List[str]] = snapshot.df.attrs.get('recomputed_dates')
+        if prev_version and recomputed_dates is not None:
+            self._changes[snapshot.version] = (prev_version, recomputed_dates)
+            while len(self._changes) > CHANGES_MAX_VERSIONS:
+                self._changes.popitem(last=False)
+        self._snapshot = snapshot
+        self.last_error = None
+        for listener in self._listeners:
+            listener(snapshot)
+
+    def _update_stats(self, prev: Snapshot, df: DataFrame):
+        """Update streaming stats from the previous snapshot to new data, & persist them"""
+        if not self.stats:
+            return
+        # noinspection PyBroadException
+        try:
+            with self._stats_lock:
+                self.stats.update(prev.df if prev.version else None, df, self.verify_stats)
+            self.stats.save()
+        except Exception:  # Stats are derived; they'll be rebuilt on the next refresh
+            print('Failed to update streaming stats. Error:', file=sys.stderr)
+            traceback.print_exc()
+
+    def stats_frame(self, snapshot: Snapshot) -> Optional[DataFrame]:
+        """Get streaming stats of a snapshot, in the long form of `summary_stats()`. See: `StreamingStats.to_frame()`
+
+        :returns None if there are no stats of its version, e.g. no `stats` were passed, or the process that loads data
+         hasn't saved them"""
+        if not self.stats or not snapshot.version:
+            return None
+        with self._stats_lock:
+            version, frame = self._stats_frame
+            if version == snapshot.version:
+                return frame
+            if self.stats.version != snapshot.version and self.shared and not self.shared.is_refresher():
+                self.stats.load()
+            if self.stats.version != snapshot.version:
+                return None
+            self._stats_frame = (snapshot.version, self.stats.to_frame())
+            return self._stats_frame[1]
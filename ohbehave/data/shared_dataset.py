@@ -0,0 +1,102 @@
+"""Dataset shared by the worker processes of a server, e.g. gunicorn / uWSGI, as memory-mapped Arrow IPC files
+
+1 process, the refresher, makes the data, & publishes each new version: it writes the version's file (see:
+frame_cache.py), & then atomically swaps a pointer file to it. The others follow: they map the file the pointer is to,
+& pick up new versions by checking it, w/o making the data themselves. The refresher is whichever process holds an
+exclusive lock on a lock file, so if it exits, another 1 takes over.
+
+Numeric, datetime, & nullable int columns, & categories' codes, are mapped w/o copying (see: `read_frame()`), so
+their memory is the OS page cache, shared by all processes, rather than a copy per process. They're read-only.
+String columns & the index are Python objects in pandas, so are still copied per process. Old versions are evicted
+as in frame_cache.py. A process that still has 1 mapped can keep using it, as the OS keeps a removed file's pages
+until it's unmapped.
+"""
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import IO, Optional
+
+from pandas import DataFrame
+
+from ohbehave.config import CACHE_DIR
+from ohbehave.data.frame_cache import read_frame, write_frame
+
+# noinspection PyBroadException
+try:
+    import fcntl
+except Exception:  # Not on Windows, where there are no forking servers anyway: every process is a refresher
+    fcntl = None
+
+SHARED_DATASET_DIR = os.path.join(CACHE_DIR, 'shared')
+SHARED_DATASET_MAX_VERSIONS = 3
+SHARED_DATASET_POLL_INTERVAL = timedelta(seconds=10)  # How often followers check for a new version
+
+
+class SharedDataset:
+    """Versions of a DataFrame, published by 1 process & mapped by the others
+
+    The refresher lock is taken on 1st use, so create this before a server forks its workers, but don't use it until
+    after, or they'd all share the lock."""
+
+    def __init__(
+        self, path: str = SHARED_DATASET_DIR, max_versions: int = SHARED_DATASET_MAX_VERSIONS,
+        poll_interval: timedelta = SHARED_DATASET_POLL_INTERVAL
+    ):
+        self.path = path
+        self.max_versions = max_versions
+        self.poll_interval = poll_interval
+        self._lock_file: Optional[IO] = None
+        self._tried_lock_at: Optional[datetime] = None
+        self._thread_lock = threading.Lock()
+
+    @property
+    def _pointer_path(self) -> str:
+        """Path of the file that has the current version"""
+        return os.path.join(self.path, 'CURRENT')
+
+    def is_refresher(self) -> bool:
+        """Whether this process is the refresher. Tries to become it, if no other process is, at most every
+        `poll_interval`, so this is cheap to call per request."""
+        if self._lock_file is not None or fcntl is None:
+            return True
+        with self._thread_lock:
+            if self._lock_file is not None:
+                return True
+            if self._tried_lock_at and datetime.now() - self._tried_lock_at < self.poll_interval:
+                return False
+            self._tried_lock_at = datetime.now()
+            os.makedirs(self.path, exist_ok=True)
+            lock_file = open(os.path.join(self.path, 'refresher.lock'), 'a')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:  # Another process is the refresher
+                lock_file.close()
+                return False
+            self._lock_file = lock_file
+            return True
+
+    def version(self) -> str:
+        """Get current version. Empty if none has been published."""
+        try:
+            with open(self._pointer_path) as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return ''
+
+    def publish(self, df: DataFrame) -> str:
+        """Write a new version, & make it the current 1. Its version is `df.attrs['cache_key']`.
+
+        :returns The version"""
+        version: str = df.attrs['cache_key']
+        write_frame(df, version, self.path, self.max_versions)
+        # Write to temp file & then rename, so the pointer is always to a whole file
+        tmp_path = self._pointer_path + f'.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(version)
+        os.replace(tmp_path, self._pointer_path)
+        return version
+
+    def read(self) -> Optional[DataFrame]:
+        """Map the current version. None if none has been published, or it was just evicted."""
+        version: str = self.version()
+        return read_frame(version, self.path, zero_copy=True) if version else None
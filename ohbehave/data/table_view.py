@@ -0,0 +1,126 @@
+"""Server side paging, sorting, & filtering of a DataFrame for a Dash DataTable
+
+Rather than sending every row to the browser, the table is set to 'custom' page/sort/filter actions, and a callback
+asks for 1 page at a time. A `TableView` is made once per data version: it holds the display-ready rows, and sort
+orders by column that are computed on 1st use and then reused. A page is then a filter mask applied to a pre-sorted
+order, and a slice of it.
+
+Filter query syntax is that of the DataTable 'custom' filter UI, e.g. `{Drinks.tot} ge 3 && {Weekday} contains Fri`.
+See: https://dash.plotly.com/datatable/callbacks
+"""
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from ohbehave.data.version_cache import VersionCache
+
+TABLE_VIEW_CACHE_SIZE = 2  # Num of data versions to keep views for
+FILTER_OPERATORS = [
+    ['ge ', '>='],
+    ['le ', '<='],
+    ['lt ', '<'],
+    ['gt ', '>'],
+    ['ne ', '!='],
+    ['eq ', '='],
+    ['contains '],
+    ['datestartswith '],
+]
+_TABLE_VIEWS = VersionCache(TABLE_VIEW_CACHE_SIZE)
+
+
+def table_display_df(df: DataFrame) -> DataFrame:
+    """DataFrame for showing in a DataTable
+
+    - Timedeltas aren't JSON serializable, so they're shown as strings.
+    - float32 values are shown as they print, e.g. 1.37 rather than 1.3700000047683716."""
+    timedelta_cols = df.columns[[pd.api.types.is_timedelta64_dtype(x) for x in df.dtypes]]
+    float32_cols = df.columns[df.dtypes == 'float32']
+    return df.astype({x: str for x in timedelta_cols}) \
+        .astype({x: str for x in float32_cols}).astype({x: 'float64' for x in float32_cols}) \
+        .reset_index(drop=True)
+
+
+def to_records(df: DataFrame) -> List[Dict]:
+    """Get JSON serializable records. Nulls (NA, NaN, NaT) are None."""
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+
+def split_filter_part(filter_part: str) -> Tuple[Optional[str], Optional[str], Any]:
+    """Split 1 part of a DataTable filter query, e.g. `{Drinks.tot} ge 3`, into: column, operator, & value"""
+    for operator_type in FILTER_OPERATORS:
+        for operator in operator_type:
+            if operator in filter_part:
+                name_part, value_part = filter_part.split(operator, 1)
+                name = name_part[name_part.find('{') + 1: name_part.rfind('}')]
+                value_part = value_part.strip()
+                v0 = value_part[0] if value_part else ''
+                if v0 and v0 == value_part[-1] and v0 in ("'", '"', '`'):
+                    value = value_part[1: -1].replace('\\' + v0, v0)
+                else:
+                    try:
+                        value = float(value_part)
+                    except ValueError:
+                        value = value_part
+                return name, operator_type[0].strip(), value
+    return None, None, None
+
+
+class TableView:
+    """Pages of a DataFrame, sorted & filtered. Sort orders are computed once per column & direction."""
+
+    def __init__(self, df: DataFrame):
+        self.df: DataFrame = table_display_df(df)
+        self._orders: Dict[Tuple[str, bool], np.ndarray] = {}
+
+    def order(self, col: str, ascending=True) -> np.ndarray:
+        """Row positions, sorted by column. Nulls last."""
+        key = (col, ascending)
+        if key not in self._orders:
+            self._orders[key] = self.df[col].sort_values(
+                ascending=ascending, na_position='last', kind='mergesort').index.to_numpy()
+        return self._orders[key]
+
+    def filter_mask(self, filter_query: str = '') -> np.ndarray:
+        """Rows matching every part of a filter query"""
+        mask = np.ones(len(self.df), dtype=bool)
+        for filter_part in (filter_query or '').split(' && '):
+            col_name, operator, value = split_filter_part(filter_part)
+            if col_name not in self.df.columns:
+                continue
+            col: pd.Series = self.df[col_name]
+            if operator in ('eq', 'ne', 'lt', 'le', 'gt', 'ge'):
+                try:
+                    part_mask = getattr(col, operator)(value)
+                except (TypeError, ValueError):  # e.g. comparing a number to a string
+                    part_mask = pd.Series(operator == 'ne', index=col.index)
+            elif operator == 'contains':
+                part_mask = col.astype(str).str.contains(str(value), regex=False)
+            else:  # datestartswith
+                part_mask = col.astype(str).str.startswith(str(value))
+            mask &= part_mask.fillna(False).to_numpy(dtype=bool)
+        return mask
+
+    def page(
+        self, page_current: int = 0, page_size: int = 25, sort_by: List[Dict] = None, filter_query: str = ''
+    ) -> Tuple[List[Dict], int]:
+        """Get 1 page of records
+
+        :param sort_by: DataTable `sort_by`, e.g. [{'column_id': 'Date', 'direction': 'desc'}]. Only the 1st is used.
+        :returns records, & the total num of pages"""
+        page_current, page_size = page_current or 0, page_size or 25
+        rows: np.ndarray = np.arange(len(self.df))
+        if sort_by and sort_by[0]['column_id'] in self.df.columns:
+            rows = self.order(sort_by[0]['column_id'], sort_by[0]['direction'] == 'asc')
+        if filter_query:
+            rows = rows[self.filter_mask(filter_query)[rows]]
+        page_count: int = max(1, math.ceil(len(rows) / page_size))
+        page_rows = rows[page_current * page_size: (page_current + 1) * page_size]
+        return to_records(self.df.iloc[page_rows]), page_count
+
+
+def table_view(version: str, df: DataFrame) -> TableView:
+    """Get view for a version of the data, made on 1st use"""
+    return _TABLE_VIEWS.get(version, 'view', lambda: TableView(df))
@@ -1,442 +1,529 @@
 """Transform GoogleForms submissiond ata into a 1row=1day DataFrame
 """
-import os
-from copy import copy
-from datetime import date, datetime, time, timedelta
-from typing import Dict, List, Union
-
-from dateutil.parser import parse as parse_datetime_str
-import pickle
-
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import date, datetime, timedelta
+from functools import lru_cache, partial
+from inspect import getsourcefile
+from typing import Dict, List, Sequence, Tuple, Union
+
+import numpy as np
 import pandas as pd
-from numpy import datetime64
-from pandas import DataFrame, Timestamp
-
-from config import ASSUMPTIONS, CACHE_DIR
-from ohbehave.data.google_sheets import SRC_SHEET_FIELDS as FLD, get_sheets_data
-
-EVENT_TYPE = tuple[str, Timestamp]
+from pandas import DataFrame
+
+from ohbehave.config import ASSUMPTIONS
+from ohbehave.data.frame_cache import FRAME_CACHE_DIR, frame_cache_key, read_frame, source_version, write_frame
+from ohbehave.data.google_sheets import DEFAULT_SOURCE, SheetSource, get_sheets_values, source_store, \
+    sync_stale_sources
+from ohbehave.data.event_store import DateLike, EventStore, ResponsesState
+from ohbehave.data.transforms.events import extract_events, read_events, update_event_store
+from ohbehave.data.transforms.overlaps import ActivityIndex, drinks_during_games
+from ohbehave.data.transforms.pipeline import Stage, date_shards, run_stages
+from ohbehave.data.transforms.sessions import GAMING_ACTIVITIES, gaming_by_day, gaming_sessions, sleep_segments
+
+# Code that data_by_date() output depends on; part of its cache key
+TRANSFORM_MODULE_PATHS = [
+    __file__, getsourcefile(extract_events), getsourcefile(gaming_sessions), getsourcefile(ActivityIndex),
+    getsourcefile(get_sheets_values), getsourcefile(run_stages), getsourcefile(EventStore)]
 WEEK_DAYS = [
     "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday",
     "Sunday"]
-EVENT_INDICATOR_MAP = {
-    'GamesFriends': 'ゲイム、友達と ',
-    'GamesSolo': 'ゲイム、自己 ',
-    'Drink': '飲み物',
-    'Sleep': '寝る前',
+# Assumptions that sleep metrics depend on, other than which waking day events are in. See: sleep_metrics_by_day()
+SLEEP_METRIC_ASSUMPTIONS = [
+    'avgTimeAfterLoggingToFirstSleepIfLogged1x', 'avgTimeAfterLoggingToFirstSleepIfLogged2+',
+    'wakeEventsTimeFromWhenLikelyOnlyAlarm']
+# Days per shard, when the pipeline runs in a process pool. See: `transform_and_impute()`
+PIPELINE_SHARD_DAYS = 120
+# Column dtypes, by domain. Missing values are NA (NaT for timestamps), not ''.
+BY_DATE_SCHEMA: Dict[str, Dict[str, Union[str, pd.CategoricalDtype]]] = {
+    'Date': {
+        'Date': 'datetime64[ns]',
+        'Weekday': pd.CategoricalDtype(WEEK_DAYS, ordered=True),
+    },
+    'Games': {
+        'GamesFriends.start': 'datetime64[ns]',
+        'GamesFriends.stop': 'datetime64[ns]',
+        'GamesFriends.pct': 'float32',
+        'GamesFriends.tot': 'float32',
+        'GamesSolo.start': 'datetime64[ns]',
+        'GamesSolo.stop': 'datetime64[ns]',
+        'GamesSolo.pct': 'float32',
+        'GamesSolo.tot': 'float32',
+        'Games.tot': 'float32',
+    },
+    'Drinks': {
+        'Drinks.tot': 'Int16',
+    },
+    'Sleep': {
+        # 'Sleep.start',
+        # 'Sleep.wake',
+        # 'Sleep.startFromWakingDayStartedTime',
+        # 'Sleep.endFromWakingDayStartedTime',
+        # 'Sleep.startFromWakingDayStartedDatetime',
+        # 'Sleep.endFromWakingDayStartedDatetime',
+        # 'Sleep.durationHrsFromWakingDayStarted',
+        'Sleep.start.timestamp': 'datetime64[ns]',
+        'Sleep.end.mainSegment.timestamp': 'datetime64[ns]',
+        'Sleep.end.allSegments.timestamp': 'datetime64[ns]',
+        'Sleep.start.hr': 'Int8',
+        'Sleep.end.mainSegment.hr': 'Int8',
+        'Sleep.end.allSegments.hr': 'Int8',
+        'Sleep.duration.hrs': 'float32',
+        'Sleep.timeTookToFallAsleep.hrs': 'float32',
+        'Sleep.interruptions.natural': 'Int8',
+        'Sleep.interruptions.alarm': 'Int8',
+        'Sleep.interruptions.tot': 'Int8',
+    },
+    # Overlaps between activities: only if neither domain is excluded. See: overlaps.py
+    'Games&Drinks': {
+        'Drinks.duringGames': 'Int16',
+    },
+    'Games&Sleep': {
+        'Games.minsBeforeSleep': 'float32',
+    },
+    'Comments': {
+        'Comments.all': 'string',  # TODO: populate this column too
+    },
 }
 
 
-def _timedelta_to_hrs(delta: timedelta, decimal_places=2) -> float:
-    """From timedelta obj, get hours"""
-    return round(delta.seconds / (60 * 60), decimal_places)
-
-
-def _weekday_from_date(val: Union[str, date]) -> str:
-    """Get weekday from date"""
-    if isinstance(val, str):
-        val = parse_datetime_str(val)
-    week_num = val.weekday()
-    weekday = WEEK_DAYS[week_num]
-    return weekday
-
-
-def sleep_summary_stats(input_df: pd.DataFrame) -> pd.DataFrame:
-    """Get sleep summary stats from a data_by_date DF
-
-    Uploaded to: https://drive.google.com/drive/folders/1vlFKH_9XqGDLpO6afyu_vvHrgQ41PSZV
-
-    Codebook
-    Sleep.start.hr:	This is the time that I started sleeping for the given day. E.g. if it's Tuesday and says 3am, it
-     means I started sleeping at 3am Wednesday morning.
-    Sleep.end.mainSegment.hr:	Applies to the "main segment" of sleep. That is, if I had any naps the next day after
-     sleeping, this is when I woke up before any of those naps. This is the time that I stopped sleeping from the start
-     of sleep from a given waking day. E.g. if it's Tuesday and says 1pm, it means I stopped sleeping Wednesday at 1pm.
-    Sleep.end.allSegments.hr:	This is the end time of any sleep events I had from the starting waking day (main
-     segment, plus any naps).  E.g. if it's Tuesday and says 3pm, it means I woke up some time at Wednesday, and may /
-     may not have taken 1 or more naps, the last of which ended at 3pm.
-    Sleep.duration.hrs:	Total duration of sleep, main segment, plus any naps, starting from the original waking day,
-     and ending on the next day.
-    Sleep.interruptions.natural:	Any times that I logged that I woke up "during the night"; that is, before any alarm
-     or someone else waking me up at an expected time.
-    Sleep.interruptions.alarm:	Any excess times I logged that I woke up due to an alarm clock or other expected
-     interruption (e.g. someone waking me up). The last alarm is not considedred an interruption, but planned. So if I
-     woke up due to an alarm, then took a nap, then woke up again, the value for this would be 1.
-     Sleep.interruptions.tot:	The total of Sleep.interruptions.natural + Sleep.interruptions.alarm
-
-    todo: more stats to consider:
-    # 6	median()	Median of Values
-    # 9	mode()	Mode of Values  # val that occurs most often"""
-    stat_columns = [
-        'Sleep.start.hr',
-        'Sleep.end.mainSegment.hr',
-        'Sleep.end.allSegments.hr',
-        'Sleep.duration.hrs',
-        'Sleep.interruptions.natural',
-        'Sleep.interruptions.alarm',
-        'Sleep.interruptions.tot',
-    ]
-    weekday_map = {
-        'All': 0,
-        'Sunday': 1,
-        'Monday': 2,
-        'Tuesday': 3,
-        'Wednesday': 4,
-        'Thursday': 5,
-        'Friday': 6,
-        'Saturday': 7,
-    }
-    am_pm_cols = [
-        'Sleep.start.hr',
-        'Sleep.end.mainSegment.hr',
-        'Sleep.end.allSegments.hr',
-    ]
+@lru_cache()
+def _hrs_by_seconds(decimal_places=2) -> np.ndarray:
+    """Hours, rounded, for each num of seconds in a day. Uses round() rather than np.round(), which differs at halves,
+    e.g. 10.215 hrs"""
+    return np.array([round(x / (60 * 60), decimal_places) for x in range(24 * 60 * 60)])
 
-    # - Filter out rows with null durations / etc
-    input_df = input_df[input_df['Sleep.duration.hrs'] != '']
-
-    # Filter outliers# (see workflowy)
-    # - Sleep.duration.hrs > 16. This is where I'm drawing an arbitrary line. In reality, one of them said 32 total
-    #   ...hours with like 5 sleep interruptions.
-    input_df = input_df[input_df['Sleep.duration.hrs'] < 16]
-
-    # Generate stats
-    rows = []
-    for weekday, df_i in input_df.groupby(by='Weekday'):
-        for col in stat_columns:
-            val = round(df_i[col].mean(), 2)
-            if col in am_pm_cols:
-                val = time(hour=int(val), minute=int((val % 1) * 60)).strftime('%H:%M %p')
-            rows.append({'Weekday': weekday, 'Metric': col, 'Agg.': 'Avg', 'Value': val})
-            val = round(df_i[col].std(), 2)
-            rows.append({'Weekday': weekday, 'Metric': col, 'Agg.': 'StdDev', 'Value': val})
-    for col in stat_columns:
-        val = round(input_df[col].mean(), 2)
-        if col in am_pm_cols:
-            val = time(hour=int(val), minute=int((val % 1) * 60)).strftime('%H:%M %p')
-        rows.append({'Weekday': 'All', 'Metric': col, 'Agg.': 'Avg', 'Value': val})
-        val = round(input_df[col].std(), 2)
-        rows.append({'Weekday': 'All', 'Metric': col, 'Agg.': 'StdDev', 'Value': val})
-
-    # Formatting
-    # - Weekday numbers for sorting (kinda hacky here maybe? but w/e)
-    df = pd.DataFrame(rows)
-    df['weekday_num'] = df['Weekday'].apply(lambda x: weekday_map[x])
-    df = df.sort_values(['Agg.', 'weekday_num']).drop(columns=['weekday_num'])
 
-    return df
+def _timedelta_to_hrs(delta: pd.Series, decimal_places=2) -> pd.Series:
+    """From timedelta Series, get hours. Like timedelta.seconds, days are ignored."""
+    seconds: pd.Series = delta.dt.seconds
+    hrs = pd.Series(np.nan, index=delta.index)
+    hrs[seconds.notna()] = _hrs_by_seconds(decimal_places)[seconds.dropna().astype(int).to_numpy()]
+    return hrs
+
+
+def _data_by_date_cache_key(
+    responses: ResponsesState, exclude_gaming_data=False, exclude_alcohol_data=False, exclude_sleep_data=False
+) -> str:
+    """Cache key of a data_by_date() DataFrame: a hash of the raw sheet data (its header, & a checksum of its rows),
+    params, assumptions, & code version"""
+    code_version: str = source_version(TRANSFORM_MODULE_PATHS)
+    return frame_cache_key(
+        [responses.header, responses.n_rows, responses.checksum],
+        [exclude_gaming_data, exclude_alcohol_data, exclude_sleep_data], ASSUMPTIONS, code_version)
 
 
-# TODO: not performant
-# TODO: datetime64 column dtype
 def data_by_date(
     exclude_gaming_data=False, exclude_alcohol_data=False, exclude_sleep_data=False, ignore_gsheets_cache=False,
-    verbose=False, use_cache=False, df_cache_path=os.path.join(CACHE_DIR, 'data_by_date.pickle')
+    verbose=False, use_cache=False, cache_dir=FRAME_CACHE_DIR, prev_df: DataFrame = None,
+    gsheets_cache_max_age: timedelta = timedelta(days=7), source: SheetSource = DEFAULT_SOURCE,
+    executor: Executor = None
 ) -> DataFrame:
-    """Get data by date, 1row=1date"""
-    if use_cache:
-        file = open(df_cache_path, 'rb')
-        df = pickle.load(file)
-        file.close()
+    """Get data by date, 1row=1date
+
+    :param use_cache: If there is a cached DataFrame made from the same sheet data, params, & assumptions, and by the
+     same version of the code, use it. Either way, the result is cached. Its key is in `df.attrs['cache_key']`, which
+     can be used as a version of the data.
+    :param prev_df: A previous output of this function, made w/ the same `exclude_*` params. If passed, and the form
+     responses it was made from are unchanged, only dates affected by responses appended since are recomputed.
+    :param gsheets_cache_max_age: If the local copy of the sheet is older than this, it is synced. See:
+     `get_sheets_values()`.
+    :param source: Sheet source, e.g. 1 person's form responses
+    :param executor: If passed, e.g. a `ProcessPoolExecutor`, a full recompute runs in it. See:
+     `transform_and_impute()`
+
+    Reads events from the local copy's event store (see: events.py), which has them extracted from each form response
+    once. So neither the cache key (from the store's checksum of all rows), nor an update from `prev_df` (which reads
+    only the events of new responses & of the dates they affect), reads or parses all form responses. A sync does read
+    the local copy's rows, when it is older than `gsheets_cache_max_age`. See: `sync_sources()`
+
+    If updated from `prev_df`, `df.attrs` also has `prev_cache_key`, & `recomputed_dates` (ISO dates), so that things
+    derived from `prev_df` can be updated too. See: streaming_stats.py"""
+    store: EventStore = source_store(source)
+    sync_stale_sources(
+        [source], datetime.now() - gsheets_cache_max_age, ignore_gsheets_cache, {source.name: store})
+    responses: ResponsesState = store.responses_state()
+    cache_key: str = _data_by_date_cache_key(responses, exclude_gaming_data, exclude_alcohol_data, exclude_sleep_data)
+    df: DataFrame = read_frame(cache_key, cache_dir) if use_cache else None
+    if df is not None:
+        return df
+
+    update_event_store(store)
+    n_rows: int = responses.n_rows
+    n_prev_rows: int = prev_df.attrs.get('n_form_rows', 0) if prev_df is not None else 0
+    if n_prev_rows and n_prev_rows <= n_rows \
+            and prev_df.attrs.get('form_rows_hash') == store.prefix_checksum(n_prev_rows):
+        df = transform_and_impute_incremental(
+            prev_df, store, n_prev_rows, n_rows, exclude_gaming_data, exclude_alcohol_data, exclude_sleep_data,
+            verbose)
+        df.attrs['prev_cache_key'] = prev_df.attrs.get('cache_key')
     else:
-        df: DataFrame = get_sheets_data(datetime.now() - timedelta(days=7), ignore_gsheets_cache)
-        df = transform_and_impute(df, exclude_gaming_data, exclude_alcohol_data, exclude_sleep_data, verbose)
-        df['Date'] = df['Date'].astype(datetime64)
-        f = open(df_cache_path, 'wb')
-        pickle.dump(df, f)
-        f.close()
+        df = transform_and_impute(
+            read_events(store, end_row=n_rows), _form_dates(store, n_rows), exclude_gaming_data, exclude_alcohol_data,
+            exclude_sleep_data, verbose, executor)
+    if store.responses_state().version != responses.version:  # Synced meanwhile, e.g. by another process
+        return data_by_date(
+            exclude_gaming_data, exclude_alcohol_data, exclude_sleep_data, False, verbose, use_cache, cache_dir,
+            prev_df, gsheets_cache_max_age, source, executor)
+    df = apply_by_date_schema(df)
+    df.attrs['n_form_rows'] = n_rows
+    df.attrs['form_rows_hash'] = responses.checksum
+    df.attrs['cache_key'] = cache_key
+
+    # Cache, & return what was cached, so that results are the same whether or not they came from cache
+    write_frame(df, cache_key, cache_dir)
+    return read_frame(cache_key, cache_dir)
+
+
+def data_by_date_many(
+    sources: Sequence[SheetSource], ignore_gsheets_cache=False, gsheets_cache_max_age: timedelta = timedelta(days=7),
+    max_workers: int = None, process_pool=False, **kwargs
+) -> Dict[str, DataFrame]:
+    """Get data by date of each of several sheet sources, e.g. of each person tracked, in parallel. Sources are synced
+    1st, w/ batched requests. See: `get_sources_values()`
+
+    :param process_pool: Run the pipelines of all sources in 1 pool of `max_workers` processes, so that a backfill
+     scales w/ cores. See: `transform_and_impute()`
+    :param kwargs: Passed to `data_by_date()`
+    :returns Source name -> its DataFrame"""
+    sync_stale_sources(sources, datetime.now() - gsheets_cache_max_age, ignore_gsheets_cache, max_workers=max_workers)
+    with ProcessPoolExecutor(max_workers=max_workers) if process_pool else nullcontext() as processes, \
+            ThreadPoolExecutor(max_workers=max_workers) as threads:
+        futures = {
+            x.name: threads.submit(
+                data_by_date, gsheets_cache_max_age=gsheets_cache_max_age, source=x, executor=processes, **kwargs)
+            for x in sources}
+        return {name: future.result() for name, future in futures.items()}
+
+
+def data_by_date_range(
+    start_date: DateLike, end_date: DateLike, exclude_gaming_data=False, exclude_alcohol_data=False,
+    exclude_sleep_data=False, verbose=False, store: EventStore = None, n_rows: int = None
+) -> DataFrame:
+    """Get data by date, 1row=1date, for dates in [start_date, end_date], from the event store
+
+    Only the events those dates need are read (see: `_events_for_dates()`), via the store's indexes, so this doesn't
+    load all form responses. Rows are the same as those of `data_by_date()` from the responses last synced to the
+    store. Doesn't sync.
+
+    :param n_rows: Only use the 1st `n_rows` form responses, e.g. those a `data_by_date()` DataFrame was made from
+     (`attrs['n_form_rows']`). Default: all."""
+    store = store or EventStore()
+    update_event_store(store)
+    all_dates = pd.DatetimeIndex(_form_dates(store, n_rows))
+    if not len(all_dates):
+        return _by_date_frame([], exclude_gaming_data, exclude_alcohol_data, exclude_sleep_data)
+    start, end = pd.Timestamp(start_date).normalize(), pd.Timestamp(end_date).normalize()
+    dates: pd.DatetimeIndex = all_dates[(all_dates >= start) & (all_dates <= end)]
+
+    one_day = pd.Timedelta(days=1)
+    events: DataFrame = read_events(store, start - one_day, end + one_day, start, end + one_day, end_row=n_rows)
+    events = _events_for_dates(events, dates, all_dates)
+    df = _by_date_frame(list(dates.date), exclude_gaming_data, exclude_alcohol_data, exclude_sleep_data)
+    df = _transform_events(events, df, verbose)
+    return apply_by_date_schema(df)
+
+
+def _set_rows(df: DataFrame, values: DataFrame, fill_value=np.nan) -> DataFrame:
+    """Set columns of `df` to those of `values`, by date. Dates of `df` not in `values` are set to `fill_value`.
+
+    Each column is set as a whole, so it's a new array, rather than w/ a bulk `df.loc[dates, columns] = values`, which
+    future pandas will set in place."""
+    for col in values.columns:
+        df[col] = values[col].reindex(df.index, fill_value=fill_value)
     return df
 
 
-# todo: refactor to accept 1 df like other funcs
-def transform_gaming(input_df: pd.DataFrame, df: pd.DataFrame) -> pd.DataFrame:
-    """Transform gaming data"""
-    # - Gaming data pass 1: raw data
-    for row_i in input_df.iterrows():
-        # Setup
-        row = dict(row_i[1])
-        event = row[FLD['event']]
-        event_past = row[FLD['event_past']]
-        start_stop = row[FLD['start_stop']]
-        start_stop_past = row[FLD['start_stop_past']]
-        timestamp = row['Timestamp']
-        timestamp_past = row[FLD['timestamp_past']]
-        date_str = str(timestamp).split()[0]
-
-        # Determine target field & timestamp
-        if event == EVENT_INDICATOR_MAP['GamesFriends']:
-            target_field = 'GamesFriends.start' if start_stop == 'Start' else 'GamesFriends.stop'
-            target_timestamp = timestamp
-        elif event == EVENT_INDICATOR_MAP['GamesSolo']:
-            target_field = 'GamesSolo.start' if start_stop == 'Start' else 'GamesSolo.stop'
-            target_timestamp = timestamp
-        elif event_past == EVENT_INDICATOR_MAP['GamesFriends']:
-            target_field = 'GamesFriends.start' if start_stop_past == 'Start' else 'GamesFriends.stop'
-            target_timestamp = timestamp_past
-        elif event_past == EVENT_INDICATOR_MAP['GamesSolo']:
-            target_field = 'GamesSolo.start' if start_stop_past == 'Start' else 'GamesSolo.stop'
-            target_timestamp = timestamp_past
-        else:
-            continue  # Row has no gaming related activity
-
-        # Set values
-        # target_index = df.index[df['Date'] == date_str].tolist()[0]
-        # df.at[target_index, target_field] = target_timestamp
-        df.at[date_str, target_field] = target_timestamp
-
-    # - Gaming data pass 2: inference
-    # df2 = copy(df)
-    # for row_i in df.iterrows():  # TODO
-    #     index = row_i[0]
-    #     row = dict(row_i[1])
-    #     # TODO: timestamp: placeholder!
-    #     #  ...should check for gaming[friends/solo][start/stop] times, and for each,
-    #     #  ...produce its own date_str based on what's in that field, e.g. row['GamesFriends.start']
-    #     timestamp = row['timestamp']
-    #     date_str = str(timestamp).split()[0]
-    #     date: datetime = parse_datetime_str(date_str)
-    #
-    #     earliest_time_expected: datetime = parse_datetime_str(str(date) + ' ' + \
-    #          str(ASSUMPTIONS['gamingEarliestDailyStart']))
-    #     earliest_time_expected_next_day: datetime = \
-    #         earliest_time_expected + timedelta(days=1)
-    #
-    #     # TODO: What was I doing w/ this logic again? Should I ditch it and use something else?
-    #     # events_of_day_stamps = \
-    #     #     (input_df['Timestamp'] >= earliest_time_expected) \
-    #     #     & (input_df['Timestamp'] < earliest_time_expected_next_day)
-    #
-    #     # TODO:
-    #     inferred_missing_start_stop_time = ''
-    #     # TODO:
-    #     target_field = ''  # X.Y where X is GamesSolo or GamesStart; Y is Start or Stop
-    #
-    #     df2.at[index, target_field] = inferred_missing_start_stop_time
-    return df
+def transform_gaming(events: pd.DataFrame, df: pd.DataFrame) -> pd.DataFrame:
+    """Transform gaming data: pair starts & stops into sessions, & total them by gaming day. See: sessions.py"""
+    # Days w/ no gaming events had no gaming
+    tot_cols = ['GamesFriends.tot', 'GamesSolo.tot', 'Games.tot']
+    sessions: DataFrame = gaming_sessions(events)
+    if sessions.empty:
+        return _set_rows(df, DataFrame(columns=tot_cols), 0)
+    days: DataFrame = gaming_by_day(sessions)
+    days.index = days.index.date
+    df = _set_rows(df, days[tot_cols], 0)
+    return _set_rows(df, days.drop(columns=tot_cols))
 
 
-# todo:the Date is now the index, so don't need to look it up at end of loop
-def transform_alcohol(input_df: pd.DataFrame, df: pd.DataFrame) -> pd.DataFrame:
-    """Transform gaming data"""
-    drinks_field_new = 'Drinks.tot'
-    for row_i in input_df.iterrows():
-        # Setup
-        row = dict(row_i[1])
-        event = row[FLD['event']]
-        event_past = row[FLD['event_past']]
-        timestamp = row['Timestamp']
-        timestamp_past = row[FLD['timestamp_past']]
-        date_str = str(timestamp).split()[0]
-        date_str_past = str(timestamp_past).split()[0]
-
-        # Determine if drink & get date
-        if event == EVENT_INDICATOR_MAP['Drink']:
-            ref_date_str = date_str
-            # If in wee hours of morning past 12am, we consider drink as part of 'previous day'
-            use_prev_day_indicator_from: datetime = parse_datetime_str(
-                date_str + ' ' + '00:00:00')
-            use_prev_day_indicator_to: datetime = parse_datetime_str(
-                date_str + ' ' + str(ASSUMPTIONS['gamingEarliestDailyStart']))
-            use_prev_day: bool = \
-                use_prev_day_indicator_from <= timestamp <= use_prev_day_indicator_to
-            if use_prev_day:
-                ref_date_str = str(timestamp - timedelta(days=-1)).split()[0]
-        elif event_past == EVENT_INDICATOR_MAP['Drink']:
-            ref_date_str = date_str_past
-        else:
-            continue
-
-        # Set values
-        try:
-            target_index = df.index[df['Date'] == ref_date_str].tolist()[0]
-        except IndexError:  # TODO: remove after i fix issue where dates missing
-            target_index = df.index[df['Date'] == date_str].tolist()[0]
-        current_val = df.at[target_index, drinks_field_new]
-        current_val: int = \
-            current_val if current_val and not pd.isnull(current_val) and not pd.isna(current_val) else 0
-        df.at[target_index, drinks_field_new] = current_val + 1
-    return df
+def _drink_dates(drinks: pd.DataFrame, df: pd.DataFrame) -> pd.Series:
+    """Get by-date row date of each drink event"""
+    ref_dates = pd.Series(drinks['date'].dt.date.values, index=drinks.index)
+    # TODO: remove fallback after i fix issue where dates missing
+    return ref_dates.where(ref_dates.isin(df.index), drinks['reported'].dt.date)
 
 
-def transform_sleep(input_df: pd.DataFrame, df: pd.DataFrame, verbose=False) -> pd.DataFrame:
-    """Transform gaming data"""
-    # todo: if this is more performant, reimplement everything to use this method
-    # d = {x['Date']: x for x in df.to_dict(orient='records')}
-
-    # Attempt 2
-    # temp comment: fundamentally different than attempt 1. Will probably be different num/nature of iteration
-    # Step 1: Collect all sleep events for a each sleep start day
-    date_events_map: Dict[date, List[EVENT_TYPE]] = {}
-    for _index, row in input_df.iterrows():
-        row = dict(row)
-        # todo: duplicated code fragment here. can probably generalize between these transform_* funcs
-        # noinspection DuplicatedCode
-        event = row[FLD['event']]
-        event_past = row[FLD['event_past']]
-        start_stop = row[FLD['start_stop']]
-        start_stop_past = row[FLD['start_stop_past']]
-        timestamp = row['Timestamp']
-        timestamp_past = row[FLD['timestamp_past']]
-
-        # Determine target field & timestamp
-        if event == EVENT_INDICATOR_MAP['Sleep']:
-            target_field = 'Sleep.start' if start_stop == 'Start' else 'Sleep.wake'
-            target_timestamp = timestamp
-        elif event_past == EVENT_INDICATOR_MAP['Sleep']:
-            target_field = 'Sleep.start' if start_stop_past == 'Start' else 'Sleep.wake'
-            target_timestamp = timestamp_past
-        else:
-            continue  # Row has no related activity
-        if not target_timestamp:  # If this happens, I accidentally didn't record retro time
-            # As of 2023/02/28: was missing on these dates: 2021-11-26 (2 events), 2022-08-06
-            # print('Missing timestamp on date', timestamp.date())
-            continue
-
-        # Determine waking day date
-        # todo: I see there is a rare edge case in which I could possibly take a nap from, say, 8pm to 10pm. But,
-        #  ...I don't think I have a way of distiguisihing this from actually going to sleep for the night at 8pm
-        waking_day_date = target_timestamp.date()
-        if target_timestamp.hour < ASSUMPTIONS['sleepStartTimeFromWhenNonNap'].hour:
-            waking_day_date = target_timestamp.date() - timedelta(days=1)
-
-        # Set values
-        date_events_map.setdefault(waking_day_date, []).append((target_field, target_timestamp))
-
-    # Step 2: Parse events
-    # todo: If I don't have a sleep start OR a sleep end, find some way to ignore for the day for now
-    #  - am I already catching this case?
-    for waking_date, events in date_events_map.items():
-        dict_row = df.loc[[waking_date]].to_dict(orient='records')[0]
-        events = sorted(events, key=lambda x: x[1])  # sorts by timestamp just in case
-
-        # Get all sleep segements (main sleep event & naps)
-        # - This can involve multiple Sleep.start before an eventual Sleep.wake
-        sleep_segments: List[List[EVENT_TYPE]] = []
-        current_sleep_segment: List[EVENT_TYPE] = []
-        for event in events:
-            current_sleep_segment.append(event)
-            if event[0] == 'Sleep.wake':
-                sleep_segments.append(copy(current_sleep_segment))
-                current_sleep_segment.clear()
-
-        # todo: in future I want to explicitly impute. See Workflowy.
-        if not sleep_segments:
-            continue
-        elif sleep_segments[0][0][0] == 'Sleep.wake':  # Many cases, actually
-            if verbose:
-                print('Missing sleep start on: ', waking_date)
-            continue
-
-        dict_row['Sleep.interruptions.natural'] = 0
-        dict_row['Sleep.interruptions.alarm'] = 0
-        dict_row['Sleep.interruptions.tot'] = 0
-        dict_row['Sleep.start.timestamp'] = sleep_segments[0][0][1]
-        dict_row['Sleep.end.mainSegment.timestamp'] = sleep_segments[0][-1][1]
-        dict_row['Sleep.end.allSegments.timestamp'] = sleep_segments[-1][-1][1]
-        dict_row['Sleep.start.hr'] = sleep_segments[0][0][1].hour
-        dict_row['Sleep.end.mainSegment.hr'] = sleep_segments[0][-1][1].hour
-        dict_row['Sleep.end.allSegments.hr'] = sleep_segments[-1][-1][1].hour
-        dict_row['Sleep.duration.hrs'] = 0
-
-        # Calc duration & time taken to fall asleep (non naps)
-        for i, seg in enumerate(sleep_segments):
-            # Sleep duration
-            if i == 0:  # first/main sleep segment. typically takes a lot longer to fall sleep
-                est_post_report_sleep_delay = ASSUMPTIONS['avgTimeAfterLoggingToFirstSleepIfLogged1x'] \
-                    if len(seg) <= 2 else ASSUMPTIONS['avgTimeAfterLoggingToFirstSleepIfLogged2+']
-            else:  # nap. typically takes less time to fall asleep
-                est_post_report_sleep_delay = ASSUMPTIONS['avgTimeAfterLoggingToFirstSleepIfLogged2+']
-            try:
-                last_reported_sleep_start = seg[-2][1]
-            except IndexError:  # See: secondarySleepSegmentErr# in Workflowy
-                if verbose:
-                    print('Secondary sleep segment missing Sleep.start. Skipping: ', seg)
-                continue
-            est_actual_sleep_start = last_reported_sleep_start + est_post_report_sleep_delay
-            sleep_end = seg[-1][1]
-            duration_hrs = _timedelta_to_hrs(sleep_end - est_actual_sleep_start)
-            # if duration_hrs < 0:  # haven't seen this happen
-            #     print(f'Unexpected negative sleep duration: {duration_hrs}: ', seg)
-            dict_row['Sleep.duration.hrs'] += duration_hrs
-
-            # Time to fall asleep
-            if i == 0:  # first/main sleep segment (non nap)
-                dict_row['Sleep.timeTookToFallAsleep.hrs'] = est_post_report_sleep_delay
-
-        # Calculate wake events
-        if len(sleep_segments) > 1:
-            for seg in sleep_segments:
-                wake_time = seg[-1][1]
-                if wake_time.hour < ASSUMPTIONS['wakeEventsTimeFromWhenLikelyOnlyAlarm'].hour:
-                    dict_row['Sleep.interruptions.natural'] += 1
-                else:
-                    dict_row['Sleep.interruptions.alarm'] += 1
-                dict_row['Sleep.interruptions.tot'] += 1
-
-        df.loc[waking_date, list(dict_row.keys())] = list(dict_row.values())
+def transform_alcohol(events: pd.DataFrame, df: pd.DataFrame) -> pd.DataFrame:
+    """Transform alcohol data"""
+    drinks_field_new = 'Drinks.tot'
+    drinks = events[events['domain'] == 'Drinks']
+    ref_dates: pd.Series = _drink_dates(drinks, df)
+
+    # Set values
+    counts: pd.Series = ref_dates.value_counts()
+    return _set_rows(df, counts.to_frame(drinks_field_new))
+
+
+def sleep_metrics_by_day(
+    segments: DataFrame, assumptions: DataFrame
+) -> Tuple[pd.Series, Dict[str, np.ndarray]]:
+    """Get per day sleep metrics that depend on assumptions, for many sets of assumptions at once. Each set is a column
+    of 2D arrays, so the math is done once for all of them.
+
+    :param segments: See: `sleep_segments()`, sorted by date.
+    :param assumptions: 1 row per set, w/ columns: `SLEEP_METRIC_ASSUMPTIONS`.
+    :returns Days (the segments' unique dates), & column name -> array of shape (n days, n sets)"""
+    delay_1x: np.ndarray = pd.to_timedelta(assumptions['avgTimeAfterLoggingToFirstSleepIfLogged1x']).to_numpy()
+    delay_2plus: np.ndarray = pd.to_timedelta(assumptions['avgTimeAfterLoggingToFirstSleepIfLogged2+']).to_numpy()
+    alarm_hours = np.array([x.hour for x in assumptions['wakeEventsTimeFromWhenLikelyOnlyAlarm']])
+    dates: np.ndarray = segments['date'].to_numpy()
+    day_starts: np.ndarray = np.flatnonzero(np.r_[True, dates[1:] != dates[:-1]]) if len(dates) \
+        else np.array([], dtype=int)
+    n_segments: np.ndarray = np.diff(np.r_[day_starts, len(dates)])
+
+    # Per segment
+    # Time to fall asleep: first/main sleep segment typically takes a lot longer to fall sleep than a nap
+    is_main_1x: np.ndarray = ((segments['segment'] == 0) & (segments['size'] <= 2)).to_numpy()
+    est_post_report_sleep_delay: np.ndarray = np.where(is_main_1x[:, None], delay_1x[None, :], delay_2plus[None, :])
+    # Sleep duration. Like timedelta.seconds, days are ignored.
+    has_start: np.ndarray = (segments['size'] >= 2).to_numpy()
+    since_last_start: np.ndarray = (segments['wake'] - segments['last_reported_sleep_start']).to_numpy()
+    asleep: np.ndarray = since_last_start[:, None] - est_post_report_sleep_delay
+    seconds: np.ndarray = (asleep.astype('int64') // 10 ** 9) % (24 * 60 * 60)
+    duration_hrs: np.ndarray = np.where(has_start[:, None], _hrs_by_seconds()[seconds], 0)
+    # Wake events
+    is_natural_wake: np.ndarray = segments['wake'].dt.hour.to_numpy()[:, None] < alarm_hours[None, :]
+
+    # Per day
+    # Wake events only count as interruptions if there's > 1 segment
+    interrupted: np.ndarray = (n_segments > 1)[:, None]
+    shape = (len(day_starts), len(assumptions))
+    sums = (lambda x: np.add.reduceat(x, day_starts, axis=0)) if len(day_starts) else (lambda x: np.zeros(shape))
+    metrics = {
+        'Sleep.duration.hrs': sums(duration_hrs),
+        'Sleep.timeTookToFallAsleep.hrs':
+            np.round(est_post_report_sleep_delay[day_starts] / np.timedelta64(1, 'h'), 2),
+        'Sleep.interruptions.natural': np.where(interrupted, sums(is_natural_wake.astype(int)), 0),
+        'Sleep.interruptions.alarm': np.where(interrupted, sums((~is_natural_wake).astype(int)), 0),
+        'Sleep.interruptions.tot': np.broadcast_to(np.where(interrupted, n_segments[:, None], 0), shape),
+    }
+    return segments['date'].iloc[day_starts].reset_index(drop=True), metrics
+
+
+def transform_sleep(events: pd.DataFrame, df: pd.DataFrame, verbose=False) -> pd.DataFrame:
+    """Transform sleep data
+
+    Per segment (see: `sleep_segments()`) & per day numbers are computed in grouped passes, & written in 1 bulk
+    write."""
+    # Waking days before the 1st date reported aren't in the by-date DataFrame
+    segments: DataFrame = sleep_segments(events[events['date'].dt.date.isin(df.index)], verbose)
+    if segments.empty:
+        return df
+
+    # Per day
+    by_day_segments = segments.groupby('date', sort=True)
+    days = DataFrame({
+        'Sleep.start.timestamp': by_day_segments['first_reported_sleep_start'].first(),
+        'Sleep.end.mainSegment.timestamp': by_day_segments['wake'].first(),
+        'Sleep.end.allSegments.timestamp': by_day_segments['wake'].last(),
+    })
+    assumptions = DataFrame([{x: ASSUMPTIONS[x] for x in SLEEP_METRIC_ASSUMPTIONS}])
+    _dates, metrics = sleep_metrics_by_day(segments, assumptions)
+    for col, values in metrics.items():
+        days[col] = values[:, 0]
+    for field in ['Sleep.start', 'Sleep.end.mainSegment', 'Sleep.end.allSegments']:
+        days[field + '.hr'] = days[field + '.timestamp'].dt.hour
+    days.index = days.index.date
+    return _set_rows(df, days)
+
+
+def apply_by_date_schema(df: DataFrame) -> DataFrame:
+    """Set dtypes of by-date columns, per `BY_DATE_SCHEMA`"""
+    dtypes = {k: v for domain_cols in BY_DATE_SCHEMA.values() for k, v in domain_cols.items() if k in df.columns}
+    return df.astype(dtypes)
+
+
+def by_date_columns(exclude_gaming_data=False, exclude_alcohol_data=False, exclude_sleep_data=False) -> List[str]:
+    """Get by-date column names, w/o those of excluded domains
+
+    No domain's columns depend on another's, so the by-date DataFrame w/ domains excluded is the full 1 w/ only these
+    columns."""
+    excluded = {'Games': exclude_gaming_data, 'Drinks': exclude_alcohol_data, 'Sleep': exclude_sleep_data}
+    return [
+        col for domain, domain_cols in BY_DATE_SCHEMA.items()
+        if not any(excluded.get(x) for x in domain.split('&')) for col in domain_cols]
+
+
+def _by_date_frame(
+    dates: List[date], exclude_gaming_data=False, exclude_alcohol_data=False, exclude_sleep_data=False
+) -> DataFrame:
+    """Get a 1row=1date DataFrame for the given dates, w/ Date & Weekday set, and all other columns empty (NA)"""
+    column_names: List[str] = by_date_columns(exclude_gaming_data, exclude_alcohol_data, exclude_sleep_data)
+    df = DataFrame(index=pd.Index(dates, name='Date2', dtype=object), columns=column_names)
+
+    # Set columms: Date, Weekday
+    df['Date'] = pd.to_datetime(dates)
+    df['Weekday'] = df['Date'].dt.day_name()
+    return apply_by_date_schema(df)
+
+
+def _form_dates(store: EventStore, n_rows: int = None) -> List[date]:
+    """Get all dates from the 1st to the last date reported, including any dates w/ no responses, of the 1st `n_rows`
+    form responses in a store"""
+    # - Data isn't always sorted, so using min/max rather than 1st/last row. Sometimes I add a manual row directly to
+    #  the google sheet instead of using the form, and under some circumstances (perhaps if I added it to the
+    #  bottom?), new rows added by the form do not get inserted below it, but all get inserted above it, leading to 1
+    #  out of order row at end
+    first, last = store.reported_range(n_rows)
+    if first is None:
+        return []
+    first_date, last_date = first.date(), last.date()
+    return [first_date + timedelta(days=x) for x in range((last_date - first_date).days + 1)]
+
+
+def _date_runs(dates: pd.DatetimeIndex) -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+    """Get the 1st & last date of each run of consecutive dates, of sorted dates"""
+    if not len(dates):
+        return []
+    breaks: np.ndarray = np.flatnonzero(np.diff(dates.asi8) != pd.Timedelta(days=1).value)
+    return list(zip(dates[np.r_[0, breaks + 1]], dates[np.r_[breaks, len(dates) - 1]]))
+
+
+def transform_stages(verbose=False) -> List[Stage]:
+    """Get the domain transforms, as pipeline stages. Excluded domains' stages are skipped, as their columns aren't in
+    the frame. See: pipeline.py"""
+    return [
+        Stage('gaming', transform_gaming, list(BY_DATE_SCHEMA['Games'])),
+        Stage('alcohol', transform_alcohol, list(BY_DATE_SCHEMA['Drinks'])),
+        Stage('sleep', partial(transform_sleep, verbose=verbose), list(BY_DATE_SCHEMA['Sleep'])),
+        Stage(
+            'overlaps', transform_overlaps, list(BY_DATE_SCHEMA['Games&Drinks']) + list(BY_DATE_SCHEMA['Games&Sleep']),
+            deps=['sleep']),
+    ]
+
 
-    return df
+def _transform_events(events: DataFrame, df: DataFrame, verbose=False) -> DataFrame:
+    """Set activity data columns from events, 1 stage at a time. Only those of domains w/ columns in `df` are set, so
+    excluded domains are skipped."""
+    return run_stages(transform_stages(verbose), [(events, df)])[0]
 
 
-# TODO: not performant. I think it's these lines below. look at how i did sleep data; mighta done differently
-#         target_index = df2.index[df2['Date'] == date_str].tolist()[0]
-#         df2.at[target_index, target_field] = target_timestamp
 def transform_and_impute(
-    input_df: DataFrame, exclude_gaming_data=False, exclude_alcohol_data=False, exclude_sleep_data=False, verbose=False
+    events: DataFrame, dates: List[date], exclude_gaming_data=False, exclude_alcohol_data=False,
+    exclude_sleep_data=False, verbose=False, executor: Executor = None, shard_days: int = PIPELINE_SHARD_DAYS
 ) -> DataFrame:
-    """Add missing dates, add weekdays, set index as dates, & also imputes a lot of speicifc reporting data"""
-    # Setup
-    column_names = [
-        'Date',
-        'Weekday']
-    if not exclude_gaming_data:
-        column_names += [
-            'GamesFriends.start', 'GamesFriends.stop', 'GamesFriends.pct', 'GamesFriends.tot', 'GamesSolo.start',
-            'GamesSolo.stop', 'GamesSolo.pct', 'GamesSolo.tot', 'Games.tot']
-    if not exclude_alcohol_data:
-        column_names += [
-            'Drinks.tot']
-    if not exclude_sleep_data:
-        column_names += [
-            # 'Sleep.start',
-            # 'Sleep.wake',
-            # 'Sleep.startFromWakingDayStartedTime',
-            # 'Sleep.endFromWakingDayStartedTime',
-            # 'Sleep.startFromWakingDayStartedDatetime',
-            # 'Sleep.endFromWakingDayStartedDatetime',
-            # 'Sleep.durationHrsFromWakingDayStarted',
-            'Sleep.start.timestamp',
-            'Sleep.end.mainSegment.timestamp',
-            'Sleep.end.allSegments.timestamp',
-            'Sleep.start.hr',
-            'Sleep.end.mainSegment.hr',
-            'Sleep.end.allSegments.hr',
-            'Sleep.duration.hrs',
-            'Sleep.timeTookToFallAsleep.hrs',
-            'Sleep.interruptions.natural',
-            'Sleep.interruptions.alarm',
-            'Sleep.interruptions.tot',
-        ]
-    column_names += ['Comments.all']  # TODO: populate this column too
-    df = DataFrame(columns=column_names)
+    """Add missing dates, add weekdays, set index as dates, & also imputes a lot of speicifc reporting data
 
+    :param events: All events of the form responses. See: `extract_events()`, `read_events()`
+    :param dates: Dates of the form responses. See: `_form_dates()`
+
+    :param executor: E.g. a `ProcessPoolExecutor`. If passed, dates are split into shards of `shard_days`, & every
+     stage of every shard is a task, run as soon as the stages it depends on are done. See: `transform_stages()`
+
+    A shard is computed from the events its dates need, incl. those of neighbouring dates (see: `_events_for_dates()`),
+    as in `data_by_date_range()`, so its rows are the same as if all dates were computed at once. Sleep that spills
+    over midnight is already attributed to its waking day (see: events.py), so is in the shard of that date. Shards are
+    concatenated in date order."""
     # Set columms: Date, Weekday & fill any missing rows for any missing dates
-    # todo: Data should come in sorted but might want to add sorting just in case
-    #  - I did find an exception where it's not sorted. Sometimes I add a manual row directly to the google sheet
-    #  instead of using the form, and under some circumstances (perhaps if I added it to the bottom?), new rows added
-    #  by the form do not get inserted below it, but all get inserted above it, leading to 1 out of order row at end
-    first_date, last_date = [x.date() for x in input_df.iloc[[0, -1]]['Timestamp'].to_dict().values()]
-    df['Date'] = [first_date + timedelta(days=x) for x in range((last_date - first_date).days + 1)]
-    df['Weekday'] = df.get('Date').apply(_weekday_from_date)
-    df = df.fillna('')
-    df['Date2'] = df['Date']
-    df = df.set_index('Date2')
-
-    if not exclude_gaming_data:
-        df = transform_gaming(input_df, df)
-    if not exclude_alcohol_data:
-        df = transform_alcohol(input_df, df)
-    if not exclude_sleep_data:
-        df = transform_sleep(input_df, df, verbose)
+    all_dates = pd.DatetimeIndex(dates)
+
+    # Set columns: activity data
+    shards: List[pd.DatetimeIndex] = date_shards(all_dates, shard_days) if executor else [all_dates]
+    inputs = [
+        (_events_for_dates(events, dates, all_dates) if len(shards) > 1 else events,
+         _by_date_frame(list(dates.date), exclude_gaming_data, exclude_alcohol_data, exclude_sleep_data))
+        for dates in shards]
+    frames: List[DataFrame] = run_stages(transform_stages(verbose), inputs, executor)
+
+    return pd.concat(frames) if len(frames) > 1 else frames[0]
+
+
+def _events_for_dates(events: DataFrame, dates: pd.DatetimeIndex, all_dates: pd.DatetimeIndex) -> DataFrame:
+    """Get the events needed to compute some dates: events on those dates, or that fall back to 1 of them as the date
+    reported (see: `_drink_dates()`), & gaming events on neighbouring dates
+
+    :param all_dates: Dates of all form responses. See: `_form_dates()`"""
+    one_day = pd.Timedelta(days=1)
+    games_context_dates = dates.union(dates - one_day).union(dates + one_day)
+    falls_back: pd.Series = ~events['date'].isin(all_dates) & events['reported'].dt.normalize().isin(dates)
+    is_games_context: pd.Series = (events['domain'] == 'Games') & events['date'].isin(games_context_dates)
+    return events[events['date'].isin(dates) | falls_back | is_games_context]
+
+
+def transform_and_impute_incremental(
+    prev_df: DataFrame, store: EventStore, n_prev_rows: int, n_rows: int, exclude_gaming_data=False,
+    exclude_alcohol_data=False, exclude_sleep_data=False, verbose=False
+) -> DataFrame:
+    """Update a by-date DataFrame w/ form responses appended since it was made, only recomputing affected dates
+
+    :param prev_df: Output of `transform_and_impute()` from the 1st `n_prev_rows` form responses in `store`, made using
+     the same `exclude_*` params.
+    :param store: Event store w/ events extracted from at least its 1st `n_rows` form responses, i.e. previous ones &
+     new ones appended after them. See: `update_event_store()`
+
+    Dirty dates, which are recomputed from all of their events (old & new), are:
+    - Dates the new events are attributed to. For sleep, this is the waking day, so an event before
+     `sleepStartTimeFromWhenNonNap` dirties the previous date.
+    - Dates the new events were reported, which are used when the date an event is attributed to is outside the range.
+    - Dates not in `prev_df`, i.e. the range has grown.
+    - For old events attributed to dates not in `prev_df`, that date & the date reported, as the range now includes the
+     former. Other old events outside the range still fall back to the date reported, so don't change anything.
+    - For gaming events, the dates before & after too, as a session can be paired w/ events of, & span into,
+     neighbouring gaming days. Recomputing a date uses gaming events of its neighbouring dates for the same reason.
+
+    Only the events of new form responses, of old ones on dates new to the range, & of the runs of dirty dates (see:
+    `_events_for_dates()`) are read from the store."""
+    all_dates = pd.DatetimeIndex(_form_dates(store, n_rows))
+    prev_dates = pd.DatetimeIndex(prev_df.index)
+    new_dates: pd.DatetimeIndex = all_dates.difference(prev_dates)
+    one_day = pd.Timedelta(days=1)
+
+    # Dirty dates
+    affected_events: DataFrame = read_events(store, start_row=n_prev_rows, end_row=n_rows)
+    if len(new_dates):
+        affected_events = pd.concat([affected_events, read_events(
+            store, end_row=n_prev_rows, ranges=[(start, end, None, None) for start, end in _date_runs(new_dates)])])
+    is_games: pd.Series = affected_events['domain'] == 'Games'
+    games_dates = pd.DatetimeIndex(affected_events.loc[is_games, 'date'])
+    dirty_dates = pd.DatetimeIndex(affected_events['date']) \
+        .union(pd.DatetimeIndex(affected_events['reported'].dt.normalize())) \
+        .union(games_dates - one_day).union(games_dates + one_day) \
+        .union(new_dates) \
+        .intersection(all_dates)
+
+    # Recompute dirty dates, from the events of each run of them & its neighbouring dates
+    ranges = [(start - one_day, end + one_day, start, end + one_day) for start, end in _date_runs(dirty_dates)]
+    dirty_events: DataFrame = _events_for_dates(
+        read_events(store, end_row=n_rows, ranges=ranges), dirty_dates, all_dates) if ranges \
+        else affected_events.iloc[:0]
+    df_dirty = _by_date_frame(list(dirty_dates.date), exclude_gaming_data, exclude_alcohol_data, exclude_sleep_data)
+    df_dirty = apply_by_date_schema(_transform_events(dirty_events, df_dirty, verbose))  # As `prev_df`, to merge
+
+    # Merge
+    keep_prev_mask = prev_dates.isin(all_dates) & ~prev_dates.isin(dirty_dates)
+    df = pd.concat([prev_df[keep_prev_mask], df_dirty]).sort_index()
+    df.attrs['recomputed_dates'] = [x.isoformat() for x in df_dirty.index]
+    return df
+
 
+def transform_overlaps(events: pd.DataFrame, df: pd.DataFrame) -> pd.DataFrame:
+    """Set columns relating activities to each other, via an index of activity intervals. See: overlaps.py
+
+    Drinks.duringGames: Num of drinks during a gaming session.
+    Games.minsBeforeSleep: Minutes from the last gaming stop to sleep start (Sleep.start.timestamp), if there was
+     gaming that day, i.e. since `gamingEarliestDailyStart` on the date. Requires `transform_sleep()` to be run 1st."""
+    index = ActivityIndex.from_events(events)
+    if 'Drinks.duringGames' in df.columns:
+        drinks = events[(events['domain'] == 'Drinks') & events['timestamp'].notna()]
+        during_games: pd.Series = drinks_during_games(index, drinks)
+        counts: pd.Series = _drink_dates(drinks[during_games], df).value_counts()
+        df = _set_rows(df, counts.to_frame('Drinks.duringGames'), 0)
+    if 'Games.minsBeforeSleep' in df.columns:
+        sleep_start: pd.Series = df['Sleep.start.timestamp']
+        last_stop: pd.Series = index.last_stop_before(sleep_start, GAMING_ACTIVITIES)
+        last_stop.index = df.index
+        gaming_day_start: pd.Series = df['Date'] + pd.Timedelta(ASSUMPTIONS['gamingEarliestDailyStart'])
+        mins: pd.Series = (sleep_start - last_stop) / timedelta(minutes=1)
+        df['Games.minsBeforeSleep'] = mins.where(last_stop >= gaming_day_start).round(1)
     return df
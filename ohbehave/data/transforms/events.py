@@ -0,0 +1,168 @@
+"""Extract GoogleForms submission data into a typed, long-form event table, 1row=1event
+
+Each form response can report an event that's happening now (`A) Report event (今)`), and/or a retroactive event
+(`B) Report event (別時)`). This module classifies both columns for every response at once, using column masks, and
+produces a table that the domain transforms (gaming, alcohol, sleep) consume instead of each of them walking the
+whole form response DataFrame.
+
+Event table columns
+  row: Index of the source form response. Events are sorted by this, so iteration order matches form order.
+  domain: Games, Drinks, or Sleep.
+  activity: GamesFriends, GamesSolo, Drink, or Sleep.
+  start_stop: Start or Stop. Null for activities that don't have a duration (Drink).
+  timestamp: The effective timestamp of the event: the form timestamp if reported now, else `Retro.Timestamp`.
+  reported: The form timestamp, i.e. when the event was reported.
+  is_retro: Whether the event was reported retroactively.
+  date: The date of the row in the by-date DataFrame that the event is attributed to. Each domain has its own rule:
+    Games: The 'gaming day': date the event happened, minus 1 day if it happened before `gamingEarliestDailyStart`.
+     Falls back to the date reported if the event has no timestamp.
+    Drinks: Date the event happened. If reported now, in the wee hours of the morning before
+     `gamingEarliestDailyStart`, it is attributed to the next day. See: `_event_dates()`
+    Sleep: The 'waking day': date the event happened, minus 1 day if it happened before `sleepStartTimeFromWhenNonNap`.
+
+Events are also kept in the event store (see: event_store.py), so that a date range of them can be read w/o reading
+all form responses. See: `update_event_store()`, `read_events()`
+"""
+from datetime import time
+from inspect import getsourcefile
+from typing import Dict, List, Sequence
+
+import pandas as pd
+from pandas import DataFrame
+
+from ohbehave.config import ASSUMPTIONS
+from ohbehave.data.event_store import DateLike, EventRanges, EventStore
+from ohbehave.data.frame_cache import frame_cache_key, source_version
+from ohbehave.data.google_sheets import SRC_SHEET_FIELDS as FLD
+from ohbehave.data.google_sheets import gsheets_datetime_imputations, sheets_values_to_df
+
+EVENT_INDICATOR_MAP = {
+    'GamesFriends': 'ゲイム、友達と ',
+    'GamesSolo': 'ゲイム、自己 ',
+    'Drink': '飲み物',
+    'Sleep': '寝る前',
+}
+# Within a domain, an event reported 'now' takes precedence over a retroactive one on the same form response
+DOMAIN_ACTIVITIES: Dict[str, List[str]] = {
+    'Games': ['GamesFriends', 'GamesSolo'],
+    'Drinks': ['Drink'],
+    'Sleep': ['Sleep'],
+}
+EVENT_COLUMNS = ['row', 'domain', 'activity', 'start_stop', 'timestamp', 'reported', 'is_retro', 'date']
+
+
+def gaming_days(timestamps: pd.Series) -> pd.Series:
+    """Get gaming day (datetime64, normalized) of each timestamp. A gaming day starts at `gamingEarliestDailyStart`,
+    so a session after midnight counts toward the previous day."""
+    return (timestamps - pd.Timedelta(ASSUMPTIONS['gamingEarliestDailyStart'])).dt.normalize()
+
+
+def waking_days(timestamps: pd.Series, non_nap_start: time = None) -> pd.Series:
+    """Get waking day (datetime64, normalized) of each timestamp: its date, minus 1 day if before the hour of
+    `non_nap_start` (default: `sleepStartTimeFromWhenNonNap`)"""
+    non_nap_start = non_nap_start or ASSUMPTIONS['sleepStartTimeFromWhenNonNap']
+    dates = timestamps.dt.normalize()
+    return dates.mask(timestamps.dt.hour < non_nap_start.hour, dates - pd.Timedelta(days=1))
+
+
+def _event_dates(domain: str, timestamp: pd.Series, reported: pd.Series, is_retro: pd.Series) -> pd.Series:
+    """Get the by-date row date (datetime64, normalized) that each event is attributed to"""
+    if domain == 'Games':
+        return gaming_days(timestamp).fillna(gaming_days(reported))
+    if domain == 'Drinks':
+        dates = timestamp.dt.normalize()
+        # If in wee hours of morning past 12am, we consider drink as part of 'previous day'
+        # todo: this adds a day, as it always has (`timestamp - timedelta(days=-1)`), so it's the next day, not the
+        #  ...previous. Kept so that counts don't change; fix separately if 'previous day' is what's intended.
+        time_of_day = reported - reported.dt.normalize()
+        use_prev_day = ~is_retro & (time_of_day <= pd.Timedelta(ASSUMPTIONS['gamingEarliestDailyStart']))
+        dates = dates.mask(use_prev_day, dates - pd.Timedelta(days=-1))
+        # Retroactive drinks w/ no retro timestamp fall back to the date reported
+        return dates.fillna(reported.dt.normalize())
+    if domain == 'Sleep':
+        # todo: I see there is a rare edge case in which I could possibly take a nap from, say, 8pm to 10pm. But,
+        #  ...I don't think I have a way of distiguisihing this from actually going to sleep for the night at 8pm
+        return waking_days(timestamp)
+    raise ValueError(f'Unknown domain: {domain}')
+
+
+def extract_events(input_df: DataFrame) -> DataFrame:
+    """Classify every form response's now/retro event columns at once and get a long-form event table
+
+    Only responses reporting a known activity (see: `EVENT_INDICATOR_MAP`) produce events. A single response can
+    produce up to 1 event per domain."""
+    indicator_activity_map = {v: k for k, v in EVENT_INDICATOR_MAP.items()}
+    activity_now: pd.Series = input_df[FLD['event']].map(indicator_activity_map)
+    activity_past: pd.Series = input_df[FLD['event_past']].map(indicator_activity_map)
+    reported: pd.Series = pd.to_datetime(input_df['Timestamp'])
+    timestamp_past: pd.Series = pd.to_datetime(input_df[FLD['timestamp_past']], errors='coerce')
+    start_now: pd.Series = input_df[FLD['start_stop']] == 'Start'
+    start_past: pd.Series = input_df[FLD['start_stop_past']] == 'Start'
+
+    frames: List[DataFrame] = []
+    for domain, activities in DOMAIN_ACTIVITIES.items():
+        now_mask: pd.Series = activity_now.isin(activities)
+        past_mask: pd.Series = ~now_mask & activity_past.isin(activities)
+        is_retro: pd.Series = past_mask[now_mask | past_mask]
+        domain_df = DataFrame({
+            'row': is_retro.index,
+            'domain': domain,
+            'activity': activity_now.where(now_mask, activity_past)[is_retro.index],
+            'start_stop': start_now.where(now_mask, start_past)[is_retro.index].map({True: 'Start', False: 'Stop'}),
+            'timestamp': reported.where(now_mask, timestamp_past)[is_retro.index],
+            'reported': reported[is_retro.index],
+            'is_retro': is_retro,
+        })
+        if domain == 'Drinks':
+            domain_df['start_stop'] = None
+        domain_df['date'] = _event_dates(
+            domain, domain_df['timestamp'], domain_df['reported'], domain_df['is_retro'])
+        frames.append(domain_df)
+
+    events = pd.concat(frames, ignore_index=True).sort_values('row', kind='stable').reset_index(drop=True)
+    return _categorize(events)[EVENT_COLUMNS]
+
+
+def _categorize(events: DataFrame) -> DataFrame:
+    """Set dtypes of the string columns of an events table"""
+    events['domain'] = pd.Categorical(events['domain'], categories=list(DOMAIN_ACTIVITIES.keys()))
+    events['activity'] = pd.Categorical(events['activity'], categories=list(EVENT_INDICATOR_MAP.keys()))
+    events['start_stop'] = pd.Categorical(events['start_stop'], categories=['Start', 'Stop'])
+    return events
+
+
+def events_version() -> str:
+    """Version of the code & assumptions that events are extracted w/"""
+    return frame_cache_key(ASSUMPTIONS, source_version([__file__, getsourcefile(gsheets_datetime_imputations)]))
+
+
+def update_event_store(store: EventStore) -> int:
+    """Extract events of form responses added to the store since events were last extracted, or of all of them if
+    events were extracted by a different version (see: `events_version()`). Events are per form response, so the
+    events of old responses don't change when responses are appended.
+
+    :returns Num of form responses that events were extracted from, in the last attempt"""
+    version: str = events_version()
+    start_row: int = store.get_meta('events_n_rows', 0) if store.get_meta('events_version') == version else 0
+    responses_version: int = store.get_meta('responses_version', 0)
+    rows, values = store.responses(start_row=start_row)
+    if not rows:
+        return 0
+    input_df: DataFrame = gsheets_datetime_imputations(sheets_values_to_df(values))
+    input_df.index = rows
+    if not store.write_events(extract_events(input_df), start_row, rows[-1] + 1, version, responses_version):
+        return update_event_store(store)  # Responses were synced while extracting
+    return len(rows)
+
+
+def read_events(
+    store: EventStore, start: DateLike = None, end: DateLike = None, reported_start: DateLike = None,
+    reported_end: DateLike = None, start_row: int = None, end_row: int = None, ranges: Sequence[EventRanges] = ()
+) -> DataFrame:
+    """Read events from the store, w/ a date in [start, end], or reported in [reported_start, reported_end), or in any
+    of `ranges`, of form responses from `start_row` to `end_row` - 1. Only reads events in those ranges. Call
+    `update_event_store()` 1st.
+
+    :returns Events table, as from `extract_events()`"""
+    return _categorize(store.events(
+        start, end, reported_start, reported_end, start_row=start_row, end_row=end_row, ranges=ranges))[EVENT_COLUMNS]
@@ -0,0 +1,94 @@
+"""Index of activity intervals, for queries across activities, e.g. drinking during gaming, gaming before sleep
+
+Intervals
+  GamesFriends, GamesSolo: Gaming sessions. See: `gaming_sessions()`
+  Sleep: Sleep segments, from the last reported sleep start to the wake. See: `sleep_segments()`
+  Drink: A point in time, i.e. start == stop.
+
+The index is arrays sorted by start. No interval is longer than the longest one, so intervals overlapping [t0, t1] are
+among those starting in [t0 - longest, t1], which are found by binary search for many queries at once.
+"""
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from ohbehave.data.transforms.sessions import GAMING_ACTIVITIES, gaming_sessions, sleep_segments
+
+INTERVAL_COLUMNS = ['activity', 'start', 'stop']
+
+
+def activity_intervals(events: DataFrame) -> DataFrame:
+    """Get intervals of all activities from an events table (see: `extract_events()`)
+
+    :returns DataFrame w/ columns: `INTERVAL_COLUMNS`"""
+    segments: DataFrame = sleep_segments(events)
+    segments = segments[segments['last_reported_sleep_start'].notna()]
+    drinks: DataFrame = events[(events['domain'] == 'Drinks') & events['timestamp'].notna()]
+    intervals = pd.concat([
+        gaming_sessions(events)[INTERVAL_COLUMNS],
+        DataFrame({'activity': 'Sleep', 'start': segments['last_reported_sleep_start'], 'stop': segments['wake']}),
+        DataFrame({'activity': 'Drink', 'start': drinks['timestamp'], 'stop': drinks['timestamp']}),
+    ], ignore_index=True)
+    intervals['start'] = pd.to_datetime(intervals['start'])
+    intervals['stop'] = pd.to_datetime(intervals['stop'])
+    return intervals
+
+
+class ActivityIndex:
+    """Intervals of activities, sorted by start, for overlap queries"""
+
+    def __init__(self, intervals: DataFrame):
+        self.intervals: DataFrame = intervals.sort_values('start', kind='mergesort').reset_index(drop=True)
+        self._starts: np.ndarray = self.intervals['start'].to_numpy(dtype='datetime64[ns]')
+        self._stops: np.ndarray = self.intervals['stop'].to_numpy(dtype='datetime64[ns]')
+        self._activities: np.ndarray = self.intervals['activity'].astype(str).to_numpy()
+        self._max_duration: np.timedelta64 = (self._stops - self._starts).max() if len(self.intervals) \
+            else np.timedelta64(0, 'ns')
+
+    @classmethod
+    def from_events(cls, events: DataFrame) -> 'ActivityIndex':
+        """Make index from an events table (see: `extract_events()`)"""
+        return cls(activity_intervals(events))
+
+    def overlaps_many(
+        self, t0: Sequence, t1: Sequence = None, activities: Optional[List[str]] = None
+    ) -> DataFrame:
+        """Find intervals overlapping each of many time ranges [t0, t1], bounds inclusive
+
+        :param t1: Range ends. If not passed, ranges are points in time, t0.
+        :param activities: If passed, only intervals of these activities.
+        :returns DataFrame of matches, w/ columns: query (position in t0), interval (row of `self.intervals`)"""
+        t0 = np.asarray(pd.to_datetime(t0), dtype='datetime64[ns]')
+        t1 = t0 if t1 is None else np.asarray(pd.to_datetime(t1), dtype='datetime64[ns]')
+        lo: np.ndarray = np.searchsorted(self._starts, t0 - self._max_duration, side='left')
+        hi: np.ndarray = np.searchsorted(self._starts, t1, side='right')
+        n_candidates: np.ndarray = np.maximum(hi - lo, 0)
+        # Each query's candidates are the intervals in [lo, hi), so expand those ranges into 1 flat array
+        query: np.ndarray = np.repeat(np.arange(len(t0)), n_candidates)
+        interval: np.ndarray = np.repeat(lo, n_candidates) + (
+            np.arange(n_candidates.sum()) - np.repeat(np.cumsum(n_candidates) - n_candidates, n_candidates))
+        mask: np.ndarray = self._stops[interval] >= t0[query]
+        if activities is not None:
+            mask &= np.isin(self._activities[interval], activities)
+        return DataFrame({'query': query[mask], 'interval': interval[mask]})
+
+    def overlapping(self, t0, t1, activities: Optional[List[str]] = None) -> DataFrame:
+        """Get intervals overlapping [t0, t1], bounds inclusive"""
+        matches: DataFrame = self.overlaps_many([t0], [t1], activities)
+        return self.intervals.iloc[matches['interval']]
+
+    def last_stop_before(self, times: Sequence, activities: List[str]) -> pd.Series:
+        """For each time, get the latest stop of the activities' intervals at or before it. NaT if none."""
+        times = pd.to_datetime(pd.Series(times)).reset_index(drop=True)
+        stops: np.ndarray = np.sort(self._stops[np.isin(self._activities, activities)])
+        i: np.ndarray = np.searchsorted(stops, times.to_numpy(dtype='datetime64[ns]'), side='right') - 1
+        last_stop = pd.Series(stops[np.maximum(i, 0)] if len(stops) else pd.NaT, index=times.index)
+        return last_stop.where((i >= 0) & times.notna().to_numpy())
+
+
+def drinks_during_games(index: ActivityIndex, drinks: DataFrame) -> pd.Series:
+    """For each drink event, whether it was during a gaming session"""
+    matches: DataFrame = index.overlaps_many(drinks['timestamp'], activities=GAMING_ACTIVITIES)
+    return pd.Series(np.isin(np.arange(len(drinks)), matches['query']), index=drinks.index)
@@ -0,0 +1,81 @@
+"""Run by-date transforms as stages of a dependency graph, optionally in a process pool, & over date-range shards
+
+Stages
+  Each stage sets some by-date columns (e.g. those of 1 domain) from events, & declares the stages whose columns it
+  reads. A stage runs once all of those are done, so independent stages (e.g. gaming, alcohol, & sleep) run at the same
+  time, each in a worker process. A stage returns only its columns, & no 2 stages set the same column, so merging them
+  gives the same frame whichever finishes 1st.
+
+Shards
+  A long history can be split into date ranges (see: `date_shards()`), each w/ its own frame & the events it needs,
+  which are then stages' inputs too. See: `transform_and_impute()`
+"""
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from typing import Callable, Dict, List, NamedTuple, Sequence, Set, Tuple
+
+import pandas as pd
+from pandas import DataFrame
+
+StageInput = Tuple[DataFrame, DataFrame]  # events, by-date frame
+
+
+class Stage(NamedTuple):
+    """A by-date transform. `func` must be picklable, e.g. a module level function or a partial of one, to run in a
+    process pool."""
+    name: str
+    func: Callable[[DataFrame, DataFrame], DataFrame]  # (events, df) -> df w/ its columns set
+    columns: Sequence[str]  # Columns it sets. Skipped if none are in the frame, e.g. excluded domains.
+    deps: Sequence[str] = ()  # Stages whose columns it reads. Skipped ones count as done.
+
+
+def date_shards(dates: pd.DatetimeIndex, shard_days: int) -> List[pd.DatetimeIndex]:
+    """Split sorted, consecutive dates into ranges of up to `shard_days` days"""
+    return [dates[i:i + shard_days] for i in range(0, len(dates), shard_days)] if shard_days else [dates]
+
+
+def _run_stage(stage: Stage, events: DataFrame, df: DataFrame) -> DataFrame:
+    """Run a stage, e.g. in a worker process
+
+    :returns Only the columns it sets"""
+    return stage.func(events, df)[[x for x in stage.columns if x in df.columns]]
+
+
+def run_stages(stages: Sequence[Stage], inputs: Sequence[StageInput], executor: Executor = None) -> List[DataFrame]:
+    """Run stages on each input, e.g. each shard
+
+    :param stages: Stages, in an order where each comes after its dependencies
+    :param executor: E.g. `ProcessPoolExecutor`. Each (input, stage) is a task, & is submitted as soon as its
+     dependencies are done. If not passed, they're run 1 at a time, in order.
+    :returns Frame of each input, w/ stage columns set"""
+    by_name: Dict[str, Stage] = {}
+    for stage in stages:
+        unknown: List[str] = [x for x in stage.deps if x not in by_name]
+        if unknown:
+            raise ValueError(f'Stage {stage.name} depends on stages not before it: {unknown}')
+        by_name[stage.name] = stage
+    frames: List[DataFrame] = [df.copy() for _events, df in inputs]
+    pending: List[Tuple[int, str]] = [
+        (i, x.name) for i, df in enumerate(frames) for x in stages if any(col in df.columns for col in x.columns)]
+    done: Set[Tuple[int, str]] = {(i, x.name) for i in range(len(frames)) for x in stages} - set(pending)
+
+    def merge(i: int, name: str, result: DataFrame):
+        """Merge a stage's columns into its input's frame"""
+        frames[i][list(result.columns)] = result
+        done.add((i, name))
+
+    if executor is None:
+        for i, name in pending:
+            merge(i, name, _run_stage(by_name[name], inputs[i][0], frames[i]))
+        return frames
+
+    running: Dict[Future, Tuple[int, str]] = {}
+    while pending or running:
+        ready = [(i, name) for i, name in pending if all((i, x) in done for x in by_name[name].deps)]
+        for i, name in ready:
+            pending.remove((i, name))
+            # A copy, as the frame gets other stages' columns while this is queued
+            running[executor.submit(_run_stage, by_name[name], inputs[i][0], frames[i].copy())] = (i, name)
+        finished, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in finished:
+            merge(*running.pop(future), future.result())
+    return frames
@@ -0,0 +1,112 @@
+"""Rolling-window means & streaks of a data_by_date() DataFrame
+
+Rolling means: every window of every metric, over calendar days (dates missing from the DataFrame are gaps, not
+skipped), in 1 vectorized rolling pass per window.
+
+Streaks: runs of consecutive days meeting a condition, e.g. days w/o drinking, found by run-length encoding the
+condition. A day w/ no value doesn't meet a condition, unless its metric has a fill value (see: `ROLLING_METRICS`).
+
+Both are computed once per data version, so dashboard callbacks only look them up.
+"""
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from ohbehave.data.version_cache import VersionCache
+
+# Metric -> value of days w/ no value. None: no value, e.g. a night's sleep that wasn't logged isn't 0 hours.
+ROLLING_METRICS: Dict[str, Optional[float]] = {
+    'Drinks.tot': 0,  # No drinks reported
+    'Sleep.duration.hrs': None,
+    'Games.tot': 0,
+}
+ROLLING_WINDOWS = [7, 30]  # Days
+# Streak name -> condition that a day's values (see: `daily_values()`) must meet
+STREAKS: Dict[str, Callable[[DataFrame], pd.Series]] = {
+    'No drinks': lambda values: values['Drinks.tot'] == 0,
+    'Drinks': lambda values: values['Drinks.tot'] > 0,
+    'No gaming': lambda values: values['Games.tot'] == 0,
+    'Gaming': lambda values: values['Games.tot'] > 0,
+    'Sleep 7+ hrs': lambda values: values['Sleep.duration.hrs'] >= 7,
+}
+STREAK_COLUMNS = ['Streak', 'Current', 'Longest', 'Longest.start', 'Longest.end']
+_ROLLING = VersionCache()
+
+
+def rolling_column(metric: str, window: int) -> str:
+    """Name of a rolling mean column"""
+    return f'{metric}.mean{window}d'
+
+
+def daily_values(df: DataFrame, metrics: Sequence[str] = tuple(ROLLING_METRICS.keys())) -> DataFrame:
+    """Get metrics as float64, 1 row per calendar day from the 1st to the last date, w/ fill values applied
+
+    :returns DataFrame indexed by date (datetime64)"""
+    metrics = [x for x in metrics if x in df.columns]
+    values: DataFrame = df[metrics].astype('float64').set_axis(pd.to_datetime(df['Date']).to_numpy(), axis=0)
+    if len(values):
+        values = values.reindex(pd.date_range(values.index.min(), values.index.max(), freq='D'))
+    fill_values = {x: ROLLING_METRICS[x] for x in metrics if ROLLING_METRICS.get(x) is not None}
+    return values.fillna(fill_values)
+
+
+def rolling_means(
+    df: DataFrame, metrics: Sequence[str] = tuple(ROLLING_METRICS.keys()), windows: Sequence[int] = ROLLING_WINDOWS
+) -> DataFrame:
+    """Get trailing rolling means. A window's mean is of the days in it that have a value.
+
+    :returns DataFrame indexed by date (datetime64), w/ a column per metric & window. See: `rolling_column()`"""
+    values: DataFrame = daily_values(df, metrics)
+    frames: List[DataFrame] = [
+        values.rolling(window, min_periods=1).mean().rename(columns=lambda x, w=window: rolling_column(x, w))
+        for window in windows]
+    return pd.concat(frames, axis=1) if frames else DataFrame(index=values.index)
+
+
+def streak_lengths(df: DataFrame, names: Sequence[str] = tuple(STREAKS.keys())) -> DataFrame:
+    """Get the length of each streak as of each day, i.e. n consecutive days up to & including it meeting the
+    streak's condition. 0 if the day doesn't.
+
+    :returns DataFrame indexed by date (datetime64), w/ a column per streak"""
+    values: DataFrame = daily_values(df, ROLLING_METRICS.keys())
+    lengths = DataFrame(index=values.index)
+    for name in names:
+        met: pd.Series = STREAKS[name](values).fillna(False).astype(bool)
+        # Run-length encoding: a new run starts wherever the condition changes
+        run: pd.Series = (met != met.shift()).cumsum()
+        lengths[name] = (met.groupby(run).cumcount() + 1).where(met, 0)
+    return lengths
+
+
+def streaks(df: DataFrame, names: Sequence[str] = tuple(STREAKS.keys())) -> DataFrame:
+    """Get current & longest streaks. The current streak is the one that includes the last date. If there are ties
+    for the longest, it's the latest of them.
+
+    :returns DataFrame w/ columns: `STREAK_COLUMNS`"""
+    lengths: DataFrame = streak_lengths(df, names)
+    rows = []
+    for name in names:
+        length: pd.Series = lengths[name]
+        if not len(length) or not length.max():
+            rows.append([name, 0, 0, pd.NaT, pd.NaT])
+            continue
+        # Last max, as lengths are running counts: a run's length is greatest on its last day
+        end_pos = len(length) - 1 - int(np.argmax(length.to_numpy()[::-1]))
+        longest = int(length.iloc[end_pos])
+        rows.append([
+            name, int(length.iloc[-1]), longest, length.index[end_pos - longest + 1], length.index[end_pos]])
+    return DataFrame(rows, columns=STREAK_COLUMNS)
+
+
+def rolling_series(version: str, df: DataFrame, metric: str, window: int) -> pd.Series:
+    """Get 1 rolling mean series, indexed by date. Computed once per data version."""
+    means: DataFrame = _ROLLING.get(version, 'rolling_means', lambda: rolling_means(df))
+    column: str = rolling_column(metric, window)
+    return means[column] if column in means.columns else pd.Series(dtype=float)
+
+
+def streaks_cached(version: str, df: DataFrame) -> DataFrame:
+    """Get current & longest streaks. Computed once per data version."""
+    return _ROLLING.get(version, 'streaks', lambda: streaks(df))
@@ -0,0 +1,66 @@
+"""Roll up a data_by_date() DataFrame into day, ISO week, & month periods
+
+Every numeric metric is aggregated (sum, mean, count of non-null values) for every granularity in a single grouped
+pass. The result is cached per data version, so switching granularity / metric / aggregation is a lookup.
+"""
+from typing import List
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from ohbehave.data.version_cache import VersionCache
+
+GRANULARITIES = ['day', 'week', 'month']
+ROLLUP_AGGS = ['sum', 'mean', 'count']
+_ROLLUPS = VersionCache()
+
+
+def numeric_metrics(df: DataFrame) -> List[str]:
+    """Names of numeric metric columns"""
+    return [x for x in df.columns if pd.api.types.is_numeric_dtype(df[x]) and not pd.api.types.is_bool_dtype(df[x])]
+
+
+def _period_starts(dates: pd.Series, granularity: str) -> pd.Series:
+    """Start date of the period each date is in. Weeks are ISO weeks, which start on Monday."""
+    dates = pd.to_datetime(dates).dt.normalize()
+    if granularity == 'day':
+        return dates
+    if granularity == 'week':
+        return dates - pd.to_timedelta(dates.dt.weekday, unit='D')
+    if granularity == 'month':
+        return dates - pd.to_timedelta(dates.dt.day - 1, unit='D')
+    raise ValueError(f'Unknown granularity: {granularity}')
+
+
+def rollup(df: DataFrame) -> DataFrame:
+    """Aggregate all numeric metrics by all granularities
+
+    :returns DataFrame indexed by (granularity, period start date), w/ columns: (metric, agg)"""
+    metrics: List[str] = numeric_metrics(df)
+    if not len(df) or not metrics:
+        return DataFrame(
+            columns=pd.MultiIndex.from_product([metrics, ROLLUP_AGGS]),
+            index=pd.MultiIndex.from_arrays([[], []], names=['granularity', 'period']))
+    # As float64, so that sums of small int types don't overflow, & nulls are NaN
+    values: DataFrame = df[metrics].astype('float64').reset_index(drop=True)
+    keyed = pd.concat([
+        values.assign(granularity=x, period=_period_starts(df['Date'], x).to_numpy())
+        for x in GRANULARITIES], ignore_index=True)
+    rolled: DataFrame = keyed.groupby(['granularity', 'period'], sort=True)[metrics].agg(ROLLUP_AGGS)
+    # Sums of periods w/ no values are NaN rather than 0, so gaps show as gaps
+    for metric in metrics:
+        rolled[(metric, 'sum')] = rolled[(metric, 'sum')].where(rolled[(metric, 'count')] > 0, np.nan)
+    return rolled
+
+
+def rolled_series(rolled: DataFrame, granularity: str, metric: str, agg: str) -> pd.Series:
+    """Get 1 series of a `rollup()`, indexed by period start date. Empty if it has no such metric or granularity."""
+    if metric not in rolled.columns.get_level_values(0) or granularity not in rolled.index.get_level_values(0):
+        return pd.Series(dtype=float)
+    return rolled.loc[granularity, (metric, agg)]
+
+
+def rollup_series(version: str, df: DataFrame, granularity: str, metric: str, agg: str) -> pd.Series:
+    """Get 1 rolled up series, indexed by period start date. Rollups are computed once per data version."""
+    return rolled_series(_ROLLUPS.get(version, 'rollup', lambda: rollup(df)), granularity, metric, agg)
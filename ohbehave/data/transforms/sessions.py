@@ -0,0 +1,189 @@
+"""Sessions: activity start & stop events, as intervals
+
+Gaming sessions: pair gaming start & stop events into intervals, & total them by gaming day
+
+Pairing
+  Events are sorted once by activity & time. Consecutive events of the same kind (start or stop) are 1 run, e.g. a
+  start reported now & then again retroactively. A start run begins at its 1st start, & a stop run ends at its last
+  stop. A start run followed by a stop run of the same activity is a session, if no more than
+  `gamingMaxSessionDuration` apart. A start w/ no stop (or vice versa) is a session whose missing end is inferred:
+  `gamingAvgSessionDuration` after the start (or before the stop), but not past the activity's neighbouring event.
+
+Totals
+  Sessions are split at gaming day boundaries (`gamingEarliestDailyStart`; see: `gaming_days()`), so a session after
+  midnight counts toward the previous day, and one that runs past the boundary counts toward both. Overlapping
+  sessions are only counted once.
+
+Sleep segments: the main sleep event & naps of a waking day. See: `sleep_segments()`
+"""
+from typing import List
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from ohbehave.config import ASSUMPTIONS
+from ohbehave.data.transforms.events import DOMAIN_ACTIVITIES, gaming_days
+
+GAMING_ACTIVITIES: List[str] = DOMAIN_ACTIVITIES['Games']
+SESSION_COLUMNS = ['activity', 'start', 'stop', 'start_inferred', 'stop_inferred']
+SLEEP_SEGMENT_COLUMNS = ['date', 'segment', 'size', 'first_reported_sleep_start', 'last_reported_sleep_start', 'wake']
+
+
+def gaming_sessions(events: DataFrame) -> DataFrame:
+    """Get gaming sessions from an events table (see: `extract_events()`)
+
+    :returns DataFrame w/ columns: `SESSION_COLUMNS`, sorted by activity & start"""
+    max_duration = pd.Timedelta(ASSUMPTIONS['gamingMaxSessionDuration'])
+    avg_duration = pd.Timedelta(ASSUMPTIONS['gamingAvgSessionDuration'])
+    games = events[(events['domain'] == 'Games') & events['timestamp'].notna()]
+    games = DataFrame({
+        'activity': games['activity'].astype(str).to_numpy(),
+        'is_start': (games['start_stop'] == 'Start').to_numpy(),
+        'timestamp': games['timestamp'].to_numpy(),
+    }).sort_values(['activity', 'timestamp'], kind='mergesort').reset_index(drop=True)
+    if games.empty:
+        return DataFrame(columns=SESSION_COLUMNS)
+
+    # Runs of consecutive starts / stops
+    new_run: pd.Series = (games['activity'] != games['activity'].shift()) \
+        | (games['is_start'] != games['is_start'].shift()) \
+        | (games['timestamp'] - games['timestamp'].shift() > max_duration)
+    runs: DataFrame = games.groupby(new_run.cumsum()).agg(
+        activity=('activity', 'first'), is_start=('is_start', 'first'), first=('timestamp', 'first'),
+        last=('timestamp', 'last')).reset_index(drop=True)
+    runs['time'] = runs['first'].where(runs['is_start'], runs['last'])
+    same_activity_next: pd.Series = runs['activity'] == runs['activity'].shift(-1)
+    same_activity_prev: pd.Series = runs['activity'] == runs['activity'].shift(1)
+    next_time: pd.Series = runs['time'].shift(-1).where(same_activity_next)
+    prev_time: pd.Series = runs['time'].shift(1).where(same_activity_prev)
+
+    # Pair start runs w/ the stop run right after them
+    paired_start: pd.Series = runs['is_start'] & same_activity_next & ~runs['is_start'].shift(-1, fill_value=True) \
+        & (next_time - runs['time'] <= max_duration)
+    paired_stop: pd.Series = paired_start.shift(1, fill_value=False)
+    starts: DataFrame = runs[runs['is_start']]
+    stops: DataFrame = runs[~runs['is_start'] & ~paired_stop]  # Unpaired only; paired ones are in `starts`
+    start_paired: pd.Series = paired_start[starts.index]
+    # Inferred ends: avg duration from the known end, but not past the activity's neighbouring event
+    inferred_stop: pd.Series = starts['time'] + avg_duration
+    inferred_stop = inferred_stop.mask(next_time[starts.index] < inferred_stop, next_time[starts.index])
+    inferred_start: pd.Series = stops['time'] - avg_duration
+    inferred_start = inferred_start.mask(prev_time[stops.index] > inferred_start, prev_time[stops.index])
+    sessions = pd.concat([
+        DataFrame({
+            'activity': starts['activity'],
+            'start': starts['time'],
+            'stop': next_time[starts.index].where(start_paired, inferred_stop),
+            'start_inferred': False,
+            'stop_inferred': ~start_paired,
+        }),
+        DataFrame({
+            'activity': stops['activity'],
+            'start': inferred_start,
+            'stop': stops['time'],
+            'start_inferred': True,
+            'stop_inferred': False,
+        }),
+    ])
+    return sessions.sort_values(['activity', 'start'], kind='mergesort').reset_index(drop=True)[SESSION_COLUMNS]
+
+
+def _split_by_gaming_day(sessions: DataFrame) -> DataFrame:
+    """Split sessions at gaming day boundaries, adding column: date"""
+    day_start_offset = pd.Timedelta(ASSUMPTIONS['gamingEarliestDailyStart'])
+    first_day: pd.Series = gaming_days(sessions['start'])
+    n_days: np.ndarray = ((gaming_days(sessions['stop']) - first_day).dt.days + 1).clip(lower=1).to_numpy()
+    pieces: DataFrame = sessions.loc[sessions.index.repeat(n_days)].reset_index(drop=True)
+    nth_day: np.ndarray = np.arange(len(pieces)) - np.repeat(np.cumsum(n_days) - n_days, n_days)
+    pieces['date'] = first_day.repeat(n_days).reset_index(drop=True) + pd.to_timedelta(nth_day, unit='D')
+    day_start: pd.Series = pieces['date'] + day_start_offset
+    day_end: pd.Series = day_start + pd.Timedelta(days=1)
+    pieces['start'] = pieces['start'].where(pieces['start'] > day_start, day_start)
+    pieces['stop'] = pieces['stop'].where(pieces['stop'] < day_end, day_end)
+    return pieces
+
+
+def _union_duration(pieces: DataFrame, by: List[str]) -> pd.Series:
+    """Total duration of intervals per group, counting overlapping time once"""
+    pieces = pieces.sort_values(by + ['start'], kind='mergesort')
+    # Time before the end of the latest previous interval in the group is already counted
+    groups = [pieces[x] for x in by]
+    prev_stop: pd.Series = pieces['stop'].groupby(groups).cummax().groupby(groups).shift()
+    start: pd.Series = pieces['start'].where(prev_stop.isna() | (pieces['start'] > prev_stop), prev_stop)
+    duration: pd.Series = (pieces['stop'] - start).clip(lower=pd.Timedelta(0))
+    return duration.groupby(groups).sum()
+
+
+def gaming_by_day(sessions: DataFrame) -> DataFrame:
+    """Totals by gaming day
+
+    :returns DataFrame indexed by date, w/ columns for each gaming activity: .start (1st start), .stop (last stop),
+     .tot (hours), .pct (% of the day's friends + solo hours), & Games.tot (hours, friends & solo overlap counted once)
+    """
+    pieces: DataFrame = _split_by_gaming_day(sessions)
+    hrs = pd.Timedelta(hours=1)
+    by_activity = pieces.groupby(['date', 'activity'])
+    tot: DataFrame = (_union_duration(pieces, ['date', 'activity']) / hrs).round(2).unstack('activity')
+    start: DataFrame = by_activity['start'].min().unstack('activity')
+    stop: DataFrame = by_activity['stop'].max().unstack('activity')
+    tot, start, stop = [x.reindex(columns=GAMING_ACTIVITIES) for x in (tot, start, stop)]
+    tot = tot.fillna(0)
+    activities_tot: pd.Series = tot.sum(axis=1)
+
+    days = DataFrame(index=tot.index)
+    for activity in GAMING_ACTIVITIES:
+        days[activity + '.start'] = start[activity]
+        days[activity + '.stop'] = stop[activity]
+        days[activity + '.pct'] = (tot[activity] / activities_tot.where(activities_tot > 0) * 100).round(1)
+        days[activity + '.tot'] = tot[activity]
+    days['Games.tot'] = (_union_duration(pieces, ['date']) / hrs).round(2)
+    return days
+
+
+def sleep_segments(events: DataFrame, verbose=False) -> DataFrame:
+    """Get sleep segments (main sleep event & naps) from an events table (see: `extract_events()`)
+
+    Events are sorted once by waking day & time. A segment is the events up to & including a Sleep.wake, so it can
+    involve multiple Sleep.start before an eventual Sleep.wake. Events after the last Sleep.wake of a day aren't in a
+    segment. If the 1st segment of a day has no Sleep.start, the day has no segments.
+
+    :returns DataFrame w/ columns: `SLEEP_SEGMENT_COLUMNS`, sorted by date & segment (num within the day; 0 is the
+     main sleep event). A segment of `size` 1 has no Sleep.start, so its reported sleep starts are NaT."""
+    sleep = events[events['domain'] == 'Sleep']
+    # If this happens, I accidentally didn't record retro time
+    # As of 2023/02/28: was missing on these dates: 2021-11-26 (2 events), 2022-08-06
+    sleep = sleep[sleep['timestamp'].notna()]
+    # Stable sort, so events w/ the same timestamp stay in the order they were reported
+    sleep = sleep.sort_values(['date', 'timestamp'], kind='mergesort').reset_index(drop=True)
+
+    # Split into segments: n Sleep.wake before an event in the same day = its segment num
+    is_wake: pd.Series = sleep['start_stop'] == 'Stop'
+    by_day = is_wake.groupby(sleep['date'])
+    segment: pd.Series = by_day.cumsum() - is_wake
+    sleep = sleep.assign(is_wake=is_wake, segment=segment)[segment < by_day.transform('sum')]
+    # todo: in future I want to explicitly impute. See Workflowy.
+    # If the 1st segment has no Sleep.start, skip the day. Many cases, actually
+    first_is_wake: pd.Series = sleep.groupby('date')['is_wake'].transform('first')
+    if verbose:
+        for waking_date in sleep.loc[first_is_wake, 'date'].dt.date.unique():
+            print('Missing sleep start on: ', waking_date)
+    sleep = sleep[~first_is_wake]
+
+    # Each segment is represented by its Sleep.wake event
+    by_segment = sleep.groupby(['date', 'segment'])['timestamp']
+    size: pd.Series = by_segment.transform('size')
+    has_start: pd.Series = size >= 2
+    segments = DataFrame({
+        'date': sleep['date'],
+        'segment': sleep['segment'],
+        'size': size,
+        'first_reported_sleep_start': by_segment.transform('first').where(has_start),
+        # A wake's previous event is the last reported sleep start of its segment, if the segment has 1
+        'last_reported_sleep_start': sleep['timestamp'].shift(1).where(has_start),
+        'wake': sleep['timestamp'],
+    })[sleep['is_wake']].reset_index(drop=True)
+    if verbose:
+        for wake in segments.loc[segments['size'] < 2, 'wake']:  # See: secondarySleepSegmentErr# in Workflowy
+            print('Secondary sleep segment missing Sleep.start. Skipping: ', [('Sleep.wake', wake)])
+    return segments[SLEEP_SEGMENT_COLUMNS]
@@ -0,0 +1,241 @@
+"""Summary stats that are updated as data changes, rather than recomputed over the full history
+
+Per (dimension, group, metric), an accumulator keeps running moments (count, mean, & sum of squared deviations, i.e.
+Welford's / Chan's parallel algorithm) & a quantile sketch. The sketch buckets values on a log scale, such that any
+quantile it gives is within a relative error of `alpha` of an actual value at that rank (as in DDSketch). Both support
+removing values as well as adding them. So when data_by_date() recomputes some dates, the old values of those dates are
+removed & the new ones added, which is O(recomputed dates), not O(all dates).
+
+State is persisted next to the cache, along w/ the data version it reflects. If a DataFrame isn't an incremental update
+of that version (see: `data_by_date()` attrs `prev_cache_key` & `recomputed_dates`), stats are rebuilt from scratch.
+"""
+import json
+import math
+import os
+import sys
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from ohbehave.config import CACHE_DIR
+from ohbehave.data.transforms.rollups import numeric_metrics
+from ohbehave.data.transforms.summary_stats import DIMENSIONS, STAT_COLUMNS, _long_form, summary_stats
+
+STREAMING_STATS_PATH = os.path.join(CACHE_DIR, 'streaming_stats.json')
+# Check each update against exact stats computed from all rows. As slow as not streaming; for debugging.
+STREAMING_STATS_VERIFY = bool(os.getenv('STREAMING_STATS_VERIFY'))
+STREAMING_STATS_AGGS = ['count', 'mean', 'std', 'median', 'p25', 'p75']
+SKETCH_RELATIVE_ACCURACY = 0.01
+SKETCH_MIN_MAGNITUDE = 1e-9  # Smaller values are counted as zeros
+AccumulatorKey = Tuple[str, str, str]  # dimension, group, metric
+
+
+class Accumulator:
+    """Running moments & a quantile sketch of 1 metric in 1 group"""
+
+    def __init__(self, n=0, mean=0.0, m2=0.0, buckets: Dict[int, int] = None, zeros=0):
+        self.n = n
+        self.mean = mean
+        self.m2 = m2  # Sum of squared deviations from the mean
+        self.buckets: Dict[int, int] = buckets or {}  # Sketch: signed log bucket key -> count
+        self.zeros = zeros
+
+    def merge(self, n: int, mean: float, m2: float, sign=1):
+        """Add (sign 1) or remove (sign -1) the moments of a batch of values"""
+        if sign > 0:
+            total = self.n + n
+            delta = mean - self.mean
+            self.mean, self.m2 = self.mean + delta * n / total, self.m2 + m2 + delta ** 2 * self.n * n / total
+            self.n = total
+            return
+        rest = self.n - n
+        if rest <= 0:
+            self.n, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        rest_mean = (self.n * self.mean - n * mean) / rest
+        self.m2 = max(self.m2 - m2 - (mean - rest_mean) ** 2 * rest * n / self.n, 0.0)
+        self.n, self.mean = rest, rest_mean
+
+    def std(self) -> float:
+        """Sample standard deviation"""
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else float('nan')
+
+    def to_dict(self) -> Dict:
+        """JSON serializable state"""
+        return {'n': self.n, 'mean': self.mean, 'm2': self.m2, 'zeros': self.zeros,
+                'buckets': {str(k): v for k, v in self.buckets.items()}}
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> 'Accumulator':
+        """From `to_dict()` state"""
+        return cls(d['n'], d['mean'], d['m2'], {int(k): v for k, v in d['buckets'].items()}, d['zeros'])
+
+
+class StreamingStats:
+    """Summary stats by dimensions, updated incrementally
+
+    :param alpha: Relative accuracy of quantiles."""
+
+    def __init__(
+        self, dimensions: Sequence[str] = tuple(DIMENSIONS.keys()), alpha=SKETCH_RELATIVE_ACCURACY,
+        path=STREAMING_STATS_PATH
+    ):
+        self.dimensions: List[str] = list(dimensions)
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        # Offset of bucket keys, so that every nonzero value's key is > 0 before applying its sign. Supports
+        # magnitudes down to `SKETCH_MIN_MAGNITUDE`.
+        self._key_offset = int(math.ceil(-math.log(SKETCH_MIN_MAGNITUDE) / math.log(self.gamma)))
+        self.path = path
+        self.version = ''  # Data version (cache key) that the stats reflect
+        self.accumulators: Dict[AccumulatorKey, Accumulator] = {}
+
+    def _bucket_keys(self, values: np.ndarray) -> np.ndarray:
+        """Signed log bucket keys of values, in the same order as the values. 0 for zeros."""
+        magnitude = np.abs(values)
+        keys = np.zeros(len(values), dtype=np.int64)
+        nonzero = magnitude >= SKETCH_MIN_MAGNITUDE
+        keys[nonzero] = np.ceil(np.log(magnitude[nonzero]) / math.log(self.gamma)).astype(np.int64) + self._key_offset
+        return np.where(values < 0, -keys, keys)
+
+    def _bucket_value(self, key: int) -> float:
+        """Representative value of a bucket: within `alpha` (relative) of every value in it"""
+        return math.copysign(2 * self.gamma ** (abs(key) - self._key_offset) / (self.gamma + 1), key)
+
+    def add(self, df: DataFrame, sign=1):
+        """Add (sign 1) or remove (sign -1) the rows of a data_by_date() DataFrame, in 1 grouped pass"""
+        if not len(df):
+            return
+        long: DataFrame = _long_form(df, numeric_metrics(df), self.dimensions)
+        keys = ['Dimension', 'Group', 'Metric']
+        moments: DataFrame = long.groupby(keys, sort=False)['value'].agg(['count', 'mean', 'var'])
+        moments['m2'] = moments['var'].fillna(0) * (moments['count'] - 1)
+        for key, row in moments.iterrows():
+            self.accumulators.setdefault(key, Accumulator()).merge(int(row['count']), row['mean'], row['m2'], sign)
+        buckets: pd.Series = long.assign(bucket=self._bucket_keys(long['value'].to_numpy())) \
+            .groupby(keys + ['bucket'], sort=False).size()
+        for (dimension, group, metric, bucket), count in buckets.items():
+            acc: Accumulator = self.accumulators[(dimension, group, metric)]
+            if bucket == 0:
+                acc.zeros += sign * count
+            else:
+                acc.buckets[bucket] = acc.buckets.get(bucket, 0) + sign * count
+                if acc.buckets[bucket] <= 0:
+                    del acc.buckets[bucket]
+
+    def rebuild(self, df: DataFrame):
+        """Reset, & add all rows"""
+        self.accumulators = {}
+        self.add(df)
+        self.version = df.attrs.get('cache_key', '')
+
+    def update(self, prev_df: DataFrame, df: DataFrame, verify=False) -> bool:
+        """Update stats from `prev_df`, which they reflect, to `df`. Only recomputed dates are updated, if `df` is an
+        incremental update of `prev_df`; else stats are rebuilt.
+
+        :param verify: Check against exact stats computed from all rows, printing any mismatches to stderr.
+        :returns True if updated incrementally, or they already reflect `df`, e.g. loaded from a saved state"""
+        recomputed_dates: List[str] = df.attrs.get('recomputed_dates')
+        up_to_date: bool = bool(self.version) and self.version == df.attrs.get('cache_key')
+        incremental = bool(self.version) and prev_df is not None and recomputed_dates is not None \
+            and self.version == prev_df.attrs.get('cache_key') == df.attrs.get('prev_cache_key')
+        if up_to_date:
+            pass
+        elif incremental:
+            dates = pd.to_datetime(recomputed_dates).date
+            self.add(prev_df[prev_df.index.isin(dates)], -1)
+            self.add(df[df.index.isin(dates)])
+            self.version = df.attrs.get('cache_key', '')
+        else:
+            self.rebuild(df)
+        if verify:
+            mismatches: DataFrame = self.verify(df)
+            if len(mismatches):
+                print(f'Streaming stats mismatches ({len(mismatches)}):\n', mismatches, file=sys.stderr)
+        return up_to_date or incremental
+
+    def to_frame(self, aggs: Sequence[str] = tuple(STREAMING_STATS_AGGS)) -> DataFrame:
+        """Get stats in the long form of `summary_stats()`, in the same order: by dimension, agg, group, & metric"""
+        rows = []
+        for (dimension, group, metric), acc in self.accumulators.items():
+            if not acc.n:
+                continue
+            values = {
+                'count': acc.n, 'mean': acc.mean, 'std': acc.std(), 'median': self._quantile(acc, 0.5),
+                **{x: self._quantile(acc, int(x[1:]) / 100) for x in aggs if x.startswith('p')}}
+            rows += [[dimension, group, metric, agg, values[agg]] for agg in aggs]
+        stats = DataFrame(rows, columns=STAT_COLUMNS)
+        # Groups in the order of their dimension's categories. Those w/o a fixed order (years) sort as strings.
+        empty = DataFrame({'Date': pd.to_datetime([])})
+        group_orders: Dict[str, Dict[str, int]] = {
+            x: {group: i for i, group in enumerate(DIMENSIONS[x](empty).cat.categories)} for x in self.dimensions}
+        ranks = DataFrame({
+            'dimension': stats['Dimension'].map({x: i for i, x in enumerate(self.dimensions)}),
+            'agg': stats['Agg.'].map({x: i for i, x in enumerate(aggs)}),
+            'group': [group_orders[d].get(g, -1) for d, g in zip(stats['Dimension'], stats['Group'])],
+            'group_name': stats['Group']})
+        order = ranks.sort_values(list(ranks.columns), kind='mergesort').index  # Stable, so metrics stay in order
+        return stats.loc[order].reset_index(drop=True)
+
+    def _quantile(self, acc: Accumulator, q: float) -> float:
+        """Approximate quantile of an accumulator's values"""
+        count = acc.zeros + sum(acc.buckets.values())
+        if not count:
+            return float('nan')
+        rank = int(q * (count - 1))
+        seen = 0
+        for key in sorted(acc.buckets.keys() | {0}):
+            seen += acc.zeros if key == 0 else acc.buckets[key]
+            if seen > rank:
+                return 0.0 if key == 0 else self._bucket_value(key)
+        return float('nan')
+
+    def verify(self, df: DataFrame, rtol=1e-6) -> DataFrame:
+        """Compare against exact stats from all rows of `df`. Counts, means, & standard deviations must be within
+        `rtol`, & quantiles within `alpha` (relative) of the exact value at the same rank.
+
+        :returns Rows that don't match, w/ columns: Dimension, Group, Metric, Agg., Value, Expected"""
+        aggs = STREAMING_STATS_AGGS
+        expected: DataFrame = summary_stats(df, dimensions=self.dimensions, aggs=['count', 'mean', 'std'])
+        # Quantiles at rank floor(q * (n - 1)), as the sketch gives, rather than interpolated
+        long: DataFrame = _long_form(df, numeric_metrics(df), self.dimensions)
+        by_group = long.groupby(['Dimension', 'Group', 'Metric'])['value']
+        quantiles: List[DataFrame] = [
+            by_group.quantile(q, interpolation='lower').rename('Value').reset_index().assign(**{'Agg.': agg})
+            for agg, q in [('median', 0.5), ('p25', 0.25), ('p75', 0.75)]]
+        expected = pd.concat([expected] + quantiles, ignore_index=True)
+        merged: DataFrame = expected.merge(
+            self.to_frame(aggs), on=['Dimension', 'Group', 'Metric', 'Agg.'], how='outer', suffixes=('_exp', ''))
+        exp, val = merged['Value_exp'].astype(float), merged['Value'].astype(float)
+        is_quantile: pd.Series = merged['Agg.'].isin(['median', 'p25', 'p75'])
+        tol: pd.Series = np.where(is_quantile, self.alpha, rtol) * exp.abs() + np.where(is_quantile, 0, 1e-9)
+        ok: pd.Series = ((val - exp).abs() <= tol) | (exp.isna() & val.isna())
+        return merged[~ok].rename(columns={'Value_exp': 'Expected'})[STAT_COLUMNS + ['Expected']]
+
+    def save(self):
+        """Persist state"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        state = {
+            'version': self.version, 'dimensions': self.dimensions, 'alpha': self.alpha,
+            'accumulators': [[*k, v.to_dict()] for k, v in self.accumulators.items()]}
+        tmp_path = self.path + f'.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+    def load(self) -> bool:
+        """Load persisted state, if any was made w/ the same dimensions & alpha
+
+        :returns True if loaded"""
+        try:
+            with open(self.path, 'r') as f:
+                state: Dict = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return False
+        if state['dimensions'] != self.dimensions or state['alpha'] != self.alpha:
+            return False
+        self.version = state['version']
+        self.accumulators = {tuple(x[:3]): Accumulator.from_dict(x[3]) for x in state['accumulators']}
+        return True
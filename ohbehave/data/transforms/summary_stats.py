@@ -0,0 +1,159 @@
+"""Summary stats of a data_by_date() DataFrame, by dimensions such as weekday, month, weekend vs weekday, & year
+
+Metrics are melted into 1 long-form table, w/ 1 row per (dimension, group, metric, value), so every aggregation over
+every dimension is computed in a single grouped pass per kernel (count/mean/std/median, quantiles, & mode), rather
+than looping over groups & metrics.
+"""
+import calendar
+from datetime import time
+from typing import Callable, Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from ohbehave.data.transforms.rollups import numeric_metrics
+from ohbehave.data.version_cache import VersionCache
+
+STAT_AGGS = ['count', 'mean', 'std', 'median', 'mode', 'p25', 'p75']
+# Group labels of each dimension, in order, as an ordered categorical
+DIMENSIONS: Dict[str, Callable[[DataFrame], pd.Series]] = {
+    'All': lambda df: pd.Series(pd.Categorical(['All'] * len(df), categories=['All']), index=df.index),
+    'Weekday': lambda df: pd.Series(pd.Categorical(
+        df['Date'].dt.day_name(), categories=list(calendar.day_name), ordered=True), index=df.index),
+    'DayType': lambda df: pd.Series(pd.Categorical(
+        np.where(df['Date'].dt.weekday >= 5, 'Weekend', 'Weekday'), categories=['Weekday', 'Weekend'],
+        ordered=True), index=df.index),
+    'Month': lambda df: pd.Series(pd.Categorical(
+        df['Date'].dt.month_name(), categories=list(calendar.month_name)[1:], ordered=True), index=df.index),
+    'Year': lambda df: df['Date'].dt.year.astype(str).astype('category'),
+}
+STAT_COLUMNS = ['Dimension', 'Group', 'Metric', 'Agg.', 'Value']
+_STATS = VersionCache()
+
+
+def _long_form(df: DataFrame, metrics: List[str], dimensions: Sequence[str]) -> DataFrame:
+    """Get 1 row per (dimension, group, metric, non-null value)"""
+    values: DataFrame = df[metrics].astype('float64')
+    frames: List[DataFrame] = []
+    for dimension in dimensions:
+        groups: pd.Series = DIMENSIONS[dimension](df)
+        frames.append(values.assign(Dimension=dimension, Group=groups.astype(str), group_num=groups.cat.codes))
+    return pd.concat(frames, ignore_index=True) \
+        .melt(id_vars=['Dimension', 'Group', 'group_num'], value_vars=metrics, var_name='Metric', value_name='value') \
+        .dropna(subset=['value'])
+
+
+def summary_stats(
+    df: DataFrame, metrics: List[str] = None, dimensions: Sequence[str] = ('All', 'Weekday'),
+    aggs: Sequence[str] = tuple(STAT_AGGS)
+) -> DataFrame:
+    """Get summary stats
+
+    :param metrics: Numeric columns. Defaults to all of them.
+    :param dimensions: Keys of `DIMENSIONS`.
+    :param aggs: Any of `STAT_AGGS`. pNN is the NNth percentile. Mode is the smallest of the most common values.
+    :returns Long-form DataFrame w/ columns: `STAT_COLUMNS`. Ordered by dimension, agg, group, & then metric, in the
+     orders they were passed / are in."""
+    metrics = numeric_metrics(df) if metrics is None else metrics
+    long: DataFrame = _long_form(df, metrics, dimensions)
+    keys = ['Dimension', 'Group', 'group_num', 'Metric']
+    by_group = long.groupby(keys, sort=False)['value']
+
+    results: List[pd.Series] = []
+    basic_aggs: List[str] = [x for x in aggs if x in ('count', 'mean', 'std', 'median')]
+    if basic_aggs:
+        results.append(by_group.agg(basic_aggs).stack())
+    percentiles: List[str] = [x for x in aggs if x.startswith('p') and x[1:].isdigit()]
+    if percentiles:
+        quantiles: pd.Series = by_group.quantile([int(x[1:]) / 100 for x in percentiles])
+        quantiles.index = quantiles.index.set_levels(
+            [f'p{round(x * 100):02d}' for x in quantiles.index.levels[-1]], level=-1)
+        results.append(quantiles)
+    if 'mode' in aggs:
+        counts: DataFrame = long.groupby(keys + ['value'], sort=False).size().rename('n').reset_index()
+        counts = counts.sort_values(['n', 'value'], ascending=[False, True], kind='mergesort') \
+            .drop_duplicates(subset=keys)
+        results.append(counts.set_index(keys).assign(agg='mode').set_index('agg', append=True)['value'])
+    if not results:
+        return DataFrame(columns=STAT_COLUMNS)
+
+    stats: DataFrame = pd.concat(results).rename('Value').reset_index()
+    stats.columns = keys + ['Agg.', 'Value']
+    # Order
+    order = {
+        'Dimension': {x: i for i, x in enumerate(dimensions)},
+        'Agg.': {x: i for i, x in enumerate(aggs)},
+        'Metric': {x: i for i, x in enumerate(metrics)}}
+    stats = stats.sort_values(
+        ['Dimension', 'Agg.', 'group_num', 'Metric'], key=lambda x: x.map(order[x.name]) if x.name in order else x,
+        kind='mergesort')
+    return stats[STAT_COLUMNS].reset_index(drop=True)
+
+
+def summary_stats_cached(version: str, df: DataFrame, dimension: str) -> DataFrame:
+    """Get summary stats of all metrics by a dimension. Computed once per data version & dimension."""
+    return _STATS.get(version, ('summary_stats', dimension), lambda: summary_stats(df, dimensions=[dimension]))
+
+
+def sleep_summary_stats(input_df: pd.DataFrame) -> pd.DataFrame:
+    """Get sleep summary stats from a data_by_date DF
+
+    Uploaded to: https://drive.google.com/drive/folders/1vlFKH_9XqGDLpO6afyu_vvHrgQ41PSZV
+
+    Codebook
+    Sleep.start.hr:	This is the time that I started sleeping for the given day. E.g. if it's Tuesday and says 3am, it
+     means I started sleeping at 3am Wednesday morning.
+    Sleep.end.mainSegment.hr:	Applies to the "main segment" of sleep. That is, if I had any naps the next day after
+     sleeping, this is when I woke up before any of those naps. This is the time that I stopped sleeping from the start
+     of sleep from a given waking day. E.g. if it's Tuesday and says 1pm, it means I stopped sleeping Wednesday at 1pm.
+    Sleep.end.allSegments.hr:	This is the end time of any sleep events I had from the starting waking day (main
+     segment, plus any naps).  E.g. if it's Tuesday and says 3pm, it means I woke up some time at Wednesday, and may /
+     may not have taken 1 or more naps, the last of which ended at 3pm.
+    Sleep.duration.hrs:	Total duration of sleep, main segment, plus any naps, starting from the original waking day,
+     and ending on the next day.
+    Sleep.interruptions.natural:	Any times that I logged that I woke up "during the night"; that is, before any alarm
+     or someone else waking me up at an expected time.
+    Sleep.interruptions.alarm:	Any excess times I logged that I woke up due to an alarm clock or other expected
+     interruption (e.g. someone waking me up). The last alarm is not considedred an interruption, but planned. So if I
+     woke up due to an alarm, then took a nap, then woke up again, the value for this would be 1.
+     Sleep.interruptions.tot:	The total of Sleep.interruptions.natural + Sleep.interruptions.alarm
+
+    For more aggs (median, mode, percentiles) & dimensions, see: `summary_stats()`"""
+    stat_columns = [
+        'Sleep.start.hr',
+        'Sleep.end.mainSegment.hr',
+        'Sleep.end.allSegments.hr',
+        'Sleep.duration.hrs',
+        'Sleep.interruptions.natural',
+        'Sleep.interruptions.alarm',
+        'Sleep.interruptions.tot',
+    ]
+    am_pm_cols = [
+        'Sleep.start.hr',
+        'Sleep.end.mainSegment.hr',
+        'Sleep.end.allSegments.hr',
+    ]
+
+    # - Filter out rows with null durations / etc
+    input_df = input_df[input_df['Sleep.duration.hrs'].notna()]
+
+    # Filter outliers# (see workflowy)
+    # - Sleep.duration.hrs > 16. This is where I'm drawing an arbitrary line. In reality, one of them said 32 total
+    #   ...hours with like 5 sleep interruptions.
+    input_df = input_df[input_df['Sleep.duration.hrs'] < 16]
+
+    # Generate stats
+    df: DataFrame = summary_stats(input_df, stat_columns, dimensions=['All', 'Weekday'], aggs=['mean', 'std'])
+
+    # Formatting
+    # - Weekdays from Sunday, after All
+    weekday_nums = {x: i for i, x in enumerate(['All', 'Sunday'] + list(calendar.day_name)[:-1])}
+    df = df.sort_values(['Agg.', 'Group'], key=lambda x: x.map(weekday_nums) if x.name == 'Group' else x,
+                        kind='mergesort')
+    df['Value'] = df['Value'].round(2).astype(object)
+    is_am_pm: pd.Series = (df['Agg.'] == 'mean') & df['Metric'].isin(am_pm_cols)
+    df.loc[is_am_pm, 'Value'] = df.loc[is_am_pm, 'Value'].map(
+        lambda val: time(hour=int(val), minute=int((val % 1) * 60)).strftime('%H:%M %p'))
+    df['Agg.'] = df['Agg.'].map({'mean': 'Avg', 'std': 'StdDev'})
+    return df.rename(columns={'Group': 'Weekday'})[['Weekday', 'Metric', 'Agg.', 'Value']].reset_index(drop=True)
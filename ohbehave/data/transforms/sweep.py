@@ -0,0 +1,109 @@
+"""What-if: how sleep metrics change w/ different `ASSUMPTIONS`
+
+Events are read from the event store (or extracted from form responses passed) once, for the whole grid of
+assumptions. Then:
+  sleepStartTimeFromWhenNonNap: Decides which waking day each sleep event is in, & so how events are split into
+   segments. Segments are made once per distinct value in the grid.
+  Others (`SLEEP_METRIC_ASSUMPTIONS`): Per segment & day math, done for all sets of them at once, as 1 column each of
+   2D arrays. See: `sleep_metrics_by_day()`
+
+Assumptions used while parsing form responses (e.g. latestExpectedSleepHour), or by gaming & drinks, aren't sweepable.
+"""
+import itertools
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Sequence
+
+import pandas as pd
+from pandas import DataFrame
+
+from ohbehave.config import ASSUMPTIONS
+from ohbehave.data.event_store import EventStore
+from ohbehave.data.google_sheets import DEFAULT_SOURCE, SheetSource, source_store, sync_stale_sources
+from ohbehave.data.transforms.data_by_date import SLEEP_METRIC_ASSUMPTIONS, _form_dates, sleep_metrics_by_day
+from ohbehave.data.transforms.events import extract_events, read_events, update_event_store, waking_days
+from ohbehave.data.transforms.sessions import sleep_segments
+
+SWEEPABLE_ASSUMPTIONS = SLEEP_METRIC_ASSUMPTIONS + ['sleepStartTimeFromWhenNonNap']
+SWEEP_METRICS = [
+    'Sleep.duration.hrs', 'Sleep.timeTookToFallAsleep.hrs', 'Sleep.interruptions.natural',
+    'Sleep.interruptions.alarm', 'Sleep.interruptions.tot']
+SWEEP_AGGS = ['count', 'mean', 'std', 'median']
+
+
+def assumption_grid(values: Dict[str, Sequence]) -> DataFrame:
+    """Get every combination of assumption values. Sweepable assumptions not passed are their current value.
+
+    :param values: Assumption name -> values to try. Names must be in `SWEEPABLE_ASSUMPTIONS`.
+    :returns 1 row per combination, w/ columns: `SWEEPABLE_ASSUMPTIONS`"""
+    unknown: List[str] = [x for x in values if x not in SWEEPABLE_ASSUMPTIONS]
+    if unknown:
+        raise ValueError(f'Not sweepable: {unknown}. Sweepable assumptions: {SWEEPABLE_ASSUMPTIONS}')
+    values = {x: list(values.get(x, [ASSUMPTIONS[x]])) for x in SWEEPABLE_ASSUMPTIONS}
+    return DataFrame(list(itertools.product(*values.values())), columns=SWEEPABLE_ASSUMPTIONS)
+
+
+def _input_dates(input_df: DataFrame) -> List[date]:
+    """Get all dates from the 1st to the last date reported in form responses. See: `_form_dates()`"""
+    timestamps: pd.Series = input_df['Timestamp']
+    return list(pd.date_range(timestamps.min().normalize(), timestamps.max().normalize()).date)
+
+
+def sweep_sleep_by_date(events: DataFrame, dates: Sequence, grid: DataFrame) -> DataFrame:
+    """Get sleep metrics by date for every set of assumptions in a grid
+
+    :param events: See: `extract_events()`
+    :param dates: Dates of the by-date DataFrame. Sleep on other waking days is ignored, as in `transform_sleep()`.
+    :param grid: See: `assumption_grid()`
+    :returns Long-form DataFrame w/ 1 row per (set of assumptions, date w/ sleep), & columns: `SWEEPABLE_ASSUMPTIONS`,
+     Date, & `SWEEP_METRICS`"""
+    dates = pd.to_datetime(pd.Series(list(dates), dtype=object))
+    is_sleep: pd.Series = events['domain'] == 'Sleep'
+    frames: List[DataFrame] = []
+    for non_nap_start, sub_grid in grid.groupby('sleepStartTimeFromWhenNonNap', sort=False):
+        sleep: DataFrame = events[is_sleep].assign(date=waking_days(events.loc[is_sleep, 'timestamp'], non_nap_start))
+        segments: DataFrame = sleep_segments(sleep[sleep['date'].isin(dates)])
+        days, metrics = sleep_metrics_by_day(segments, sub_grid)
+        # Columns of the arrays are sets of assumptions: flatten set-major
+        n_days, n_sets = len(days), len(sub_grid)
+        frame: DataFrame = sub_grid.loc[sub_grid.index.repeat(n_days)].reset_index(drop=True)
+        frame['Date'] = list(days) * n_sets
+        for col, values in metrics.items():
+            frame[col] = values.T.reshape(-1)
+        frames.append(frame)
+    if not frames:
+        return DataFrame(columns=SWEEPABLE_ASSUMPTIONS + ['Date'] + SWEEP_METRICS)
+    return pd.concat(frames, ignore_index=True)
+
+
+def sweep_assumptions(
+    values: Dict[str, Sequence], input_df: DataFrame = None, aggs: Sequence[str] = tuple(SWEEP_AGGS),
+    gsheets_cache_max_age: timedelta = timedelta(days=7), source: SheetSource = DEFAULT_SOURCE
+) -> DataFrame:
+    """Get summary stats of sleep metrics for every combination of assumption values
+
+    Example:
+      sweep_assumptions({
+          'avgTimeAfterLoggingToFirstSleepIfLogged1x': [timedelta(minutes=x) for x in range(30, 121, 15)],
+          'wakeEventsTimeFromWhenLikelyOnlyAlarm': [time(hour=6), time(hour=7), time(hour=8)]})
+
+    :param values: Assumption name -> values to try. See: `assumption_grid()`
+    :param input_df: Form responses, after `gsheets_datetime_imputations()`. If not passed, events are read from the
+     source's event store, synced as in `data_by_date()`.
+    :param aggs: Pandas aggregations, over dates w/ sleep
+    :returns Tidy DataFrame w/ 1 row per (set of assumptions, metric, agg), & columns: `SWEEPABLE_ASSUMPTIONS`,
+     Metric, Agg., Value"""
+    if input_df is None:
+        store: EventStore = source_store(source)
+        sync_stale_sources([source], datetime.now() - gsheets_cache_max_age, stores={source.name: store})
+        update_event_store(store)
+        events, dates = read_events(store), _form_dates(store)
+    else:
+        events, dates = extract_events(input_df), _input_dates(input_df)
+    grid: DataFrame = assumption_grid(values)
+    by_date: DataFrame = sweep_sleep_by_date(events, dates, grid)
+    by_date['set'] = by_date.groupby(SWEEPABLE_ASSUMPTIONS, sort=False).ngroup()
+    stats: DataFrame = by_date.melt(id_vars=['set'], value_vars=SWEEP_METRICS, var_name='Metric') \
+        .groupby(['set', 'Metric'], sort=False)['value'].agg(list(aggs)) \
+        .rename_axis(columns='Agg.').stack().rename('Value').reset_index()
+    sets: DataFrame = by_date.drop_duplicates('set').set_index('set')[SWEEPABLE_ASSUMPTIONS]
+    return stats.join(sets, on='set')[SWEEPABLE_ASSUMPTIONS + ['Metric', 'Agg.', 'Value']]
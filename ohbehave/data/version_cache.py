@@ -0,0 +1,46 @@
+"""Cache of things derived from a version of the data, e.g. table views, rollups
+
+Values are made once per (data version, key) on 1st use, and then reused until that version is among the least
+recently used & is evicted. Versions are content hashes (see: `Snapshot.version`), so entries are never stale.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable
+
+
+class VersionCache:
+    """Values derived from data versions. Keeps the `max_versions` most recently used versions."""
+
+    def __init__(self, max_versions: int = 2):
+        self.max_versions = max_versions
+        self._versions: 'OrderedDict[str, Dict[Hashable, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, version: str, key: Hashable, make: Callable[[], Any]) -> Any:
+        """Get value for version & key, calling `make()` to make it if not cached
+
+        `make()` is called w/o holding the lock, so a slow 1 doesn't block other keys, & it can use this cache too. If
+        threads make the same value at once, the 1st 1 made is kept, & returned to all of them."""
+        with self._lock:
+            self._use(version)
+            values: Dict[Hashable, Any] = self._versions[version]
+            if key in values:
+                return values[key]
+        value = make()
+        with self._lock:
+            self._use(version)
+            return self._versions[version].setdefault(key, value)
+
+    def _use(self, version: str):
+        """Mark a version as most recently used, adding it if not cached, & evict the least recently used. Call w/ the
+        lock held."""
+        if version not in self._versions:
+            self._versions[version] = {}
+            while len(self._versions) > self.max_versions:
+                self._versions.popitem(last=False)
+        self._versions.move_to_end(version)
+
+    def clear(self):
+        """Remove all values"""
+        with self._lock:
+            self._versions.clear()
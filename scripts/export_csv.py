@@ -1,10 +1,21 @@
 """Convert GoogleSheets source into a 1day=1row csv that can be easily used
-for analysis"""
+for analysis
+
+The full data (no domains excluded) is made once. Each variant (combination of `--exclude-*` flags) is a projection
+of it onto the columns / rows of the domains it includes, so exporting all variants costs 1 pipeline run. Files are
+written in parallel.
+
+Modalities
+  by_date: 1row=1day, & summary stats
+  by_week, by_month: Every numeric metric summed, averaged, & counted per ISO week / month. See: rollups.py
+  events: Long-form, 1row=1event. See: events.py"""
 import os
 import sys
 from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from itertools import product
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List, Sequence, Tuple, Union
 
 import pandas as pd
 
@@ -12,33 +23,117 @@ import pandas as pd
 ROOT_DIR = str(Path(Path(__file__).parent.absolute()).parent.absolute())
 # noinspection PyBroadException
 try:
-    from ohbehave.data.transforms.data_by_date import data_by_date, sleep_summary_stats
+    from ohbehave.data.google_sheets import DEFAULT_SOURCE, SheetSource, source_store
+    from ohbehave.data.transforms.data_by_date import by_date_columns, data_by_date
+    from ohbehave.data.transforms.events import read_events
+    from ohbehave.data.transforms.rollups import rollup
+    from ohbehave.data.transforms.streaming_stats import STREAMING_STATS_VERIFY, StreamingStats
+    from ohbehave.data.transforms.summary_stats import sleep_summary_stats
 except Exception:
     sys.path.insert(0, ROOT_DIR)
-    from ohbehave.data.transforms.data_by_date import data_by_date
+    from ohbehave.data.google_sheets import DEFAULT_SOURCE, SheetSource, source_store
+    from ohbehave.data.transforms.data_by_date import by_date_columns, data_by_date
+    from ohbehave.data.transforms.events import read_events
+    from ohbehave.data.transforms.rollups import rollup
+    from ohbehave.data.transforms.streaming_stats import STREAMING_STATS_VERIFY, StreamingStats
+    from ohbehave.data.transforms.summary_stats import sleep_summary_stats
+
+MODALITIES = ['by_date', 'by_week', 'by_month', 'events']
+FILE_FORMATS = {'csv': '.csv', 'csv.gz': '.csv.gz', 'parquet': '.parquet'}
+Variant = Tuple[bool, bool, bool]  # exclude_gaming_data, exclude_alcohol_data, exclude_sleep_data
+
+
+def _name_stub(exclude_gaming_data=False, exclude_alcohol_data=False, exclude_sleep_data=False) -> str:
+    """Suffix of file names of a variant"""
+    name_stub = ('' + ' sans_gaming' * exclude_gaming_data + ' sans_alcohol' * exclude_alcohol_data + ' sans_sleep' *
+                 exclude_sleep_data).strip()
+    return ' - ' + name_stub if name_stub else ''
+
+
+def _write(df: pd.DataFrame, path: str, file_format: str):
+    """Write a DataFrame in a format of `FILE_FORMATS`"""
+    if file_format == 'parquet':
+        # Parquet columns have 1 type, so mixed ones (e.g. sleep summary stats values: hours & times) are strings
+        mixed: List[str] = [x for x in df.columns if df[x].dtype == object]
+        df.astype({x: 'string' for x in mixed}).to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)  # Compression is inferred from the .gz extension
+
+
+def _by_period(df: pd.DataFrame, granularity: str) -> pd.DataFrame:
+    """1row=1period, w/ columns: period start date, & metric.agg for every rolled up metric"""
+    rolled: pd.DataFrame = rollup(df)
+    if granularity not in rolled.index.get_level_values(0):
+        return pd.DataFrame(columns=['Date'])
+    rolled = rolled.loc[granularity]
+    rolled.columns = [f'{metric}.{agg}' for metric, agg in rolled.columns]
+    return rolled.rename_axis('Date').reset_index()
 
 
 # TODO: if googlesheets token hasn't been refreshed recently enough, will give an error. i should handle exception and
 #  ...remind user to simply run again
 def export_csv(
-    outdir=ROOT_DIR, modality='by_date', exclude_gaming_data=False, exclude_alcohol_data=False,
-    exclude_sleep_data=False, ignore_gsheets_cache=False, verbose=False
+    outdir=ROOT_DIR, modality: Union[str, Sequence[str]] = 'by_date', exclude_gaming_data=False,
+    exclude_alcohol_data=False, exclude_sleep_data=False, ignore_gsheets_cache=False, verbose=False,
+    all_variants=False, file_format='csv', max_workers: int = None, verify_stats=STREAMING_STATS_VERIFY,
+    source: SheetSource = DEFAULT_SOURCE
 ):
-    """Export csv: main function"""
-    name_stub = ('' + ' sans_gaming' * exclude_gaming_data + ' sans_alcohol' * exclude_alcohol_data + ' sans_sleep' *
-                 exclude_sleep_data).strip()
-    name_stub = ' - ' + name_stub if name_stub else ''
-    if modality == 'by_date':
-        data_outpath = os.path.join(outdir, 'data' + name_stub + '.csv')
-        df: pd.DataFrame = data_by_date(
-            exclude_gaming_data, exclude_alcohol_data, exclude_sleep_data, ignore_gsheets_cache, verbose)
-        df.to_csv(data_outpath, index=False)
-        if not exclude_sleep_data:
-            sleep_summary_stats_df: pd.DataFrame = sleep_summary_stats(df)
-            sleep_summary_stats_df.to_csv(os.path.join(outdir, 'summary-stats - sleep.csv'), index=False)
-    else:
-        msg = f'Unknown modality: {modality}'
+    """Export csv: main function
+
+    :param modality: 1 or more of `MODALITIES`
+    :param all_variants: Export every combination of `exclude_*`, rather than only the 1 passed.
+    :param file_format: Key of `FILE_FORMATS`
+    :param max_workers: Max files written at once
+    :param verify_stats: Check the streaming summary stats against exact stats. See: `StreamingStats.update()`
+    :param source: Sheet source, e.g. 1 person's form responses"""
+    modalities: List[str] = [modality] if isinstance(modality, str) else list(modality)
+    unknown: List[str] = [x for x in modalities if x not in MODALITIES]
+    if unknown:
+        msg = f'Unknown modality: {", ".join(unknown)}'
         raise NotImplementedError(msg)
+    ext: str = FILE_FORMATS[file_format]
+    variants: List[Variant] = list(product([False, True], repeat=3)) if all_variants \
+        else [(exclude_gaming_data, exclude_alcohol_data, exclude_sleep_data)]
+
+    # Compute once
+    df: pd.DataFrame = data_by_date(ignore_gsheets_cache=ignore_gsheets_cache, verbose=verbose, source=source)
+    outputs: Dict[str, pd.DataFrame] = {}
+    if 'by_date' in modalities:
+        # The app's streaming stats, if they're of this data version. Else they're computed from all rows.
+        stats = StreamingStats()
+        stats.load()
+        stats.update(None, df, verify_stats)
+        summary_stats_df: pd.DataFrame = stats.to_frame()
+        if any(not x[2] for x in variants):
+            outputs['summary-stats - sleep' + ext] = sleep_summary_stats(df)
+    by_period: Dict[str, pd.DataFrame] = {
+        x: _by_period(df, x.replace('by_', '')) for x in modalities if x in ('by_week', 'by_month')}
+    # Events were extracted into the store by data_by_date(). Read those of the rows `df` was made from.
+    events: pd.DataFrame = read_events(source_store(source), end_row=df.attrs['n_form_rows']) \
+        if 'events' in modalities else None
+
+    # Project each variant
+    for variant in variants:
+        name_stub: str = _name_stub(*variant)
+        columns: List[str] = by_date_columns(*variant)
+        if 'by_date' in modalities:
+            outputs['data' + name_stub + ext] = df[columns]
+            outputs['summary-stats' + name_stub + ext] = summary_stats_df[summary_stats_df['Metric'].isin(columns)]
+        for x, period_df in by_period.items():
+            period_columns = ['Date'] + [
+                col for col in period_df.columns if col != 'Date' and col.rsplit('.', 1)[0] in columns]
+            outputs['data - ' + x + name_stub + ext] = period_df[period_columns]
+        if events is not None:
+            excluded_domains = [x for x, excluded in zip(['Games', 'Drinks', 'Sleep'], variant) if excluded]
+            outputs['events' + name_stub + ext] = events[~events['domain'].isin(excluded_domains)]
+
+    # Write in parallel
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(_write, output_df, os.path.join(outdir, filename), file_format)
+            for filename, output_df in outputs.items()]
+        for future in futures:
+            future.result()
 
 
 def cli():
@@ -51,10 +146,22 @@ def cli():
         '-a', '--exclude-alcohol-data', required=False, action='store_true', help='Exclude alcohol data from results?')
     parser.add_argument(
         '-s', '--exclude-sleep-data', required=False, action='store_true', help='Exclude sleep data from results?')
+    parser.add_argument(
+        '-A', '--all-variants', required=False, action='store_true',
+        help='Export every combination of the --exclude-* flags, from 1 run of the pipeline.')
+    parser.add_argument(
+        '-m', '--modality', required=False, nargs='+', choices=MODALITIES, default=['by_date'],
+        help='What to export. Can pass multiple.')
+    parser.add_argument(
+        '-f', '--file-format', required=False, choices=list(FILE_FORMATS.keys()), default='csv',
+        help='csv, gzipped csv, or parquet.')
     parser.add_argument(
         '-i', '--ignore-gsheets-cache', required=False, action='store_true',
         help='Ignore default caching mechanism of download of raw data from GoogleSheets. Will always download if '
              'this flag is present.')
+    parser.add_argument(
+        '-V', '--verify-stats', required=False, action='store_true', default=STREAMING_STATS_VERIFY,
+        help='Check summary stats, which are updated as data changes, against stats computed from all rows?')
     parser.add_argument(
         '-v', '--verbose', required=False, action='store_true', help='Print extra info and warning statements?')
     d: Dict = vars(parser.parse_args())
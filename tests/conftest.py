@@ -0,0 +1,15 @@
+"""Fixtures shared by tests"""
+import pytest
+
+from ohbehave.data import google_sheets
+from tests.sheet_data import SOURCE, FakeSheetsService
+
+
+@pytest.fixture
+def sheets_service(monkeypatch, tmp_path) -> FakeSheetsService:
+    """Local stand-in for the Sheets API, w/ an empty sheet for `SOURCE`, used by default. Local caches of sheets are
+    in a temp dir. Set rows w/ `sheets_service.sheets[SOURCE.spreadsheet_id] = values`."""
+    service = FakeSheetsService({SOURCE.spreadsheet_id: []})
+    monkeypatch.setattr(google_sheets, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(google_sheets, '_get_sheets_service', lambda: service)
+    return service
@@ -0,0 +1,198 @@
+"""Synthetic form responses, as rows of the Google Sheet, & local stand-ins for the Sheets API"""
+import json
+import random
+import re
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Sequence
+from urllib.parse import parse_qs, urlparse
+
+from ohbehave.data.google_sheets import SheetSource
+
+SOURCE = SheetSource('test', 'test-spreadsheet', 'Form Responses 1!A1:L')  # Not the default, so no legacy cache
+HEADER = ['Timestamp', 'A) Report event (今)', 'Is now the stop or start time?', 'B) Report event (別時)',
+          'Retro: stop or start time?', 'Retro: Time', 'Retro: Date', 'comments']
+GAMES_FRIENDS, GAMES_SOLO, DRINK, SLEEP = 'ゲイム、友達と ', 'ゲイム、自己 ', '飲み物', '寝る前'
+
+
+def _timestamp(t: datetime) -> str:
+    """As the form writes the Timestamp field"""
+    return f'{t.month}/{t.day}/{t.year} {t.hour}:{t.minute:02d}:{t.second:02d}'
+
+
+def sheet_values(n_days=60, seed=0, start=datetime(2021, 11, 1)) -> List[List[str]]:
+    """Sheet rows, header row 1st, of `n_days` of gaming, drinks, & sleep, reported now & retroactively (w/ & w/o a
+    retro date / time). Sorted by timestamp, except for 1 manual row near the end, which is moved to the bottom."""
+    rnd = random.Random(seed)
+    rows = []
+
+    def now(t: datetime, event: str, start_stop=''):
+        rows.append((t, [_timestamp(t), event, start_stop]))
+
+    def retro(reported: datetime, t: datetime, event: str, start_stop='', with_date=True, with_time=True):
+        rows.append((reported, [
+            _timestamp(reported), '', '', event, start_stop, t.strftime('%I:%M:%S %p') if with_time else '',
+            f'{t.month}/{t.day}/{t.year}' if with_date else '']))
+
+    for i in range(n_days):
+        day = start + timedelta(days=i)
+
+        def at(hours: int, minutes=0, seconds=0) -> datetime:
+            return day + timedelta(hours=hours, minutes=minutes, seconds=seconds)
+
+        # Gaming
+        for k in range(rnd.choice([0, 1, 1, 2])):
+            event = rnd.choice([GAMES_FRIENDS, GAMES_SOLO])
+            t_start = at(12 + 4 * k + rnd.randint(0, 3), rnd.randint(0, 59), rnd.randint(0, 59))
+            t_stop = t_start + timedelta(minutes=rnd.randint(20, 300))
+            if rnd.random() < 0.8:
+                now(t_start, event, 'Start')
+            else:
+                retro(t_start + timedelta(minutes=15), t_start, event, 'Start', with_date=rnd.random() < .5)
+            r = rnd.random()
+            if r < 0.7:
+                now(t_stop, event, 'Stop')
+            elif r < 0.9:  # Else: no stop reported
+                retro(t_stop + timedelta(minutes=rnd.randint(5, 200)), t_stop, event, 'Stop',
+                      with_date=rnd.random() < .5)
+        # Drinks
+        for _ in range(rnd.choice([0, 0, 1, 2, 3, 5])):
+            t = at(18 + rnd.randint(0, 10), rnd.randint(0, 59), rnd.randint(1, 59))
+            r = rnd.random()
+            if r < 0.7:
+                now(t, DRINK)
+            elif r < 0.85:
+                retro(t + timedelta(hours=rnd.randint(0, 10)), t, DRINK)
+            else:
+                retro(t + timedelta(hours=rnd.randint(0, 3), minutes=10), t, DRINK, with_date=False)
+        # Sleep: main segment, maybe interrupted, & maybe a nap
+        if rnd.random() < 0.93:
+            t_sleep = at(23 + rnd.randint(0, 3), rnd.randint(0, 59), rnd.randint(1, 59))
+            if rnd.random() < 0.9:
+                now(t_sleep, SLEEP, 'Start')
+            if rnd.random() < 0.3:
+                now(t_sleep + timedelta(minutes=rnd.randint(10, 60)), SLEEP, 'Start')
+            if rnd.random() < 0.3:
+                t_wake = at(28 + rnd.randint(0, 1), rnd.randint(0, 59))
+                now(t_wake, SLEEP, 'Stop')
+                if rnd.random() < 0.6:
+                    now(t_wake + timedelta(minutes=20), SLEEP, 'Start')
+            t_wake = at(31 + rnd.randint(0, 5), rnd.randint(0, 59), rnd.randint(1, 59))
+            if rnd.random() < 0.8:
+                now(t_wake, SLEEP, 'Stop')
+            else:
+                retro(t_wake + timedelta(minutes=rnd.randint(5, 90)), t_wake, SLEEP, 'Stop',
+                      with_date=rnd.random() < .5)
+            if rnd.random() < 0.25:
+                t_nap = at(38 + rnd.randint(0, 3), rnd.randint(0, 59))
+                retro(t_nap + timedelta(minutes=5), t_nap, SLEEP, 'Start', with_date=False)
+                now(t_nap + timedelta(minutes=rnd.randint(30, 120)), SLEEP, 'Stop')
+            if rnd.random() < 0.03:
+                retro(at(30), at(27), SLEEP, 'Stop', with_date=False, with_time=False)
+
+    rows.sort(key=lambda x: x[0])
+    values: List[List[str]] = [HEADER]
+    for i, (_t, row) in enumerate(rows):
+        row = row + [''] * (len(HEADER) - len(row))
+        if i % 37 == 0:
+            row[-1] = 'a comment'
+        while row and row[-1] == '':  # As the Sheets API does
+            row = row[:-1]
+        values.append(row)
+    if len(values) > 20:  # A manual row, out of order
+        values.append(values.pop(-15))
+    return values
+
+
+class FakeSheetsService:
+    """Local stand-in for the Sheets API service, serving `spreadsheets().values()` `get` & `batchGet` from sheets
+    held in memory. Requested ranges are recorded.
+
+    :param sheets: Spreadsheet ID -> sheet rows. Each spreadsheet has 1 sheet, so range sheet names are ignored."""
+
+    def __init__(self, sheets: Dict[str, List[List[str]]]):
+        self.sheets = sheets
+        self.requests: List[List[str]] = []  # Ranges of each request
+
+    def spreadsheets(self) -> 'FakeSheetsService':
+        return self
+
+    def values(self) -> 'FakeSheetsService':
+        return self
+
+    def _range(self, spreadsheet_id: str, range_name: str) -> Dict:
+        """A range, from its 1st row (e.g. 'Sheet!A20:L') to the end"""
+        start_row = int(re.search(r'![A-Za-z]+(\d*)', range_name).group(1) or 1)
+        return {'range': range_name, 'majorDimension': 'ROWS',
+                'values': [list(x) for x in self.sheets[spreadsheet_id][start_row - 1:]]}
+
+    def get(self, spreadsheetId: str, range: str) -> '_Request':
+        self.requests.append([range])
+        return _Request(self._range(spreadsheetId, range))
+
+    def batchGet(self, spreadsheetId: str, ranges: Sequence[str]) -> '_Request':
+        self.requests.append(list(ranges))
+        return _Request({
+            'spreadsheetId': spreadsheetId, 'valueRanges': [self._range(spreadsheetId, x) for x in ranges]})
+
+
+class _Request:
+    """Sheets API request, whose response is already known"""
+
+    def __init__(self, response: Dict):
+        self.response = response
+
+    def execute(self, num_retries=0) -> Dict:
+        return self.response
+
+
+@contextmanager
+def serve_sheets(sheets: Dict[str, Dict[str, List[List[str]]]], n_failures=0) -> Iterator[Dict]:
+    """Serve `values:batchGet` of the Sheets API over HTTP, on localhost, from sheets held in memory. Use its URL as
+    `SHEETS_API_ENDPOINT`.
+
+    :param sheets: Spreadsheet ID -> sheet name -> sheet rows
+    :param n_failures: Num of 1st requests to fail w/ a server error (503)
+    :returns Server state: 'url', & 'requests' (spreadsheet ID & ranges of each request, incl. failed ones)"""
+    state = {'requests': [], 'n_failures': n_failures, 'lock': threading.Lock()}
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            spreadsheet_id: str = re.match(r'/v4/spreadsheets/([^/]+)/values:batchGet', url.path).group(1)
+            ranges: List[str] = parse_qs(url.query).get('ranges', [])
+            with state['lock']:
+                state['requests'].append((spreadsheet_id, ranges))
+                fail: bool = state['n_failures'] > 0
+                state['n_failures'] -= fail
+            if fail:
+                return self._send(503, {'error': {'code': 503, 'message': 'Unavailable'}})
+            value_ranges = []
+            for range_name in ranges:
+                sheet, cells = range_name.rsplit('!', 1)
+                start_row = int(re.match(r'[A-Za-z]+(\d*)', cells).group(1) or 1)
+                rows: List[List[str]] = sheets[spreadsheet_id][sheet.strip("'")][start_row - 1:]
+                value_range = {'range': range_name, 'majorDimension': 'ROWS'}
+                value_ranges.append({**value_range, 'values': rows} if rows else value_range)  # As the API does
+            self._send(200, {'spreadsheetId': spreadsheet_id, 'valueRanges': value_ranges})
+
+        def _send(self, status: int, body: Dict):
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps(body).encode('utf-8'))
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    state['url'] = f'http://127.0.0.1:{server.server_port}/'
+    try:
+        yield state
+    finally:
+        server.shutdown()
+        server.server_close()
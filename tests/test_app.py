@@ -0,0 +1,39 @@
+"""Tests of the app's HTTP responses: ETags of GET responses. See: app.py"""
+from typing import List
+
+import pandas as pd
+import pytest
+
+from ohbehave.data.provider import DataProvider, Snapshot
+from tests.test_data_by_date import _expected
+from tests.sheet_data import sheet_values
+
+
+@pytest.fixture
+def snapshots(monkeypatch) -> List[Snapshot]:
+    """Snapshots the app's provider serves: the last 1. Nothing is loaded, so there's no sheet to sync."""
+    snapshots: List[Snapshot] = [Snapshot('', pd.DataFrame(), None)]
+    monkeypatch.setattr(DataProvider, 'snapshot', lambda self: snapshots[-1])
+    return snapshots
+
+
+@pytest.fixture
+def client(snapshots):
+    from ohbehave.app import SERVER  # After the provider is patched, as Dash may build the layout on import
+    return SERVER.test_client()
+
+
+def test_layout_etag(client, snapshots):
+    """A GET w/ the ETag of the version the browser has gets a 304. A new data version has a new ETag."""
+    snapshots.append(Snapshot('v1', pd.DataFrame(), None))  # No data yet
+    response = client.get('/_dash-layout')
+    etag: str = response.headers['ETag']
+    assert response.status_code == 200 and etag.startswith('W/')
+
+    response = client.get('/_dash-layout', headers={'If-None-Match': etag})
+    assert response.status_code == 304 and not response.data
+
+    snapshots.append(Snapshot('v2', _expected(sheet_values(n_days=20)), None))
+    response = client.get('/_dash-layout', headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.headers['ETag'] != etag
+
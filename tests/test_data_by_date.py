@@ -0,0 +1,121 @@
+"""Tests of data_by_date.py, against data by date computed from all form responses at once"""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import List, Tuple
+
+import pandas as pd
+import pytest
+
+from ohbehave.data.google_sheets import gsheets_datetime_imputations, sheets_values_to_df, source_store
+from ohbehave.data.transforms.data_by_date import apply_by_date_schema, data_by_date, data_by_date_range, \
+    transform_and_impute
+from ohbehave.data.transforms.events import extract_events
+from tests.sheet_data import DRINK, GAMES_SOLO, SLEEP, SOURCE, sheet_values
+
+
+def _slice(df: pd.DataFrame, start: str, end: str) -> pd.DataFrame:
+    """Rows of dates in [start, end]. Rows are indexed by `date`s, so not sliceable by strings."""
+    return df.loc[pd.Timestamp(start).date():pd.Timestamp(end).date()]
+
+
+@pytest.fixture
+def values() -> List[List[str]]:
+    return sheet_values(n_days=60)
+
+
+def _data_by_date(sheets_service, values, tmp_path, **kwargs) -> pd.DataFrame:
+    """data_by_date() of `SOURCE`, once synced w/ `values`"""
+    sheets_service.sheets[SOURCE.spreadsheet_id] = values
+    return data_by_date(
+        source=SOURCE, cache_dir=str(tmp_path / 'frames'), gsheets_cache_max_age=timedelta(0), **kwargs)
+
+
+def _events_and_dates(values: List[List[str]]) -> Tuple[pd.DataFrame, List[date]]:
+    """Events of all rows, & their dates"""
+    input_df: pd.DataFrame = gsheets_datetime_imputations(sheets_values_to_df(values))
+    dates = pd.date_range(input_df['Timestamp'].min().normalize(), input_df['Timestamp'].max().normalize()).date
+    return extract_events(input_df), list(dates)
+
+
+def _expected(values: List[List[str]]) -> pd.DataFrame:
+    """Data by date of all rows, parsed & transformed at once, as before the event store"""
+    return apply_by_date_schema(transform_and_impute(*_events_and_dates(values)))
+
+
+def test_matches_all_rows_at_once(sheets_service, values, tmp_path):
+    df = _data_by_date(sheets_service, values, tmp_path)
+    assert df.attrs['n_form_rows'] == len(values) - 1
+    pd.testing.assert_frame_equal(df, _expected(values))
+
+
+def test_cache_key_is_of_form_responses(sheets_service, values, tmp_path):
+    df = _data_by_date(sheets_service, values[:-5], tmp_path)
+    assert _data_by_date(sheets_service, values[:-5], tmp_path).attrs['cache_key'] == df.attrs['cache_key']
+    assert _data_by_date(sheets_service, values, tmp_path).attrs['cache_key'] != df.attrs['cache_key']
+
+
+@pytest.mark.parametrize('start, end', [('2021-11-20', '2021-12-05'), ('2021-10-01', '2021-11-03'),
+                                        ('2021-12-28', '2022-02-01'), ('2021-11-01', '2021-12-30')])
+def test_range_matches_slice(sheets_service, values, tmp_path, start, end):
+    df = _data_by_date(sheets_service, values, tmp_path)
+    pd.testing.assert_frame_equal(data_by_date_range(start, end, store=source_store(SOURCE)), _slice(df, start, end))
+
+
+def test_range_of_earlier_rows_matches_slice(sheets_service, values, tmp_path):
+    """W/ `n_rows`, a range is of the rows a DataFrame was made from, though more were synced since"""
+    df = _data_by_date(sheets_service, values[:-60], tmp_path)
+    _data_by_date(sheets_service, values, tmp_path)
+    result = data_by_date_range('2021-12-10', '2022-01-05', store=source_store(SOURCE), n_rows=df.attrs['n_form_rows'])
+    pd.testing.assert_frame_equal(result, _slice(df, '2021-12-10', '2022-01-05'))
+
+
+def _retro_row(reported: str, event: str, time: str, date: str, start_stop='') -> List[str]:
+    """Sheet row of an event reported retroactively, as the form writes it"""
+    return [reported, '', '', event, start_stop, time, date]
+
+
+@pytest.mark.parametrize('n_new_rows, extra_rows', [
+    (40, []),  # Range grows
+    (1, []),
+    (0, [_retro_row('1/2/2022 10:00:00', DRINK, '08:30:00 PM', '11/10/2021')]),  # An old date
+    (0, [_retro_row('1/2/2022 10:05:00', GAMES_SOLO, '11:50:00 PM', '11/15/2021', 'Stop')]),
+    (0, [_retro_row('1/2/2022 10:10:00', SLEEP, '02:00:00 AM', '10/20/2021', 'Stop')]),  # Before the range
+    (25, [_retro_row('1/3/2022 9:00:00', DRINK, '08:30:00 PM', '3/1/2022')]),  # Range grows, & after it
+])
+def test_incremental_matches_full(sheets_service, values, tmp_path, n_new_rows, extra_rows):
+    """A DataFrame updated from a previous one, w/ only affected dates recomputed, is the same as computed at once"""
+    prev_values: List[List[str]] = values[:len(values) - n_new_rows]
+    prev_df = _data_by_date(sheets_service, prev_values, tmp_path)
+    new_values: List[List[str]] = prev_values + values[len(prev_values):] + extra_rows
+    df = _data_by_date(sheets_service, new_values, tmp_path, prev_df=prev_df)
+    assert df.attrs['prev_cache_key'] == prev_df.attrs['cache_key']
+    assert 0 < len(df.attrs['recomputed_dates']) < len(df)
+    pd.testing.assert_frame_equal(df, _expected(new_values))
+
+
+def test_incremental_w_changed_rows_is_full(sheets_service, values, tmp_path):
+    """If rows prev_df was made from changed, all dates are recomputed"""
+    prev_df = _data_by_date(sheets_service, values[:-10], tmp_path)
+    edited: List[List[str]] = [list(x) for x in values]
+    edited[5][0] = edited[4][0]
+    df = _data_by_date(sheets_service, edited, tmp_path, prev_df=prev_df, ignore_gsheets_cache=True)  # Full pull
+    assert 'recomputed_dates' not in df.attrs
+    pd.testing.assert_frame_equal(df, _expected(edited))
+
+
+@pytest.mark.parametrize('shard_days', [1, 2, 7, 45])
+@pytest.mark.parametrize('exclude', [{}, {'exclude_gaming_data': True}, {'exclude_sleep_data': True}])
+def test_sharded_matches_full(values, shard_days, exclude):
+    """Shards of dates, each computed from only the events its dates need, concatenate to all dates at once"""
+    events, dates = _events_and_dates(values)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        df = transform_and_impute(events, dates, executor=executor, shard_days=shard_days, **exclude)
+    pd.testing.assert_frame_equal(
+        apply_by_date_schema(df), apply_by_date_schema(transform_and_impute(events, dates, **exclude)))
+
+
+def test_sharded_in_process_pool_matches_full(values):
+    events, dates = _events_and_dates(values)
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        df = transform_and_impute(events, dates, executor=executor, shard_days=10)
+    pd.testing.assert_frame_equal(apply_by_date_schema(df), _expected(values))
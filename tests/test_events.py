@@ -0,0 +1,29 @@
+"""Tests of events.py: the date each event is attributed to"""
+from typing import List
+
+import pandas as pd
+
+from ohbehave.data.google_sheets import gsheets_datetime_imputations, sheets_values_to_df
+from ohbehave.data.transforms.events import extract_events
+from tests.sheet_data import DRINK, HEADER
+from tests.test_data_by_date import _retro_row
+
+
+def _dates(rows: List[List[str]]) -> List[str]:
+    """Dates that the events of sheet rows are attributed to"""
+    events: pd.DataFrame = extract_events(gsheets_datetime_imputations(sheets_values_to_df([HEADER] + rows)))
+    return [x.date().isoformat() for x in events['date']]
+
+
+def test_drink_dates():
+    """Pins the wee hours rule as it has always been: drinks reported now, from midnight to `gamingEarliestDailyStart`,
+    are attributed to the day after the date reported, though its comment says the previous day"""
+    assert _dates([
+        ['3/2/2022 20:00:00', DRINK],
+        ['3/2/2022 0:00:00', DRINK],
+        ['3/2/2022 1:30:00', DRINK],
+        ['3/2/2022 9:30:00', DRINK],
+        ['3/2/2022 9:31:00', DRINK],
+        _retro_row('3/2/2022 1:30:00', DRINK, '11:00:00 PM', '3/1/2022'),  # Retro: the date it happened
+        _retro_row('3/2/2022 1:35:00', DRINK, '01:00:00 AM', '3/2/2022'),
+    ]) == ['2022-03-02', '2022-03-03', '2022-03-03', '2022-03-03', '2022-03-02', '2022-03-01', '2022-03-02']
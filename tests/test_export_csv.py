@@ -0,0 +1,51 @@
+"""Tests of scripts/export_csv.py: every variant, projected from 1 pipeline run, against a run of that variant"""
+import os
+from datetime import timedelta
+from functools import partial
+from itertools import product
+from typing import List
+
+import pandas as pd
+import pytest
+
+from ohbehave.data.google_sheets import gsheets_datetime_imputations, sheets_values_to_df
+from ohbehave.data.transforms.data_by_date import data_by_date
+from ohbehave.data.transforms.events import extract_events
+from scripts import export_csv
+from tests.sheet_data import SOURCE, sheet_values
+
+
+def _read(path: str, file_format: str) -> pd.DataFrame:
+    return pd.read_parquet(path) if file_format == 'parquet' else pd.read_csv(path)
+
+
+@pytest.mark.parametrize('file_format', ['csv', 'parquet'])
+def test_variants_match_their_own_runs(sheets_service, tmp_path, monkeypatch, file_format):
+    values: List[List[str]] = sheet_values(n_days=60)
+    sheets_service.sheets[SOURCE.spreadsheet_id] = values
+    frames_dir = str(tmp_path / 'frames')
+    monkeypatch.setattr(export_csv, 'data_by_date', partial(data_by_date, cache_dir=frames_dir))
+    outdir, expected_dir = tmp_path / 'out', tmp_path / 'expected'
+    os.makedirs(outdir)
+    os.makedirs(expected_dir)
+    export_csv.export_csv(
+        str(outdir), ['by_date', 'events'], all_variants=True, file_format=file_format, source=SOURCE)
+
+    ext: str = export_csv.FILE_FORMATS[file_format]
+    events: pd.DataFrame = extract_events(gsheets_datetime_imputations(sheets_values_to_df(values)))
+    for variant in product([False, True], repeat=3):
+        name_stub: str = export_csv._name_stub(*variant)
+        # Written the same way, so that only the data can differ
+        expected: pd.DataFrame = data_by_date(
+            *variant, cache_dir=frames_dir, gsheets_cache_max_age=timedelta(days=1), source=SOURCE)
+        expected_path = str(expected_dir / ('data' + name_stub + ext))
+        export_csv._write(expected, expected_path, file_format)
+        pd.testing.assert_frame_equal(
+            _read(str(outdir / ('data' + name_stub + ext)), file_format), _read(expected_path, file_format))
+
+        excluded_domains = [x for x, excluded in zip(['Games', 'Drinks', 'Sleep'], variant) if excluded]
+        expected_path = str(expected_dir / ('events' + name_stub + ext))
+        export_csv._write(events[~events['domain'].isin(excluded_domains)], expected_path, file_format)
+        pd.testing.assert_frame_equal(
+            _read(str(outdir / ('events' + name_stub + ext)), file_format), _read(expected_path, file_format))
+    assert os.path.exists(outdir / ('summary-stats - sleep' + ext))
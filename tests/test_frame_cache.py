@@ -0,0 +1,83 @@
+"""Tests of frame_cache.py: round trips, & which columns of a read entry are backed by the memory mapped file"""
+import os
+import sys
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ohbehave.data.frame_cache import read_frame, write_frame
+from tests.test_data_by_date import _expected
+from tests.sheet_data import sheet_values
+
+
+@pytest.fixture(scope='module')
+def df() -> pd.DataFrame:
+    df = _expected(sheet_values(n_days=60))
+    df.attrs['cache_key'] = 'key'
+    return df
+
+
+def _mapped_ranges(path: str) -> List[Tuple[int, int]]:
+    """Address ranges that a file is memory mapped to, in this process"""
+    with open('/proc/self/maps') as f:
+        lines: List[str] = [x.split() for x in f]
+    return [tuple(int(x, 16) for x in line[0].split('-')) for line in lines
+            if len(line) > 5 and line[5] == os.path.realpath(path)]
+
+
+def _arrays(values: pd.api.extensions.ExtensionArray) -> List[np.ndarray]:
+    """The numpy arrays that a column's values are in"""
+    if isinstance(values, pd.Categorical):
+        return [values.codes]
+    if hasattr(values, '_mask'):  # E.g. Int8
+        return [values._data, values._mask]
+    return [np.asarray(values)]
+
+
+def _is_mapped(array: np.ndarray, ranges: List[Tuple[int, int]]) -> bool:
+    address: int = array.__array_interface__['data'][0]
+    return any(start <= address and address + array.nbytes <= end for start, end in ranges)
+
+
+@pytest.mark.parametrize('zero_copy', [False, True])
+def test_round_trip(df, tmp_path, zero_copy):
+    write_frame(df, 'key', str(tmp_path))
+    result = read_frame('key', str(tmp_path), zero_copy)
+    pd.testing.assert_frame_equal(result, df)
+    assert result.attrs == df.attrs
+
+
+def test_round_trip_of_nulls(tmp_path):
+    """Nulls of each kind of column, & values that could be mistaken for them"""
+    df = pd.DataFrame({
+        'datetime': pd.to_datetime(['2022-01-01', None, '1970-01-01']),
+        'float': pd.Series([np.nan, 0, 1.5], dtype='float32'),
+        'Int8': pd.Series([None, 0, -1], dtype='Int8'),
+        'category': pd.Categorical(['b', None, 'a'], categories=['b', 'a'], ordered=True),
+        'string': pd.Series(['a', None, ''], dtype='string')},
+        index=pd.Index(pd.date_range('2022-01-01', periods=3).date, name='Date2'))
+    write_frame(df, 'key', str(tmp_path))
+    pd.testing.assert_frame_equal(read_frame('key', str(tmp_path), zero_copy=True), df)
+
+
+def _keeps_dict_arrays() -> bool:
+    """Whether this version of pandas makes a DataFrame from a dict of arrays w/ `copy=False` w/o copying them"""
+    values = np.arange(3.)
+    return np.shares_memory(pd.DataFrame({0: values, 1: values * 2}, copy=False)[0].to_numpy(), values)
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='Reads mapped address ranges from /proc')
+@pytest.mark.skipif(not _keeps_dict_arrays(), reason='This version of pandas copies columns of a dict')
+def test_zero_copy_columns_are_mapped(df, tmp_path):
+    path: str = write_frame(df, 'key', str(tmp_path))
+    shared = read_frame('key', str(tmp_path), zero_copy=True)
+    copied = read_frame('key', str(tmp_path))
+    ranges: List[Tuple[int, int]] = _mapped_ranges(path)
+    assert ranges
+    mapped: List[str] = [
+        name for name in df.columns if all(_is_mapped(x, ranges) for x in _arrays(shared[name].array))]
+    assert set(df.columns) - set(mapped) == {'Comments.all'}  # Strings are Python objects, so are copies
+    assert not any(_is_mapped(x, ranges) for name in df.columns for x in _arrays(copied[name].array))
+    assert copied['Drinks.tot'].array._data.flags.writeable
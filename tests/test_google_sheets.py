@@ -0,0 +1,114 @@
+"""Tests of google_sheets.py: parsing & datetime imputations"""
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+import pandas as pd
+import pytest
+
+from ohbehave.data.google_sheets import FUTURE_RETRO_THRESH_HRS, LATEST_SLEEP_HR, gsheets_datetime_imputations, \
+    retro_date_fillna, sheets_values_to_df
+
+HEADER = ['Timestamp', 'A) Report event (今)', 'Is now the stop or start time?', 'B) Report event (別時)',
+          'Retro: stop or start time?', 'Retro: Time', 'Retro: Date', 'comments']
+REPORTED_DAY = datetime(2022, 3, 15)
+
+
+def _sheet(rows: List[List[str]]) -> pd.DataFrame:
+    """Parsed sheet of rows of: timestamp, retro time, retro date"""
+    rows = [[ts, '', '', '寝る前', 'Stop', time, date, ''] for ts, time, date in rows]
+    return sheets_values_to_df([HEADER] + rows)
+
+
+def _row(reported: datetime, retro_time: Optional[str], retro_date: str = '') -> List[str]:
+    """Sheet row fields, as the form writes them"""
+    return [reported.strftime('%m/%d/%Y %H:%M:%S'), retro_time or '', retro_date]
+
+
+def _baseline_offset(reported_hr: int, retro_hr: int) -> Optional[int]:
+    """Days from the reported date to the retro date, per the original row by row rules. None if unanticipated."""
+    retro_minus_reported_hrs: int = retro_hr - reported_hr
+    rep_early: bool = reported_hr < LATEST_SLEEP_HR.hour
+    retro_early: bool = retro_hr < LATEST_SLEEP_HR.hour
+    if retro_minus_reported_hrs <= FUTURE_RETRO_THRESH_HRS or retro_minus_reported_hrs <= FUTURE_RETRO_THRESH_HRS - 24:
+        if rep_early and retro_early:
+            return 0
+        elif not rep_early and not retro_early:
+            return 0
+        elif not rep_early and retro_early:
+            return 1
+        return None
+    if not rep_early and not retro_early:
+        return 0
+    elif rep_early and retro_early:
+        return 0
+    elif rep_early and not retro_early:
+        return -1
+    return 0
+
+
+# Retro times up to FUTURE_RETRO_THRESH_HRS after the time reported, incl. any earlier time on the same day, take the
+# 'future' rules. So some of the examples commented as past events (11am & 1am, 11pm & 2am, 11pm & 5am) are dated the
+# next day, as the original row by row rules also did.
+@pytest.mark.parametrize('reported_hr, retro_time, offset_days', [
+    # Retro time in the future
+    (11, '1:00:00 AM', 1),
+    (23, '2:00:00 AM', 1),
+    (1, '1:30:00 AM', 0),
+    (23, '11:30:00 PM', 0),
+    (23, '1:00:00 AM', 1),
+    # Retro time in the past
+    (23, '10:30:00 PM', 0),
+    (3, '2:00:00 AM', 0),
+    (1, '5:00:00 AM', 0),
+    (3, '10:30:00 PM', -1),
+    (3, '11:00:00 AM', -1),
+    (23, '5:00:00 AM', 1),
+])
+def test_retro_date_docstring_examples(reported_hr, retro_time, offset_days):
+    """Each example case in the comments of `retro_date_fillna()`"""
+    df = _sheet([_row(REPORTED_DAY.replace(hour=reported_hr), retro_time)])
+    assert retro_date_fillna(df).iloc[0] == pd.Timestamp(REPORTED_DAY + timedelta(days=offset_days))
+
+
+def test_retro_date_every_hour_matches_baseline(capsys):
+    """Every reported hour x retro hour, against the original rules, incl. unanticipated cases"""
+    rows, expected = [], []
+    for reported_hr in range(24):
+        for retro_hr in range(24):
+            rows.append(_row(REPORTED_DAY.replace(hour=reported_hr, minute=17), f'{retro_hr}:45:00'))
+            offset: Optional[int] = _baseline_offset(reported_hr, retro_hr)
+            expected.append(pd.NaT if offset is None else pd.Timestamp(REPORTED_DAY + timedelta(days=offset)))
+    df = _sheet(rows)
+    result: pd.Series = retro_date_fillna(df)
+    pd.testing.assert_series_equal(result, pd.Series(expected, dtype='datetime64[ns]'), check_names=False)
+    # Unanticipated cases are reported, 1 line per row
+    n_failed: int = sum(pd.isna(x) for x in expected)
+    assert n_failed
+    assert capsys.readouterr().err.count('Failed to anticipate case for imputing retro date') == n_failed
+
+
+def test_retro_date_given_or_missing(capsys):
+    """A given retro date is used as is, whatever the hours. If neither date nor time are given, it stays missing."""
+    reported = REPORTED_DAY.replace(hour=5)
+    df = _sheet([
+        _row(reported, '3:00:00 AM', '3/1/2022'),
+        _row(reported, '7:00:00 AM', '3/1/2022'),  # Would be unanticipated if imputed
+        _row(reported, None, '3/1/2022'),
+        _row(reported, None, ''),
+    ])
+    result: pd.Series = retro_date_fillna(df)
+    assert list(result) == [pd.Timestamp(2022, 3, 1)] * 3 + [pd.NaT]
+    assert capsys.readouterr().err == ''
+
+
+def test_retro_timestamp():
+    """Retro.Timestamp is the retro date plus the retro time, as datetime64, & NaT if either is missing"""
+    df = gsheets_datetime_imputations(_sheet([
+        _row(REPORTED_DAY.replace(hour=23), '1:30:15 AM'),
+        _row(REPORTED_DAY.replace(hour=9), '8:00:00 PM', '3/1/2022'),
+        _row(REPORTED_DAY.replace(hour=9), None, '3/1/2022'),
+        _row(REPORTED_DAY.replace(hour=9), None, ''),
+    ]))
+    assert df['Retro.Timestamp'].dtype == 'datetime64[ns]'
+    assert list(df['Retro.Timestamp']) == [
+        pd.Timestamp(2022, 3, 16, 1, 30, 15), pd.Timestamp(2022, 3, 1, 20), pd.NaT, pd.NaT]
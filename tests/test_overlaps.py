@@ -0,0 +1,66 @@
+"""Tests of overlaps.py: ActivityIndex lookups, against checking every interval"""
+from typing import List
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ohbehave.data.transforms.overlaps import INTERVAL_COLUMNS, ActivityIndex
+
+INTERVALS = pd.DataFrame([
+    ('GamesSolo', '2022-03-01 14:00', '2022-03-01 16:00'),
+    ('Drink', '2022-03-01 15:00', '2022-03-01 15:00'),
+    ('Sleep', '2022-03-01 23:00', '2022-03-02 09:00'),  # The longest
+    ('GamesFriends', '2022-03-02 10:00', '2022-03-02 10:30'),
+    ('Drink', '2022-03-02 10:30', '2022-03-02 10:30'),
+], columns=INTERVAL_COLUMNS).astype({'start': 'datetime64[ns]', 'stop': 'datetime64[ns]'})
+
+
+def _overlapping(intervals: pd.DataFrame, t0, t1, activities: List[str] = None) -> List[int]:
+    """Rows of intervals overlapping [t0, t1], checked 1 by 1"""
+    t0, t1 = pd.Timestamp(t0), pd.Timestamp(t1)
+    return [i for i, x in intervals.iterrows() if x['start'] <= t1 and x['stop'] >= t0
+            and (activities is None or x['activity'] in activities)]
+
+
+@pytest.mark.parametrize('t0, t1', [
+    ('2022-03-01 16:00', '2022-03-01 16:00'),  # Stop of an interval
+    ('2022-03-02 10:00', '2022-03-02 10:00'),  # Start of an interval
+    ('2022-03-01 15:00', '2022-03-01 15:00'),  # A point interval
+    ('2022-03-01 16:01', '2022-03-01 22:59'),  # Between intervals
+    ('2022-03-02 08:59', '2022-03-02 08:59'),  # End of the longest, max duration after its start
+    ('2022-03-02 09:00', '2022-03-02 09:00'),
+    ('2022-03-02 09:01', '2022-03-02 09:59'),
+    ('2022-02-28', '2022-03-03'),  # Longer than any interval, containing all of them
+    ('2022-03-01 15:30', '2022-03-02 10:15'),  # Longer than any interval, overlapping the 1st & last partly
+    ('2022-02-01', '2022-02-28'),
+])
+def test_overlapping_matches_each_interval(t0, t1):
+    index = ActivityIndex(INTERVALS)
+    assert list(index.overlapping(t0, t1).index) == _overlapping(index.intervals, t0, t1)
+    assert list(index.overlapping(t0, t1, ['Drink']).index) == _overlapping(index.intervals, t0, t1, ['Drink'])
+
+
+def test_overlaps_many_matches_each_interval():
+    """Random intervals & ranges, many of which are longer than the longest interval"""
+    rng = np.random.default_rng(0)
+    starts = pd.Timestamp('2022-01-01') + pd.to_timedelta(rng.integers(0, 10 * 24 * 60, 200), unit='min')
+    intervals = pd.DataFrame({
+        'activity': rng.choice(['GamesSolo', 'Sleep', 'Drink'], 200), 'start': starts,
+        'stop': starts + pd.to_timedelta(rng.integers(0, 6 * 60, 200), unit='min')})
+    t0 = pd.Timestamp('2021-12-31') + pd.to_timedelta(rng.integers(0, 12 * 24 * 60, 100), unit='min')
+    t1 = t0 + pd.to_timedelta(rng.integers(0, 24 * 60, 100), unit='min')
+    index = ActivityIndex(intervals)
+    matches: pd.DataFrame = index.overlaps_many(t0, t1, ['Sleep', 'Drink'])
+    assert len(matches) > len(t0)
+    for i in range(len(t0)):
+        expected: List[int] = _overlapping(index.intervals, t0[i], t1[i], ['Sleep', 'Drink'])
+        assert sorted(matches.loc[matches['query'] == i, 'interval']) == expected
+
+
+def test_last_stop_before():
+    index = ActivityIndex(INTERVALS)
+    result: pd.Series = index.last_stop_before(
+        ['2022-03-01 13:00', '2022-03-01 16:00', '2022-03-02 08:00', None], ['GamesSolo', 'GamesFriends'])
+    assert result.isna().tolist() == [True, False, False, True]
+    assert list(result[1:3]) == [pd.Timestamp('2022-03-01 16:00')] * 2
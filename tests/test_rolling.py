@@ -0,0 +1,50 @@
+"""Tests of rolling.py: streak lengths across dates missing from data by date, & current & longest streaks"""
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from ohbehave.data.transforms.rolling import STREAK_COLUMNS, rolling_means, streak_lengths, streaks
+
+
+def _by_date(dates: List[str], drinks: List[float], sleep: List[float]) -> pd.DataFrame:
+    """Data by date of only the metrics streaks are of. Games.tot is 0."""
+    return pd.DataFrame({
+        'Date': pd.to_datetime(dates),
+        'Drinks.tot': pd.Series(drinks, dtype='Int8'),
+        'Sleep.duration.hrs': sleep,
+        'Games.tot': 0.,
+    })
+
+
+DF = _by_date(
+    ['2022-01-01', '2022-01-02', '2022-01-03', '2022-01-06', '2022-01-07', '2022-01-08', '2022-01-09'],
+    [0, 2, 0, 0, None, 1, 0],
+    [8, 7.5, 6, 8, 9, np.nan, 7])
+
+
+def test_streak_lengths_across_gaps():
+    """Missing dates have no drinks, so continue a streak of no drinks, but no sleep, so end a streak of sleep"""
+    lengths = streak_lengths(DF, ['No drinks', 'Drinks', 'Sleep 7+ hrs'])
+    assert list(lengths.index) == list(pd.date_range('2022-01-01', '2022-01-09'))
+    assert list(lengths['No drinks']) == [1, 0, 1, 2, 3, 4, 5, 0, 1]
+    assert list(lengths['Drinks']) == [0, 1, 0, 0, 0, 0, 0, 1, 0]
+    assert list(lengths['Sleep 7+ hrs']) == [1, 2, 0, 0, 0, 1, 2, 0, 1]
+
+
+def test_current_and_longest_streaks():
+    """Ties for the longest are the latest of them"""
+    result = streaks(DF, ['No drinks', 'Sleep 7+ hrs', 'Gaming']).set_index('Streak')
+    assert list(result.reset_index().columns) == STREAK_COLUMNS
+    assert list(result.loc['No drinks']) == [1, 5, pd.Timestamp('2022-01-03'), pd.Timestamp('2022-01-07')]
+    assert list(result.loc['Sleep 7+ hrs']) == [1, 2, pd.Timestamp('2022-01-06'), pd.Timestamp('2022-01-07')]
+    assert list(result.loc['Gaming'][['Current', 'Longest']]) == [0, 0]
+    assert result.loc['Gaming'][['Longest.start', 'Longest.end']].isna().all()
+
+
+def test_rolling_means_are_of_days_w_values():
+    means = rolling_means(DF, ['Drinks.tot', 'Sleep.duration.hrs'], windows=[3])
+    assert list(means['Drinks.tot.mean3d']) == [0, 1, 2 / 3, 2 / 3, 0, 0, 0, 1 / 3, 1 / 3]
+    assert means.loc['2022-01-05', 'Sleep.duration.hrs.mean3d'] == 6  # Only the 3rd has a value
+    means = rolling_means(DF.iloc[[0, 1, 2, 6]], ['Sleep.duration.hrs'], windows=[3])
+    assert np.isnan(means.loc['2022-01-06', 'Sleep.duration.hrs.mean3d'])  # A window w/ no values
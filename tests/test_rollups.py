@@ -0,0 +1,58 @@
+"""Tests of rollups.py, against each metric resampled by day, ISO week, & month on its own"""
+from typing import Dict
+
+import pandas as pd
+import pytest
+
+from ohbehave.data.transforms.rollups import GRANULARITIES, ROLLUP_AGGS, rolled_series, rollup
+from tests.test_data_by_date import _expected
+from tests.sheet_data import sheet_values
+
+# Granularity -> resample rule whose bins start at the period start
+RULES: Dict[str, str] = {'day': 'D', 'week': 'W-MON', 'month': 'MS'}
+METRICS = ['Drinks.tot', 'Sleep.duration.hrs', 'Games.tot', 'Sleep.interruptions.tot']
+
+
+@pytest.fixture(scope='module')
+def df() -> pd.DataFrame:
+    """Data by date, w/ some dates missing, so some periods have fewer days & 1 week has none"""
+    df = _expected(sheet_values(n_days=60))
+    return df[~df['Date'].between('2021-11-01', '2021-11-09')]
+
+
+@pytest.fixture(scope='module')
+def rolled(df) -> pd.DataFrame:
+    return rollup(df)
+
+
+def _resampled(df: pd.DataFrame, granularity: str, metric: str, agg: str) -> pd.Series:
+    """A metric's agg by period, of periods w/ any dates"""
+    values: pd.Series = df.set_index('Date')[metric].astype('float64')
+    resampler = values.resample(RULES[granularity], label='left', closed='left')
+    result: pd.Series = resampler.sum(min_count=1) if agg == 'sum' else getattr(resampler, agg)()
+    n_dates: pd.Series = df.set_index('Date')['Weekday'].resample(RULES[granularity], label='left', closed='left') \
+        .size()
+    return result[n_dates > 0]
+
+
+@pytest.mark.parametrize('granularity', GRANULARITIES)
+@pytest.mark.parametrize('agg', ROLLUP_AGGS)
+def test_matches_resample(df, rolled, granularity, agg):
+    for metric in METRICS:
+        result: pd.Series = rolled_series(rolled, granularity, metric, agg)
+        expected: pd.Series = _resampled(df, granularity, metric, agg)
+        pd.testing.assert_series_equal(result, expected, check_names=False, check_index_type=False, check_freq=False)
+
+
+def test_periods_start_on_monday_and_1st(rolled):
+    assert (rolled.loc['week'].index.weekday == 0).all()
+    assert (rolled.loc['month'].index.day == 1).all()
+    assert pd.Timestamp('2021-11-01') not in rolled.loc['week'].index  # A week w/ no dates
+
+
+def test_sums_of_periods_w_no_values_are_null():
+    df = pd.DataFrame({
+        'Date': pd.to_datetime(['2022-01-03', '2022-01-04', '2022-01-10']),
+        'Sleep.duration.hrs': [None, None, 8.]})
+    sums: pd.Series = rolled_series(rollup(df), 'week', 'Sleep.duration.hrs', 'sum')
+    assert pd.isna(sums['2022-01-03']) and sums['2022-01-10'] == 8
@@ -0,0 +1,95 @@
+"""Tests of gaming sessions: pairing starts & stops, & totals by gaming day. See: sessions.py"""
+from datetime import date
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ohbehave.data.transforms.data_by_date import _by_date_frame, transform_gaming
+from ohbehave.data.transforms.sessions import SESSION_COLUMNS, gaming_by_day, gaming_sessions
+
+FRIENDS, SOLO = 'GamesFriends', 'GamesSolo'
+
+
+def _events(*events: Tuple[str, str, str]) -> pd.DataFrame:
+    """Events table of gaming events: (activity, 'Start' or 'Stop', timestamp)"""
+    return pd.DataFrame({
+        'domain': 'Games',
+        'activity': [x[0] for x in events],
+        'start_stop': [x[1] for x in events],
+        'timestamp': pd.to_datetime([x[2] for x in events]),
+    })
+
+
+def _sessions(*sessions: Tuple[str, str, str, bool, bool]) -> pd.DataFrame:
+    """Sessions: (activity, start, stop, start inferred, stop inferred)"""
+    df = pd.DataFrame(list(sessions), columns=SESSION_COLUMNS)
+    df[['start', 'stop']] = df[['start', 'stop']].apply(pd.to_datetime)
+    return df
+
+
+def test_pairs_starts_w_stops():
+    """Repeated starts begin at the 1st, & repeated stops end at the last"""
+    sessions = gaming_sessions(_events(
+        (FRIENDS, 'Start', '2022-03-01 14:00'), (FRIENDS, 'Start', '2022-03-01 14:10'),
+        (FRIENDS, 'Stop', '2022-03-01 16:00'), (FRIENDS, 'Stop', '2022-03-01 16:05'),
+        (SOLO, 'Start', '2022-03-01 15:00'), (SOLO, 'Stop', '2022-03-01 15:30')))
+    pd.testing.assert_frame_equal(sessions, _sessions(
+        (FRIENDS, '2022-03-01 14:00', '2022-03-01 16:05', False, False),
+        (SOLO, '2022-03-01 15:00', '2022-03-01 15:30', False, False)))
+
+
+def test_infers_ends_of_unmatched_starts_and_stops():
+    """A start & stop more than the max duration apart aren't paired. The missing end of each is the avg duration from
+    its known end."""
+    sessions = gaming_sessions(_events(
+        (FRIENDS, 'Start', '2022-03-01 12:00'), (FRIENDS, 'Stop', '2022-03-01 21:00'),  # 9h apart
+        (FRIENDS, 'Start', '2022-03-02 13:00'), (FRIENDS, 'Stop', '2022-03-02 14:00'),
+        (SOLO, 'Start', '2022-03-02 10:00')))  # The activity's last event
+    pd.testing.assert_frame_equal(sessions, _sessions(
+        (FRIENDS, '2022-03-01 12:00', '2022-03-01 14:30', False, True),
+        (FRIENDS, '2022-03-01 18:30', '2022-03-01 21:00', True, False),
+        (FRIENDS, '2022-03-02 13:00', '2022-03-02 14:00', False, False),
+        (SOLO, '2022-03-02 10:00', '2022-03-02 12:30', False, True)))
+
+
+def test_session_after_midnight_counts_toward_previous_day():
+    days = gaming_by_day(_sessions((FRIENDS, '2022-03-01 23:00', '2022-03-02 02:00', False, False)))
+    assert list(days.index) == [pd.Timestamp('2022-03-01')]
+    assert days.loc['2022-03-01', 'GamesFriends.tot'] == 3
+    assert days.loc['2022-03-01', 'GamesFriends.stop'] == pd.Timestamp('2022-03-02 02:00')
+
+
+def test_session_across_day_start_is_split():
+    """A session that runs past `gamingEarliestDailyStart` (9:30) counts toward both gaming days"""
+    days = gaming_by_day(_sessions((SOLO, '2022-03-02 08:00', '2022-03-02 11:00', False, False)))
+    assert list(days['GamesSolo.tot']) == [1.5, 1.5]
+    assert list(days.index) == [pd.Timestamp('2022-03-01'), pd.Timestamp('2022-03-02')]
+    assert days.loc['2022-03-01', 'GamesSolo.stop'] == pd.Timestamp('2022-03-02 09:30')
+    assert days.loc['2022-03-02', 'GamesSolo.start'] == pd.Timestamp('2022-03-02 09:30')
+
+
+def test_overlaps_are_counted_once_in_games_tot():
+    """Each activity's total is the union of its sessions. Games.tot is the union of both, not their sum."""
+    days = gaming_by_day(_sessions(
+        (FRIENDS, '2022-03-01 14:00', '2022-03-01 16:00', False, False),
+        (FRIENDS, '2022-03-01 15:00', '2022-03-01 17:00', False, False),
+        (SOLO, '2022-03-01 16:30', '2022-03-01 18:00', False, False)))
+    day: pd.Series = days.loc['2022-03-01']
+    assert (day['GamesFriends.tot'], day['GamesSolo.tot'], day['Games.tot']) == (3, 1.5, 4)
+    assert (day['GamesFriends.pct'], day['GamesSolo.pct']) == (66.7, 33.3)
+
+
+def test_pct_on_days_w_no_gaming():
+    """Days w/ gaming of 1 activity have 0% of the other. Days w/ none have totals of 0, & no percentages."""
+    events: pd.DataFrame = _events(
+        (FRIENDS, 'Start', '2022-03-01 14:00'), (FRIENDS, 'Stop', '2022-03-01 16:00'))
+    dates: List[date] = list(pd.date_range('2022-03-01', '2022-03-02').date)
+    df: pd.DataFrame = transform_gaming(events, _by_date_frame(dates))
+    assert df['GamesFriends.pct'].iloc[0] == 100 and pd.isna(df['GamesFriends.pct'].iloc[1])
+    assert df['GamesSolo.pct'].iloc[0] == 0 and pd.isna(df['GamesSolo.pct'].iloc[1])
+    assert list(df['Games.tot']) == [2, 0]
+    assert list(df['GamesSolo.tot']) == [0, 0]
+    # Days w/ only 0 length sessions don't divide by 0
+    assert np.isnan(gaming_by_day(_sessions(
+        (SOLO, '2022-03-01 14:00', '2022-03-01 14:00', False, False)))['GamesSolo.pct'].iloc[0])
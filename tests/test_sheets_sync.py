@@ -0,0 +1,164 @@
+"""Tests of syncing the local cache w/ a sheet, against a local stand-in for the Sheets API. See: `sync_sources()`"""
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Dict, Iterator, List
+
+import googleapiclient.http
+import pytest
+
+from ohbehave.data import google_sheets
+from ohbehave.data.event_store import EventStore, prefix_checksums
+from ohbehave.data.google_sheets import SYNC_TAIL_ROWS, SheetSource, sync_sheets, sync_sources
+from ohbehave.data.transforms.events import update_event_store
+from tests.sheet_data import SOURCE, FakeSheetsService, serve_sheets, sheet_values
+
+
+@pytest.fixture
+def store(tmp_path) -> EventStore:
+    return EventStore(str(tmp_path / 'data.sqlite3'))
+
+
+@pytest.fixture
+def values() -> List[List[str]]:
+    return sheet_values(n_days=20)
+
+
+def _synced(values: List[List[str]], store: EventStore) -> FakeSheetsService:
+    """Sync a sheet to an empty store, & extract its events"""
+    service = FakeSheetsService({SOURCE.spreadsheet_id: values})
+    sync_sheets(service_factory=lambda: service, store=store, source=SOURCE)
+    update_event_store(store)
+    return service
+
+
+def test_first_sync_is_full(values, store):
+    service = FakeSheetsService({SOURCE.spreadsheet_id: values})
+    result = sync_sheets(service_factory=lambda: service, store=store, source=SOURCE)
+    assert result['values'] == values
+    assert store.values() == values
+    assert service.requests == [[SOURCE.range_name]]
+
+
+def test_append_fetches_only_tail_and_new_rows(values, store):
+    service = _synced(values[:-10], store)
+    service.sheets[SOURCE.spreadsheet_id] = values
+    result = sync_sheets(service_factory=lambda: service, store=store, source=SOURCE)
+    tail_start_row: int = len(values) - 10 - SYNC_TAIL_ROWS + 1
+    assert service.requests[1:] == [[f'Form Responses 1!A{tail_start_row}:L']]
+    assert result['values'] == values
+    assert store.values() == values
+    assert update_event_store(store) == 10  # Only new rows' events are extracted
+
+
+def test_edit_within_tail_does_full_pull(values, store):
+    service = _synced(values, store)
+    edited = [list(x) for x in values]
+    edited[-3][-1] = 'edited'
+    service.sheets[SOURCE.spreadsheet_id] = edited
+    sync_sheets(service_factory=lambda: service, store=store, source=SOURCE)
+    assert service.requests[-1] == [SOURCE.range_name]
+    assert store.values() == edited
+    assert update_event_store(store) == 3  # The edited row & those after it
+
+
+def test_edit_above_tail_is_caught_by_periodic_full_pull(values, store):
+    service = _synced(values, store)
+    edited = [list(x) for x in values] + [values[-1]]
+    edited[5][-1] = 'edited'
+    service.sheets[SOURCE.spreadsheet_id] = edited
+    # Tail unchanged, so incremental, until the last full pull is more than `full_interval` ago
+    sync_sheets(service_factory=lambda: service, store=store, source=SOURCE)
+    assert store.values() == values + [values[-1]]
+    assert update_event_store(store) == 1
+    result = sync_sheets(service_factory=lambda: service, store=store, source=SOURCE, full_interval=timedelta(0))
+    assert service.requests[-1] == [SOURCE.range_name]
+    assert result['values'] == edited
+    assert store.values() == edited
+    assert update_event_store(store) == len(edited) - 5  # Only from the edited row on, though it was a full pull
+
+
+@pytest.mark.parametrize('change', ['insert', 'delete'])
+def test_insert_or_delete_above_tail_does_full_pull(values, store, change):
+    service = _synced(values, store)
+    changed = [list(x) for x in values]
+    if change == 'insert':
+        changed.insert(5, list(values[5]))
+    else:
+        del changed[5:7]
+    service.sheets[SOURCE.spreadsheet_id] = changed
+    sync_sheets(service_factory=lambda: service, store=store, source=SOURCE)
+    assert service.requests[-1] == [SOURCE.range_name]
+    assert store.values() == changed
+    assert store.n_responses() == len(changed) - 1
+
+
+def test_full_pull_of_unchanged_sheet_writes_nothing(values, store):
+    service = _synced(values, store)
+    sync_sheets(full=True, service_factory=lambda: service, store=store, source=SOURCE)
+    assert service.requests[-1] == [SOURCE.range_name]
+    assert store.values() == values
+    assert update_event_store(store) == 0
+
+
+def test_store_wo_checksums_is_migrated(values, tmp_path):
+    """Stores made before rows had checksums get them on 1st use"""
+    path = str(tmp_path / 'old.sqlite3')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE responses (row INTEGER PRIMARY KEY, timestamp TEXT, "values" TEXT NOT NULL)')
+    conn.executemany('INSERT INTO responses VALUES (?, NULL, ?)', [(0, '["a", "b"]'), (1, '["c"]')])
+    conn.commit()
+    conn.close()
+    assert EventStore(path).prefix_checksums() == prefix_checksums([['a', 'b'], ['c']])
+
+
+@pytest.fixture
+def sheets_api(monkeypatch):
+    """Points the Sheets API client at a local server. Call w/ the sheets to serve. Retries don't sleep."""
+    sleeps: List[float] = []
+    monkeypatch.setattr(googleapiclient.http.time, 'sleep', sleeps.append)
+    monkeypatch.setattr(google_sheets, '_SERVICES', threading.local())  # Services of the real API aren't reused
+
+    @contextmanager
+    def serve(sheets: Dict[str, Dict[str, List[List[str]]]], n_failures=0) -> Iterator[Dict]:
+        with serve_sheets(sheets, n_failures) as state:
+            monkeypatch.setattr(google_sheets, 'SHEETS_API_ENDPOINT', state['url'])
+            state['sleeps'] = sleeps
+            yield state
+    return serve
+
+
+def test_sync_over_http(values, tmp_path, sheets_api):
+    """Syncs sources of 2 spreadsheets, 1 request per spreadsheet, concurrently, each thread w/ its own service"""
+    sources = [SOURCE, SheetSource('other-sheet', SOURCE.spreadsheet_id, 'Other!A1:L'),
+               SheetSource('other-spreadsheet', 'other-spreadsheet')]
+    sheets = {SOURCE.spreadsheet_id: {'Form Responses 1': values[:-10], 'Other': values[:30]},
+              'other-spreadsheet': {'Form Responses 1': values[:40]}}
+    stores = {x.name: EventStore(str(tmp_path / f'{x.name}.sqlite3')) for x in sources}
+    services: Dict[int, List] = {}
+
+    def service_factory():
+        service = google_sheets._get_sheets_service()
+        services.setdefault(threading.get_ident(), []).append(service)
+        return service
+
+    with sheets_api(sheets, n_failures=1) as server:
+        results = sync_sources(sources, service_factory=service_factory, stores=stores, max_workers=2)
+        assert server['sleeps']  # The failed request was retried
+        assert len(server['requests']) == 3
+        assert len(services) == 2
+        assert all(len(set(map(id, x))) == 1 for x in services.values())  # 1 service per thread, reused
+        assert len(set(id(x[0]) for x in services.values())) == 2
+        assert {name: x['values'] for name, x in results.items()} == {
+            SOURCE.name: values[:-10], 'other-sheet': values[:30], 'other-spreadsheet': values[:40]}
+
+        # Appended rows are fetched w/ the tails, in 1 request for the spreadsheet w/ 2 sources
+        sheets[SOURCE.spreadsheet_id]['Form Responses 1'] = values
+        server['requests'].clear()
+        results = sync_sources(sources, stores=stores, max_workers=2)
+        assert sorted(server['requests']) == [
+            ('other-spreadsheet', ['Form Responses 1!A21:L']),
+            (SOURCE.spreadsheet_id, [f'Form Responses 1!A{len(values) - 10 - SYNC_TAIL_ROWS + 1}:L', 'Other!A11:L'])]
+        assert results[SOURCE.name]['values'] == values
+        assert stores[SOURCE.name].values() == values
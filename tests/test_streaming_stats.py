@@ -0,0 +1,67 @@
+"""Tests of streaming summary stats, against stats computed from all rows. See: streaming_stats.py"""
+from datetime import timedelta
+
+import pandas as pd
+import pytest
+
+from ohbehave.data.provider import DataProvider
+from ohbehave.data.transforms.data_by_date import data_by_date
+from ohbehave.data.transforms.streaming_stats import STREAMING_STATS_AGGS, StreamingStats
+from ohbehave.data.transforms.summary_stats import DIMENSIONS, STAT_COLUMNS, summary_stats
+from tests.sheet_data import SOURCE, sheet_values
+
+
+@pytest.fixture
+def values():
+    return sheet_values(n_days=60)
+
+
+def _data_by_date(sheets_service, values, tmp_path, prev_df=None) -> pd.DataFrame:
+    """data_by_date() of `SOURCE`, once synced w/ `values`"""
+    sheets_service.sheets[SOURCE.spreadsheet_id] = values
+    return data_by_date(
+        source=SOURCE, cache_dir=str(tmp_path / 'frames'), prev_df=prev_df, gsheets_cache_max_age=timedelta(0))
+
+
+def test_incremental_update_matches_exact(sheets_service, values, tmp_path):
+    stats = StreamingStats(path=str(tmp_path / 'stats.json'))
+    prev_df = _data_by_date(sheets_service, values[:-40], tmp_path)
+    assert not stats.update(None, prev_df)
+    df = _data_by_date(sheets_service, values, tmp_path, prev_df)
+    assert df.attrs['recomputed_dates']
+    assert stats.update(prev_df, df)
+    assert stats.version == df.attrs['cache_key']
+    assert not len(stats.verify(df))
+
+    # Saved stats already of the data aren't rebuilt
+    stats.save()
+    loaded = StreamingStats(path=stats.path)
+    assert loaded.load()
+    assert loaded.update(None, df)
+    pd.testing.assert_frame_equal(loaded.to_frame(), stats.to_frame())
+
+
+def test_to_frame_is_in_summary_stats_order(sheets_service, values, tmp_path):
+    df = _data_by_date(sheets_service, values, tmp_path)
+    stats = StreamingStats(path=str(tmp_path / 'stats.json'))
+    stats.rebuild(df)
+    expected = summary_stats(df, dimensions=list(DIMENSIONS.keys()), aggs=STREAMING_STATS_AGGS)
+    keys = [x for x in STAT_COLUMNS if x != 'Value']
+    pd.testing.assert_frame_equal(stats.to_frame()[keys], expected[keys])
+
+
+def test_provider_serves_streaming_stats(sheets_service, values, tmp_path, capsys):
+    sheets_service.sheets[SOURCE.spreadsheet_id] = values[:-40]
+    provider = DataProvider(
+        ttl=timedelta(0), stats=StreamingStats(path=str(tmp_path / 'stats.json')), verify_stats=True, source=SOURCE,
+        cache_dir=str(tmp_path / 'frames'))
+    prev = provider.refresh()
+    assert provider.stats_frame(prev) is not None
+    sheets_service.sheets[SOURCE.spreadsheet_id] = values
+    snapshot = provider.refresh()
+    assert snapshot.df.attrs['prev_cache_key'] == prev.version
+    stats: pd.DataFrame = provider.stats_frame(snapshot)
+    assert provider.stats_frame(prev) is None  # Stats are only of the latest version
+    assert not len(provider.stats.verify(snapshot.df))
+    assert 'mismatches' not in capsys.readouterr().err
+    pd.testing.assert_frame_equal(stats, provider.stats.to_frame())
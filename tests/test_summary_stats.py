@@ -0,0 +1,75 @@
+"""Tests of summary_stats.py, against stats computed w/ a loop over groups & metrics, as before summary_stats()"""
+from datetime import time
+from typing import Dict, List
+
+import pandas as pd
+import pytest
+
+from ohbehave.data.transforms.summary_stats import sleep_summary_stats, summary_stats
+from tests.test_data_by_date import _expected
+from tests.sheet_data import sheet_values
+
+SLEEP_METRICS = [
+    'Sleep.start.hr',
+    'Sleep.end.mainSegment.hr',
+    'Sleep.end.allSegments.hr',
+    'Sleep.duration.hrs',
+    'Sleep.interruptions.natural',
+    'Sleep.interruptions.alarm',
+    'Sleep.interruptions.tot',
+]
+
+
+@pytest.fixture(scope='module')
+def df() -> pd.DataFrame:
+    return _expected(sheet_values(n_days=60))
+
+
+def _baseline_sleep_summary_stats(input_df: pd.DataFrame) -> pd.DataFrame:
+    """sleep_summary_stats() as it was before summary_stats(): a mean & std per weekday & metric, 1 at a time"""
+    weekday_map = {
+        'All': 0, 'Sunday': 1, 'Monday': 2, 'Tuesday': 3, 'Wednesday': 4, 'Thursday': 5, 'Friday': 6, 'Saturday': 7}
+    am_pm_cols = SLEEP_METRICS[:3]
+    input_df = input_df[input_df['Sleep.duration.hrs'].notna()]
+    input_df = input_df[input_df['Sleep.duration.hrs'] < 16]
+
+    rows = []
+    groups = list(input_df.groupby(by='Weekday', observed=True)) + [('All', input_df)]
+    for weekday, df_i in groups:
+        for col in SLEEP_METRICS:
+            val = round(df_i[col].mean(), 2)
+            if col in am_pm_cols:
+                val = time(hour=int(val), minute=int((val % 1) * 60)).strftime('%H:%M %p')
+            rows.append({'Weekday': weekday, 'Metric': col, 'Agg.': 'Avg', 'Value': val})
+            val = round(df_i[col].std(), 2)
+            rows.append({'Weekday': weekday, 'Metric': col, 'Agg.': 'StdDev', 'Value': val})
+
+    df = pd.DataFrame(rows)
+    df['weekday_num'] = df['Weekday'].apply(lambda x: weekday_map[x])
+    return df.sort_values(['Agg.', 'weekday_num']).drop(columns=['weekday_num'])
+
+
+def test_sleep_summary_stats_match_baseline(df):
+    expected: pd.DataFrame = _baseline_sleep_summary_stats(df)
+    result: pd.DataFrame = sleep_summary_stats(df)
+    assert len(result) == 2 * 8 * len(SLEEP_METRICS)
+    pd.testing.assert_frame_equal(result, expected.reset_index(drop=True), check_dtype=False)
+
+
+def test_summary_stats_match_groupby(df):
+    """Each agg of each metric by each dimension is that of the group's non-null values"""
+    aggs: Dict[str, str] = {'count': 'count', 'mean': 'mean', 'std': 'std', 'median': 'median'}
+    stats: pd.DataFrame = summary_stats(df, SLEEP_METRICS, dimensions=['Weekday', 'Month'], aggs=list(aggs) + ['p25'])
+    rows: List[dict] = []
+    for dimension, keys in [('Weekday', df['Date'].dt.day_name()), ('Month', df['Date'].dt.month_name())]:
+        for group, df_i in df[SLEEP_METRICS].astype('float64').groupby(keys):
+            for metric in SLEEP_METRICS:
+                values: pd.Series = df_i[metric].dropna()
+                for agg in aggs:
+                    rows.append((dimension, group, metric, agg, getattr(values, agg)()))
+                rows.append((dimension, group, metric, 'p25', values.quantile(.25)))
+    expected = pd.DataFrame(rows, columns=['Dimension', 'Group', 'Metric', 'Agg.', 'Value']) \
+        .set_index(['Dimension', 'Group', 'Metric', 'Agg.'])['Value']
+    result: pd.Series = stats.set_index(['Dimension', 'Group', 'Metric', 'Agg.'])['Value']
+    assert not result.index.duplicated().any()
+    pd.testing.assert_series_equal(result.astype('float64').sort_index(), expected.sort_index(), check_exact=False)
@@ -0,0 +1,64 @@
+"""Tests of the what-if sweep of sleep assumptions. See: sweep.py"""
+from datetime import time, timedelta
+from typing import Dict, List, Sequence
+
+import pandas as pd
+import pytest
+
+from ohbehave.config import ASSUMPTIONS
+from ohbehave.data.google_sheets import gsheets_datetime_imputations, sheets_values_to_df
+from ohbehave.data.transforms.sweep import SWEEP_AGGS, SWEEP_METRICS, SWEEPABLE_ASSUMPTIONS, assumption_grid, \
+    sweep_assumptions, sweep_sleep_by_date
+from tests.sheet_data import SOURCE, sheet_values
+from tests.test_data_by_date import _events_and_dates, _expected
+
+ALARM_HOUR = ASSUMPTIONS['wakeEventsTimeFromWhenLikelyOnlyAlarm']
+VALUES = {'wakeEventsTimeFromWhenLikelyOnlyAlarm': [ALARM_HOUR, time(hour=5)]}
+
+
+@pytest.fixture
+def values() -> List[List[str]]:
+    return sheet_values(n_days=60)
+
+
+def test_sweep_from_store_matches_input(sheets_service, values):
+    """W/o form responses passed, events are read from the event store, w/ the same results"""
+    sheets_service.sheets[SOURCE.spreadsheet_id] = values
+    result = sweep_assumptions(VALUES, source=SOURCE, gsheets_cache_max_age=timedelta(0))
+    assert list(result.columns) == SWEEPABLE_ASSUMPTIONS + ['Metric', 'Agg.', 'Value']
+    assert len(result) == 2 * len(SWEEP_METRICS) * len(SWEEP_AGGS)
+    input_df: pd.DataFrame = gsheets_datetime_imputations(sheets_values_to_df(values))
+    pd.testing.assert_frame_equal(result, sweep_assumptions(VALUES, input_df))
+
+
+def _sweep_by_date(values: List[List[str]], grid_values: Dict[str, Sequence]) -> pd.DataFrame:
+    """Sleep metrics by date of each set of assumptions, indexed by (set, date)"""
+    events, dates = _events_and_dates(values)
+    by_date: pd.DataFrame = sweep_sleep_by_date(events, dates, assumption_grid(grid_values))
+    by_date['set'] = by_date.groupby(SWEEPABLE_ASSUMPTIONS, sort=False).ngroup()
+    by_date['Date'] = pd.to_datetime(by_date['Date']).dt.date
+    return by_date.set_index(['set', 'Date'])[SWEEP_METRICS]
+
+
+def test_current_assumptions_match_data_by_date(values):
+    """The set of assumptions equal to `ASSUMPTIONS` has data_by_date()'s sleep metrics, on each date w/ sleep"""
+    expected: pd.DataFrame = _expected(values)[SWEEP_METRICS]
+    expected = expected[expected['Sleep.duration.hrs'].notna()]
+    result: pd.DataFrame = _sweep_by_date(values, {}).loc[0]
+    assert len(result) > 40
+    pd.testing.assert_frame_equal(result.astype(expected.dtypes), expected, check_names=False, check_exact=True)
+
+
+@pytest.mark.parametrize('name, value, changed, unchanged', [
+    ('avgTimeAfterLoggingToFirstSleepIfLogged1x', timedelta(minutes=30),
+     ['Sleep.duration.hrs', 'Sleep.timeTookToFallAsleep.hrs'], ['Sleep.interruptions.tot']),
+    ('wakeEventsTimeFromWhenLikelyOnlyAlarm', time(hour=5),
+     ['Sleep.interruptions.natural', 'Sleep.interruptions.alarm'],
+     ['Sleep.duration.hrs', 'Sleep.timeTookToFallAsleep.hrs', 'Sleep.interruptions.tot']),
+])
+def test_other_assumptions_change_their_metrics(values, name, value, changed, unchanged):
+    by_date: pd.DataFrame = _sweep_by_date(values, {name: [ASSUMPTIONS[name], value]})
+    current, other = by_date.loc[0], by_date.loc[1]
+    for metric in changed:
+        assert not current[metric].equals(other[metric]), metric
+    pd.testing.assert_frame_equal(current[unchanged], other[unchanged])
@@ -0,0 +1,68 @@
+"""Tests of table_view.py: pages sorted & filtered on the server, against the same done to the whole DataFrame"""
+from typing import Callable, Dict, List
+
+import pandas as pd
+import pytest
+
+from ohbehave.data.table_view import TableView, split_filter_part, table_display_df, to_records
+from tests.test_data_by_date import _expected
+from tests.sheet_data import sheet_values
+
+
+@pytest.fixture(scope='module')
+def df() -> pd.DataFrame:
+    return _expected(sheet_values(n_days=60))
+
+
+@pytest.fixture(scope='module')
+def view(df) -> TableView:
+    return TableView(df)
+
+
+def _pages(view: TableView, page_size: int, sort_by: List[Dict], filter_query: str) -> List[Dict]:
+    """Records of all pages, in order"""
+    records, page_count = view.page(0, page_size, sort_by, filter_query)
+    for page_current in range(1, page_count):
+        records += view.page(page_current, page_size, sort_by, filter_query)[0]
+    assert not view.page(page_count, page_size, sort_by, filter_query)[0]
+    return records
+
+
+@pytest.mark.parametrize('sort_by, filter_query, where', [
+    ([], '', lambda df: df['Date'].notna()),
+    ([{'column_id': 'Drinks.tot', 'direction': 'desc'}], '', lambda df: df['Date'].notna()),
+    ([{'column_id': 'Sleep.duration.hrs', 'direction': 'asc'}], '{Drinks.tot} ge 2',
+     lambda df: df['Drinks.tot'] >= 2),
+    ([{'column_id': 'Games.tot', 'direction': 'desc'}], '{Weekday} contains day && {Sleep.duration.hrs} lt 9',
+     lambda df: df['Weekday'].str.contains('day') & (df['Sleep.duration.hrs'] < 9)),
+    ([{'column_id': 'Date', 'direction': 'asc'}], '{Date} datestartswith 2021-12 && {Drinks.tot} ne 0',
+     lambda df: df['Date'].astype(str).str.startswith('2021-12') & (df['Drinks.tot'] != 0)),
+    ([], '{Weekday} eq "Friday"', lambda df: df['Weekday'] == 'Friday'),
+    ([], '{Weekday} gt 3', lambda df: df['Date'].isna()),  # A string compared to a number
+])
+@pytest.mark.parametrize('page_size', [7, 25, 1000])
+def test_pages_match_whole_frame(df, view, page_size, sort_by, filter_query, where: Callable):
+    expected: pd.DataFrame = table_display_df(df)
+    expected = expected[where(expected).fillna(False).to_numpy(dtype=bool)]
+    if sort_by:
+        expected = expected.sort_values(
+            sort_by[0]['column_id'], ascending=sort_by[0]['direction'] == 'asc', na_position='last', kind='mergesort')
+    result: List[Dict] = _pages(view, page_size, sort_by, filter_query)
+    assert result == to_records(expected)
+    assert view.page(0, page_size, sort_by, filter_query)[1] == max(1, -(-len(expected) // page_size))
+
+
+def test_sort_puts_nulls_last(view):
+    for direction in ('asc', 'desc'):
+        records: List[Dict] = _pages(view, 25, [{'column_id': 'Sleep.duration.hrs', 'direction': direction}], '')
+        values: List = [x['Sleep.duration.hrs'] for x in records]
+        n_values: int = sum(x is not None for x in values)
+        assert 0 < n_values < len(values) and all(x is None for x in values[n_values:])
+        assert values[:n_values] == sorted(values[:n_values], reverse=direction == 'desc')
+
+
+def test_split_filter_part():
+    assert split_filter_part('{Drinks.tot} ge 3') == ('Drinks.tot', 'ge', 3.)
+    assert split_filter_part('{Weekday} eq "Fri day"') == ('Weekday', 'eq', 'Fri day')
+    assert split_filter_part('{Comments.all} contains beer') == ('Comments.all', 'contains', 'beer')
+    assert split_filter_part('nonsense') == (None, None, None)
@@ -0,0 +1,49 @@
+"""Tests of the cache of values derived from data versions. See: version_cache.py"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from ohbehave.data.version_cache import VersionCache
+
+
+def test_made_once_per_version_and_key():
+    cache = VersionCache(max_versions=2)
+    calls = []
+    for version, key in [('v1', 'a'), ('v1', 'a'), ('v1', 'b'), ('v2', 'a'), ('v1', 'a')]:
+        assert cache.get(version, key, lambda: calls.append((version, key)) or (version, key)) == (version, key)
+    assert calls == [('v1', 'a'), ('v1', 'b'), ('v2', 'a')]
+
+
+def test_least_recently_used_version_is_evicted():
+    cache = VersionCache(max_versions=2)
+    cache.get('v1', 'a', lambda: 1)
+    cache.get('v2', 'a', lambda: 2)
+    cache.get('v1', 'b', lambda: 3)  # v1 is now the most recently used
+    cache.get('v3', 'a', lambda: 4)
+    assert cache.get('v1', 'a', lambda: None) == 1
+    assert cache.get('v2', 'a', lambda: None) is None
+
+
+def test_make_can_use_the_cache():
+    """E.g. a table view made from a cached rollup, w/o deadlocking"""
+    cache = VersionCache()
+    assert cache.get('v1', 'view', lambda: cache.get('v1', 'rollup', lambda: 1) + 1) == 2
+    assert cache.get('v1', 'rollup', lambda: None) == 1
+
+
+def test_slow_make_doesnt_block_other_keys():
+    cache = VersionCache()
+    cache.get('v1', 'cached', lambda: 'hit')
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        assert release.wait(5)
+        return 'slow'
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(cache.get, 'v1', 'slow', slow)
+        assert started.wait(5)
+        assert cache.get('v1', 'cached', lambda: None) == 'hit'
+        assert cache.get('v2', 'other', lambda: 'other') == 'other'
+        release.set()
+        assert future.result() == 'slow'